@@ -0,0 +1,23 @@
+import time
+
+
+class TTLCache:
+    """In-process cache of computed values with a time to live."""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._entries = {}
+
+    async def get_or_set(self, key, compute):
+        """Return the cached value for key or await compute() to fill it."""
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry and entry[0] > now:
+            return entry[1]
+
+        value = await compute()
+        self._entries[key] = (now + self.ttl, value)
+        return value
+
+    def clear(self):
+        self._entries.clear()
@@ -0,0 +1,130 @@
+import base64
+from datetime import datetime
+
+
+LISTING_COLUMNS = """
+    url, title, price_usd, odometer, username, phone_number,
+    image_url, images_count, car_number, car_vin, listing_key,
+    datetime_found
+"""
+
+FILTERS = {
+    "price_min": ("price_usd >=", int),
+    "price_max": ("price_usd <=", int),
+    "odometer_min": ("odometer >=", int),
+    "odometer_max": ("odometer <=", int),
+    "found_from": ("datetime_found >=", datetime.fromisoformat),
+    "found_to": ("datetime_found <", datetime.fromisoformat),
+}
+
+
+def encode_cursor(row):
+    raw = f"{row['datetime_found'].isoformat()}|{row['listing_key']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+    found, _, listing_key = raw.partition("|")
+    return datetime.fromisoformat(found), listing_key
+
+
+def build_filters(params):
+    """
+    Turn query parameters into SQL conditions and arguments.
+    Raises ValueError on invalid values.
+    """
+    conditions = ["TRUE"]
+    args = []
+    for name, (condition, cast) in FILTERS.items():
+        if params.get(name) not in (None, ""):
+            args.append(cast(params[name]))
+            conditions.append(f"{condition} ${len(args)}")
+    return conditions, args
+
+
+async def list_cars(conn, params, cursor=None, limit=50):
+    """
+    Keyset-paginated listings, newest first, ordered by
+    (datetime_found, listing_key) so pages never need OFFSET.
+    """
+    conditions, args = build_filters(params)
+    # Keyset order needs a value, listings without a Date header are skipped
+    conditions.append("datetime_found IS NOT NULL")
+    if cursor:
+        found, listing_key = decode_cursor(cursor)
+        args.extend([found, listing_key])
+        conditions.append(
+            f"(datetime_found, listing_key) "
+            f"< (${len(args) - 1}, ${len(args)})"
+        )
+    args.append(limit)
+
+    rows = await conn.fetch(
+        f"""
+        SELECT {LISTING_COLUMNS}
+        FROM cars_with_sellers
+        WHERE {" AND ".join(conditions)}
+        ORDER BY datetime_found DESC, listing_key DESC
+        LIMIT ${len(args)};
+        """,
+        *args,
+    )
+    next_cursor = (
+        encode_cursor(rows[-1]) if rows and len(rows) == limit else None
+    )
+    return rows, next_cursor
+
+
+async def seller_cars(conn, phone, limit=50):
+    """
+    Listings of the seller with this phone number, newest first. None
+    when there is no such seller.
+    """
+    seller = await conn.fetchrow(
+        "SELECT id, phone, username, first_seen, last_seen "
+        "FROM sellers WHERE phone = $1;",
+        phone,
+    )
+    if seller is None:
+        return None, []
+    rows = await conn.fetch(
+        f"""
+        SELECT {LISTING_COLUMNS}
+        FROM cars_with_sellers
+        WHERE seller_id = $1
+        ORDER BY datetime_found DESC NULLS LAST
+        LIMIT $2;
+        """,
+        seller["id"],
+        limit,
+    )
+    return seller, rows
+
+
+async def count_cars(conn, params):
+    conditions, args = build_filters(params)
+    return await conn.fetchval(
+        f"SELECT count(*) FROM cars WHERE {' AND '.join(conditions)};", *args
+    )
+
+
+async def price_percentiles_by_title(conn, min_listings=5, limit=100):
+    """Price quartiles per title with at least min_listings listings."""
+    return await conn.fetch(
+        """
+        SELECT title,
+               count(*) AS listings,
+               percentile_cont(0.25) WITHIN GROUP (ORDER BY price_usd) AS p25,
+               percentile_cont(0.5) WITHIN GROUP (ORDER BY price_usd) AS p50,
+               percentile_cont(0.75) WITHIN GROUP (ORDER BY price_usd) AS p75
+        FROM cars
+        WHERE price_usd IS NOT NULL
+        GROUP BY title
+        HAVING count(*) >= $1
+        ORDER BY listings DESC
+        LIMIT $2;
+        """,
+        min_listings,
+        limit,
+    )
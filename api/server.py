@@ -0,0 +1,131 @@
+import os
+
+from aiohttp import web
+from dotenv import load_dotenv
+
+from api.cache import TTLCache
+from api.queries import (
+    count_cars,
+    list_cars,
+    price_percentiles_by_title,
+    seller_cars,
+)
+from database.connection import Database
+from database.db_utils import LOAD_COMPLETE_CHANNEL
+from logs.logger import logger
+
+
+load_dotenv()
+
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", 8080))
+API_CACHE_TTL = int(os.getenv("API_CACHE_TTL", 300))
+API_MAX_PAGE_SIZE = 100
+
+
+def query_int(request, name, default, maximum=None, minimum=None):
+    try:
+        value = int(request.query.get(name, default))
+    except ValueError:
+        raise web.HTTPBadRequest(text=f"'{name}' must be an integer")
+    if minimum is not None and value < minimum:
+        raise web.HTTPBadRequest(text=f"'{name}' must be at least {minimum}")
+    return min(value, maximum) if maximum else value
+
+
+def serialize(row):
+    return {
+        key: value.isoformat() if hasattr(value, "isoformat") else value
+        for key, value in dict(row).items()
+    }
+
+
+async def get_cars(request):
+    limit = query_int(request, "limit", 50, API_MAX_PAGE_SIZE, minimum=1)
+    try:
+        async with request.app["db"].pool.acquire() as conn:
+            rows, next_cursor = await list_cars(
+                conn, request.query, request.query.get("cursor"), limit
+            )
+    except ValueError as e:
+        raise web.HTTPBadRequest(text=f"Invalid filter or cursor: {e}")
+    return web.json_response(
+        {"items": [serialize(r) for r in rows], "next_cursor": next_cursor}
+    )
+
+
+async def get_seller_cars(request):
+    limit = query_int(request, "limit", 50, API_MAX_PAGE_SIZE, minimum=1)
+    async with request.app["db"].pool.acquire() as conn:
+        seller, rows = await seller_cars(
+            conn, request.match_info["phone"], limit
+        )
+    if seller is None:
+        raise web.HTTPNotFound(text="Unknown seller")
+    return web.json_response(
+        {"seller": serialize(seller), "items": [serialize(r) for r in rows]}
+    )
+
+
+async def get_count(request):
+    params = dict(request.query)
+
+    async def compute():
+        async with request.app["db"].pool.acquire() as conn:
+            return await count_cars(conn, params)
+
+    key = ("count", tuple(sorted(params.items())))
+    try:
+        count = await request.app["cache"].get_or_set(key, compute)
+    except ValueError as e:
+        raise web.HTTPBadRequest(text=f"Invalid filter: {e}")
+    return web.json_response({"count": count})
+
+
+async def get_price_percentiles(request):
+    min_listings = query_int(request, "min_listings", 5, minimum=1)
+    limit = query_int(request, "limit", 100, 1000, minimum=1)
+
+    async def compute():
+        async with request.app["db"].pool.acquire() as conn:
+            rows = await price_percentiles_by_title(conn, min_listings, limit)
+        return [serialize(r) for r in rows]
+
+    key = ("price_percentiles", min_listings, limit)
+    rows = await request.app["cache"].get_or_set(key, compute)
+    return web.json_response({"items": rows})
+
+
+async def on_startup(app):
+    app["db"] = Database()
+    await app["db"].connect()
+
+    def invalidate(connection, pid, channel, payload):
+        logger.info("Load completed, clearing API cache")
+        app["cache"].clear()
+
+    # A dedicated connection stays subscribed to load notifications
+    app["listener"] = await app["db"].pool.acquire()
+    await app["listener"].add_listener(LOAD_COMPLETE_CHANNEL, invalidate)
+    logger.info(f"Listening for '{LOAD_COMPLETE_CHANNEL}' notifications")
+
+
+async def on_cleanup(app):
+    await app["db"].pool.release(app["listener"])
+    await app["db"].close()
+
+
+def create_app(cache_ttl=API_CACHE_TTL):
+    app = web.Application()
+    app["cache"] = TTLCache(cache_ttl)
+    app.router.add_get("/cars", get_cars)
+    app.router.add_get("/sellers/{phone}/cars", get_seller_cars)
+    app.router.add_get("/stats/count", get_count)
+    app.router.add_get("/stats/price-percentiles", get_price_percentiles)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+if __name__ == "__main__":
+    web.run_app(create_app(), host=API_HOST, port=API_PORT)
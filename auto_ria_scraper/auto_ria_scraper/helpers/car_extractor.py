@@ -0,0 +1,296 @@
+import re
+from collections import Counter
+
+from lxml import etree
+
+from auto_ria_scraper.auto_ria_scraper.helpers.odometer_extractor import (
+    parse_odometer_text,
+)
+
+
+NON_DIGITS_RE = re.compile(r"\D")
+DIGITS_RE = re.compile(r"\d+")
+
+
+def loose_conditions(classes, attrs, class_contains=None):
+    """
+    XPath conditions matching class names as substrings, which libxml2
+    tests much faster than whole class names. Rule.matches() then checks
+    the candidates exactly.
+    """
+    conditions = [f"contains(@class, '{c}')" for c in sorted(classes)]
+    if class_contains:
+        conditions.append(f"contains(@class, '{class_contains}')")
+    for name, value in attrs.items():
+        if name == "class":
+            conditions.append(f"contains(@class, '{value}')")
+        else:
+            conditions.append(f"@{name}='{value}'")
+    return " and ".join(conditions)
+
+
+def descendant_path(tag, condition):
+    if condition:
+        return f"/descendant::{tag}[{condition}]"
+    return f"/descendant::{tag}"
+
+
+def has_attrs(el, attrs):
+    """Attribute match, class values are matched as one class name."""
+    for name, value in attrs.items():
+        if name == "class":
+            if value not in (el.get("class") or "").split():
+                return False
+        elif el.get(name) != value:
+            return False
+    return True
+
+
+class Rule:
+    """
+    Matches elements by tag, whole class names, a class substring,
+    attribute values and an optional ancestor (tag, attrs), then extracts
+    a value from the first matching element in document order.
+
+    extract is "text" (first text node), "descendant_text" (all text in
+    the element, like CSS ' ::text') or "@name" for an attribute.
+    """
+
+    def __init__(
+        self,
+        tag,
+        classes=(),
+        class_contains=None,
+        attrs=None,
+        ancestor=None,
+        extract="text",
+        regex=None,
+    ):
+        self.tag = tag
+        self.classes = frozenset(classes)
+        self.class_contains = class_contains
+        self.attrs = attrs or {}
+        self.ancestor = ancestor
+        self.extract = extract
+        self.regex = re.compile(regex) if regex else None
+
+    def condition(self):
+        """Loose XPath condition on candidates, without the ancestor."""
+        return loose_conditions(self.classes, self.attrs, self.class_contains)
+
+    def xpath(self):
+        """Loose XPath of candidates below the rule's ancestor."""
+        tag, attrs = self.ancestor
+        return descendant_path(tag, loose_conditions((), attrs)) + (
+            descendant_path(self.tag, self.condition())
+        )
+
+    def matches(self, el):
+        if self.classes or self.class_contains:
+            class_attr = el.get("class") or ""
+            if not self.classes.issubset(class_attr.split()):
+                return False
+            if self.class_contains and self.class_contains not in class_attr:
+                return False
+        if not has_attrs(el, self.attrs):
+            return False
+        if self.ancestor:
+            tag, attrs = self.ancestor
+            return any(
+                has_attrs(parent, attrs) for parent in el.iterancestors(tag)
+            )
+        return True
+
+    def value(self, el):
+        """Extracted value, or None when the element does not qualify."""
+        if self.extract.startswith("@"):
+            text = el.get(self.extract[1:])
+        elif self.extract == "descendant_text":
+            text = " ".join(el.itertext())
+        else:
+            text = el.text
+            if text is None:
+                text = next(
+                    (child.tail for child in el if child.tail is not None),
+                    None,
+                )
+
+        if text is None or not text.strip():
+            return None
+        if self.regex:
+            match = self.regex.search(text)
+            return match.group() if match else None
+        return text
+
+
+def parse_digits(text):
+    return NON_DIGITS_RE.sub("", text) or None
+
+
+def parse_images_count(text):
+    # e.g. "Смотреть все 62 фотографий", the main photo is not counted
+    match = DIGITS_RE.search(text or "")
+    return int(match.group()) - 1 if match else 0
+
+
+# field: ([(fallback name, rule), ...], parser of the matched text)
+CAR_FIELDS = {
+    "notice": (
+        [
+            (
+                "notice_head",
+                Rule("div", ["notice_head"], extract="descendant_text"),
+            )
+        ],
+        str.strip,
+    ),
+    "title": ([("h1_head", Rule("h1", ["head"]))], str.strip),
+    "price_usd": (
+        [
+            (
+                "span_usd",
+                Rule("span", attrs={"data-currency": "USD"}),
+            ),
+            ("strong_dollar", Rule("strong", regex=r"[\d\s]+[$]")),
+        ],
+        parse_digits,
+    ),
+    "odometer": (
+        [("div_bold_dhide", Rule("div", ["bold", "dhide"]))],
+        parse_odometer_text,
+    ),
+    "username": (
+        [
+            (
+                "div_seller_link",
+                Rule("a", ancestor=("div", {"class": "seller_info_name"})),
+            ),
+            ("div_seller", Rule("div", ["seller_info_name"])),
+            (
+                "h4_seller_link",
+                Rule("a", ancestor=("h4", {"class": "seller_info_name"})),
+            ),
+        ],
+        str.strip,
+    ),
+    "image_url": (
+        [
+            (
+                "og_image",
+                Rule(
+                    "meta", attrs={"property": "og:image"}, extract="@content"
+                ),
+            )
+        ],
+        str.strip,
+    ),
+    "images_count": (
+        [
+            (
+                "show_all_link",
+                Rule(
+                    "a",
+                    ["show-all"],
+                    ancestor=("div", {"class": "action_disp_all_block"}),
+                ),
+            )
+        ],
+        parse_images_count,
+    ),
+    "car_number": (
+        [("state_num", Rule("span", class_contains="state-num"))],
+        str.strip,
+    ),
+    "car_vin": (
+        [
+            ("label_vin", Rule("span", class_contains="label-vin")),
+            (
+                "badges_vin",
+                Rule(
+                    "span",
+                    class_contains="common-text",
+                    ancestor=("span", {"id": "badgesVin"}),
+                ),
+            ),
+        ],
+        str.strip,
+    ),
+}
+
+# Values of fields whose fallbacks all missed
+CAR_FIELD_DEFAULTS = {
+    "notice": "",
+    "title": "",
+    "price_usd": None,
+    "odometer": None,
+    "username": "",
+    "image_url": "",
+    "images_count": 0,
+    "car_number": "",
+    "car_vin": "",
+}
+
+
+class CarExtractor:
+    """
+    Evaluates every field and fallback of a car page with one compiled
+    XPath. Rules of the same tag share one pass over the document with
+    their conditions OR-ed, rules under an ancestor search below it.
+    Candidates come back in document order and are assigned to the rules
+    of their tag that they match.
+    """
+
+    def __init__(self, fields=CAR_FIELDS, defaults=CAR_FIELD_DEFAULTS):
+        self.fields = fields
+        self.defaults = defaults
+        self.rules_by_tag = {}
+        conditions_by_tag = {}
+        paths = []
+        for field, (fallbacks, _) in fields.items():
+            for name, rule in fallbacks:
+                self.rules_by_tag.setdefault(rule.tag, []).append(
+                    ((field, name), rule)
+                )
+                if rule.ancestor:
+                    paths.append(rule.xpath())
+                else:
+                    conditions_by_tag.setdefault(rule.tag, []).append(
+                        rule.condition()
+                    )
+
+        for tag, conditions in conditions_by_tag.items():
+            if "" in conditions:
+                paths.append(descendant_path(tag, ""))
+            else:
+                paths.append(
+                    descendant_path(
+                        tag, " or ".join(f"({c})" for c in conditions)
+                    )
+                )
+        self.query = etree.XPath(" | ".join(paths))
+        self.hits = Counter()
+
+    def extract(self, root):
+        """
+        Return (values, hits) for an lxml root, hits naming the fallback
+        that produced each field or None when all of them missed.
+        """
+        found = {}
+        for el in self.query(root):
+            for key, rule in self.rules_by_tag[el.tag]:
+                if key in found or not rule.matches(el):
+                    continue
+                value = rule.value(el)
+                if value is not None:
+                    found[key] = value
+
+        values, hits = {}, {}
+        for field, (fallbacks, parse) in self.fields.items():
+            values[field], hits[field] = self.defaults.get(field), None
+            for name, _ in fallbacks:
+                if (field, name) in found:
+                    values[field] = parse(found[(field, name)])
+                    hits[field] = name
+                    break
+            self.hits[f"{field}/{hits[field] or 'missed'}"] += 1
+        return values, hits
@@ -0,0 +1,66 @@
+import re
+
+from logs.logger import logger
+from auto_ria_scraper.auto_ria_scraper.helpers.odometer_extractor import (
+    parse_odometer_text,
+)
+
+
+def normalize_title(title):
+    """Collapse whitespace so card and detail page titles compare equal."""
+    return " ".join((title or "").split())
+
+
+def extract_cards(response):
+    """
+    Extract listing cards (url, title, price, odometer) from a listing page.
+    """
+    cards = []
+    for card in response.css("section.ticket-item"):
+        link = card.css("a.address::attr(href)").get()
+        if not link:
+            continue
+
+        title = card.css("a.address::attr(title)").get() or " ".join(
+            card.css("a.address *::text").getall()
+        )
+        price_text = card.css("span[data-currency='USD']::text").get()
+        price_digits = re.sub(r"\D", "", price_text or "")
+
+        cards.append(
+            {
+                "url": response.urljoin(link),
+                "title": normalize_title(title),
+                "price_usd": int(price_digits) if price_digits else None,
+                "odometer": parse_odometer_text(
+                    card.css("li.js-race::text").get()
+                ),
+            }
+        )
+
+    logger.debug(f"Extracted {len(cards)} listing cards from {response.url}")
+    return cards
+
+
+def card_changed(card, snapshot):
+    """
+    Compare card fields against the last stored snapshot of the listing.
+    New listings and cards without comparable fields count as changed.
+    """
+    previous = snapshot.get(card["url"])
+    if previous is None:
+        return True
+
+    compared = False
+    for field in ("title", "price_usd", "odometer"):
+        value = card.get(field)
+        if value in (None, ""):
+            continue
+        compared = True
+        old_value = previous.get(field)
+        if field == "title":
+            old_value = normalize_title(old_value)
+        if value != old_value:
+            return True
+
+    return not compared
@@ -0,0 +1,130 @@
+import os
+
+import psutil
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+MEMORY_CHECK_SECONDS = int(os.getenv("MEMORY_CHECK_SECONDS", 10))
+# RSS of the spider and its Chrome above which discovery pauses
+MEMORY_PAUSE_MB = int(os.getenv("MEMORY_PAUSE_MB", 1500))
+# RSS of Chrome alone above which the driver is recycled
+MEMORY_RECYCLE_CHROME_MB = int(os.getenv("MEMORY_RECYCLE_CHROME_MB", 1000))
+
+CHROME_PROCESS_NAMES = ("chrome", "chromium", "chromedriver")
+
+
+def rss_mb(process):
+    try:
+        return process.memory_info().rss / 1024 / 1024
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return 0.0
+
+
+class MemoryMonitor:
+    """
+    Samples the RSS of this process and of its child processes, Chrome
+    and chromedriver counted separately. Drivers of a worker pool are
+    not our children, their memory is not seen here.
+    """
+
+    def __init__(
+        self,
+        pause_mb=MEMORY_PAUSE_MB,
+        recycle_chrome_mb=MEMORY_RECYCLE_CHROME_MB,
+    ):
+        self.process = psutil.Process()
+        self.pause_mb = pause_mb
+        self.recycle_chrome_mb = recycle_chrome_mb
+        self.paused = False
+        self.stats = {
+            "samples": 0,
+            "peak_rss_mb": 0.0,
+            "peak_spider_rss_mb": 0.0,
+            "peak_chrome_rss_mb": 0.0,
+            "pauses": 0,
+            "chrome_recycles": 0,
+        }
+
+    def sample(self):
+        """Return (total_mb, chrome_mb) and update the peaks."""
+        spider_mb = rss_mb(self.process)
+        chrome_mb = other_mb = 0.0
+        for child in self.process.children(recursive=True):
+            try:
+                name = child.name().lower()
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+            if any(chrome in name for chrome in CHROME_PROCESS_NAMES):
+                chrome_mb += rss_mb(child)
+            else:
+                other_mb += rss_mb(child)
+
+        total_mb = spider_mb + chrome_mb + other_mb
+        stats = self.stats
+        stats["samples"] += 1
+        stats["peak_rss_mb"] = max(stats["peak_rss_mb"], round(total_mb, 1))
+        stats["peak_spider_rss_mb"] = max(
+            stats["peak_spider_rss_mb"], round(spider_mb, 1)
+        )
+        stats["peak_chrome_rss_mb"] = max(
+            stats["peak_chrome_rss_mb"], round(chrome_mb, 1)
+        )
+        return total_mb, chrome_mb
+
+    def should_pause(self, total_mb):
+        """
+        Pause above pause_mb, resume below 90% of it so a process near
+        the threshold does not flap.
+        """
+        if not self.paused and total_mb >= self.pause_mb:
+            self.paused = True
+            self.stats["pauses"] += 1
+        elif self.paused and total_mb < self.pause_mb * 0.9:
+            self.paused = False
+        return self.paused
+
+    def should_recycle_chrome(self, chrome_mb):
+        if chrome_mb >= self.recycle_chrome_mb:
+            self.stats["chrome_recycles"] += 1
+            return True
+        return False
+
+
+def browser_process(driver):
+    """
+    Main Chrome process of a driver session, found by the profile
+    directory chromedriver started it with. None when Chrome does not
+    run on this host, e.g. behind a remote chromedriver.
+    """
+    user_data_dir = driver.capabilities.get("chrome", {}).get("userDataDir")
+    if not user_data_dir:
+        return None
+    flag = f"--user-data-dir={user_data_dir}"
+    for process in psutil.process_iter(["cmdline"]):
+        cmdline = process.info["cmdline"] or []
+        # Renderers and helpers share the flag but carry a --type
+        if flag in cmdline and not any(
+            arg.startswith("--type=") for arg in cmdline
+        ):
+            return process
+    return None
+
+
+def kill_browser(driver):
+    """Kill the Chrome of a driver session with its helper processes."""
+    try:
+        process = browser_process(driver)
+        if process is None:
+            return False
+        processes = [process, *process.children(recursive=True)]
+    except psutil.Error:
+        return False
+    for p in processes:
+        try:
+            p.kill()
+        except psutil.NoSuchProcess:
+            pass
+    psutil.wait_procs(processes, timeout=5)
+    return True
@@ -3,6 +3,26 @@ import re
 from logs.logger import logger
 
 
+def parse_odometer_text(odo_text):
+    """
+    Parse odometer text like '95 тыс. км' into kilometers.
+    Converts 'тыс' to thousands.
+    """
+    if not odo_text:
+        return None
+
+    odo_text = odo_text.lower().replace("\xa0", " ").strip()
+    match = re.search(r"([\d\s]+)", odo_text)
+    if match:
+        digits_str = match.group(1).replace(" ", "")
+        if digits_str.isdigit():
+            odo = int(digits_str)
+            if "тыс" in odo_text:
+                odo *= 1000
+            return odo
+    return None
+
+
 def extract_odometer(response):
     """
     Extract odometer reading from the response.
@@ -11,16 +31,9 @@ def extract_odometer(response):
     odo_text = response.css("div.bold.dhide::text").get()
     logger.debug(f"Extracting odometer from text: {odo_text}")
 
-    if odo_text:
-        odo_text = odo_text.lower().replace("\xa0", " ").strip()
-        match = re.search(r"([\d\s]+)", odo_text)
-        if match:
-            digits_str = match.group(1).replace(" ", "")
-            if digits_str.isdigit():
-                odo = int(digits_str)
-                if "тыс" in odo_text:
-                    odo *= 1000
-                logger.debug(f"Parsed odometer: {odo}")
-                return odo
+    odo = parse_odometer_text(odo_text)
+    if odo is not None:
+        logger.debug(f"Parsed odometer: {odo}")
+        return odo
     logger.warning("Odometer not found or invalid")
     return None
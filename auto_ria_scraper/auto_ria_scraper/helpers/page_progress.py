@@ -0,0 +1,59 @@
+import os
+from collections import Counter
+
+
+class PageProgress:
+    """
+    Finished listing pages for the chunk watchdog. A page is appended to
+    the progress file only once its car pages are done and every item
+    they produced was persisted by the output pipeline, so a killed chunk
+    is restarted on every page whose items could have been lost with it.
+    """
+
+    def __init__(self, progress_file=None):
+        self.progress_file = progress_file
+        # Items yielded for a page and not through the pipelines yet
+        self.pending_items = Counter()
+        self.item_pages = {}
+        # Pages whose car pages are done, waiting for their items
+        self.finished = set()
+        # Pages whose items all reached the output, not persisted yet
+        self.stored = []
+
+    def track_item(self, item, page_key):
+        """Count an item yielded for a listing page, return it."""
+        if page_key is not None:
+            self.pending_items[page_key] += 1
+            self.item_pages[id(item)] = page_key
+        return item
+
+    def item_processed(self, item):
+        """An item was stored, dropped or failed in the pipelines."""
+        page_key = self.item_pages.pop(id(item), None)
+        if page_key is None:
+            return
+        self.pending_items[page_key] -= 1
+        if page_key in self.finished:
+            self.stage(page_key)
+
+    def page_finished(self, page_key):
+        """All car pages of a listing page are done."""
+        self.finished.add(page_key)
+        self.stage(page_key)
+
+    def stage(self, page_key):
+        if self.pending_items[page_key] > 0:
+            return
+        self.finished.discard(page_key)
+        self.pending_items.pop(page_key, None)
+        self.stored.append(page_key)
+
+    def persisted(self):
+        """Everything handed to the output so far is on disk."""
+        pages, self.stored = self.stored, []
+        if not pages or not self.progress_file:
+            return
+        with open(self.progress_file, "a", encoding="utf-8") as f:
+            f.writelines(f"{url}\t{page}\n" for url, page in pages)
+            f.flush()
+            os.fsync(f.fileno())
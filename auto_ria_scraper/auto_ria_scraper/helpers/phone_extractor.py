@@ -1,4 +1,5 @@
 import re
+import time
 
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
@@ -7,6 +8,7 @@ from selenium.webdriver.common.by import By
 from selenium.common.exceptions import (
     TimeoutException,
     StaleElementReferenceException,
+    WebDriverException,
 )
 
 import logging
@@ -22,13 +24,18 @@ logger.setLevel(logging.DEBUG)  # set your own logger lev
 popup_handled = False
 
 
+class RevealBudgetExceeded(TimeoutException):
+    """The phone reveal took longer than its budget."""
+
+
 def handle_consent_popup(driver, wait_time=5):
     """
     Attempts to close or reject cookie/consent popups
-    using multiple strategies.
+    using multiple strategies. The selectors share wait_time in total,
+    outside the reveal budget, and the JavaScript removal always runs
+    when none of them matched.
     """
-    wait = WebDriverWait(driver, wait_time)
-
+    probe_deadline = time.monotonic() + wait_time
     consent_selectors = [
         "//p[contains(@class, 'fc-button-label') and text()='Consent']",
         "//p[contains(text(), 'Consent')]",
@@ -40,6 +47,8 @@ def handle_consent_popup(driver, wait_time=5):
     ]
 
     for xpath in consent_selectors:
+        # Once the probe time is spent each selector is checked once
+        wait = WebDriverWait(driver, probe_wait(probe_deadline))
         try:
             btn = wait.until(ec.element_to_be_clickable((By.XPATH, xpath)))
             btn.click()
@@ -49,6 +58,7 @@ def handle_consent_popup(driver, wait_time=5):
         except TimeoutException:
             continue
 
+    wait = WebDriverWait(driver, probe_wait(probe_deadline))
     try:
         overlay = wait.until(
             ec.element_to_be_clickable((By.CSS_SELECTOR, ".fc-dialog-overlay"))
@@ -77,15 +87,16 @@ def handle_consent_popup(driver, wait_time=5):
     return False
 
 
-def find_and_click_reveal_button(driver, wait_time=10):
+def find_and_click_reveal_button(driver, wait_time=10, deadline=None):
     reveal_selectors = [
         "a.phone_show_link",
         'button.size-large.conversion[data-action="showBottomPopUp"]',
     ]
     for selector in reveal_selectors:
+        wait = WebDriverWait(driver, remaining_wait(deadline, wait_time))
         try:
             logger.info(f"Waiting for element: {selector}")
-            element = WebDriverWait(driver, wait_time).until(
+            element = wait.until(
                 EC.element_to_be_clickable((By.CSS_SELECTOR, selector))
             )
             logger.info(f"Found reveal button: {selector}")
@@ -95,7 +106,9 @@ def find_and_click_reveal_button(driver, wait_time=10):
                 logger.warning(
                     "StaleElementReferenceException caught. Retrying click..."
                 )
-                element = WebDriverWait(driver, wait_time).until(
+                element = WebDriverWait(
+                    driver, remaining_wait(deadline, wait_time)
+                ).until(
                     EC.element_to_be_clickable((By.CSS_SELECTOR, selector))
                 )
                 driver.execute_script("arguments[0].click();", element)
@@ -109,7 +122,7 @@ def find_and_click_reveal_button(driver, wait_time=10):
     return False
 
 
-def wait_for_phone_display(driver, wait_time=10):
+def wait_for_phone_display(driver, wait_time=10, deadline=None):
     """
     Waits for a full phone number to be visible on the page.
     """
@@ -119,9 +132,10 @@ def wait_for_phone_display(driver, wait_time=10):
         "span.common-text.ws-pre-wrap.action",
     ]
     for selector in phone_number_selectors:
+        wait = WebDriverWait(driver, remaining_wait(deadline, wait_time))
         try:
             logger.info(f"Waiting for phone number element: {selector}")
-            element = WebDriverWait(driver, wait_time).until(
+            element = wait.until(
                 EC.presence_of_element_located((By.CSS_SELECTOR, selector))
             )
             logger.info(f"Phone number element appeared: {selector}")
@@ -137,19 +151,63 @@ def wait_for_phone_display(driver, wait_time=10):
     return None
 
 
-def extract_phone(driver, url, wait_time=10):
+def probe_wait(probe_deadline):
+    return max(0.0, probe_deadline - time.monotonic())
+
+
+def remaining_wait(deadline, wait_time):
+    """
+    Wait time left within the reveal budget. Raises RevealBudgetExceeded
+    once the budget is spent.
+    """
+    if deadline is None:
+        return wait_time
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise RevealBudgetExceeded("Phone reveal budget exceeded")
+    return min(wait_time, remaining)
+
+
+def driver_responsive(driver):
+    """Whether the browser still runs a trivial script."""
+    try:
+        return driver.execute_script("return 1;") == 1
+    except WebDriverException:
+        return False
+
+
+def extract_phone(driver, url, wait_time=10, budget=None, consent_wait=5):
+    """
+    Reveal and extract the phone number. The reveal steps after the
+    consent popup share a budget (seconds); a page that runs over it or
+    times out gives None while the driver still responds, only a driver
+    that does not raises TimeoutException.
+    """
     logger.info(f"Extracting phone number from {url}")
-    driver.get(url)
+    try:
+        driver.get(url)
+
+        global popup_handled
+        if not popup_handled:
+            handle_consent_popup(driver, consent_wait)
+            popup_handled = True
+            logger.info("Handled consent popup for the first time")
+        else:
+            wait_time = 8
+
+        deadline = time.monotonic() + budget if budget else None
+        return reveal_phone(driver, wait_time, deadline)
+    except TimeoutException as e:
+        if not driver_responsive(driver):
+            raise
+        logger.warning(f"Phone reveal timed out on {url}: {e}")
+        return None
 
-    global popup_handled
-    if not popup_handled:
-        popup_handled = handle_consent_popup(driver, wait_time)
-        logger.info("Handled consent popup for the first time")
-    else:
-        wait_time = 8
 
+def reveal_phone(driver, wait_time, deadline):
+    """Click the reveal button and read the phone number it shows."""
     # Step 1: Click on phone reveal trigger
-    clicked = find_and_click_reveal_button(driver, wait_time)
+    clicked = find_and_click_reveal_button(driver, wait_time, deadline)
     if not clicked:
         logger.error("Failed to click reveal button.")
         return None
@@ -157,7 +215,7 @@ def extract_phone(driver, url, wait_time=10):
         logger.info("Reveal button clicked successfully.")
 
     # Step 2: Wait for full phone number to appear
-    phone_element = wait_for_phone_display(driver, wait_time)
+    phone_element = wait_for_phone_display(driver, wait_time, deadline)
     if not phone_element:
         logger.error(
             "Phone element did not appear after clicking reveal button."
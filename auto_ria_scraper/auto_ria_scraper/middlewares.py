@@ -3,8 +3,17 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import os
+import statistics
+from collections import Counter
+
 from scrapy import signals
 
+from auto_ria_scraper.auto_ria_scraper.transport import (
+    TRANSPORT_ACCEPT_ENCODING,
+)
+from utils.run_report import update_run_report
+
 # useful for handling different item types with a single interface
 
 
@@ -97,3 +106,48 @@ class AutoRiaScraperDownloaderMiddleware:
 
     def spider_opened(self, spider):
         spider.logger.info("Spider opened: %s" % spider.name)
+
+
+class TransportMiddleware:
+    """
+    Offers TRANSPORT_ACCEPT_ENCODING and records the protocol and
+    download latency (request sent to response headers) of every
+    response, written to the run report when the spider closes.
+    """
+
+    def __init__(self):
+        self.latencies = {}
+        self.protocols = Counter()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        s = cls()
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+    def process_request(self, request, spider):
+        # Runs before HttpCompressionMiddleware, which keeps this header
+        request.headers.setdefault(
+            "Accept-Encoding", TRANSPORT_ACCEPT_ENCODING
+        )
+        return None
+
+    def process_response(self, request, response, spider):
+        latency = request.meta.get("download_latency")
+        if latency is not None:
+            kind = getattr(request.callback, "__name__", "parse")
+            self.latencies.setdefault(kind, []).append(latency)
+        self.protocols[response.protocol or "unknown"] += 1
+        return response
+
+    def spider_closed(self, spider):
+        report = {"protocols": dict(self.protocols)}
+        for kind, latencies in self.latencies.items():
+            latencies.sort()
+            report[f"{kind}_latency_ms"] = {
+                "requests": len(latencies),
+                "p50": round(statistics.median(latencies) * 1000),
+                "p95": round(latencies[int(len(latencies) * 0.95)] * 1000),
+                "max": round(latencies[-1] * 1000),
+            }
+        update_run_report(f"transport_spider_{os.getpid()}", report)
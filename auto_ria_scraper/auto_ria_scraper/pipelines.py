@@ -5,8 +5,163 @@
 
 
 # useful for handling different item types with a single interface
+import os
+
+from scrapy import signals
+from scrapy.exceptions import DropItem
+
+from auto_ria_scraper.auto_ria_scraper.signals import items_persisted
+from logs.logger import logger
+from utils.chunk_store import (
+    CHUNK_FRAME_RECORDS,
+    CHUNK_FSYNC_SECONDS,
+    ChunkWriter,
+    remove_chunk_store,
+)
+from utils.dedup import DEDUP_INDEX_FILE, DedupIndex, record_keys
+from utils.run_report import update_run_report
 
 
 class AutoRiaScraperPipeline:
     def process_item(self, item, spider):
         return item
+
+
+class DedupPipeline:
+    """
+    Drop listings already scraped in this run by any spider process,
+    keyed on listing id from the URL and then on VIN.
+
+    Keys of this process's items go to the shared index only once the
+    items are persisted. A chunk killed before that is restarted on the
+    same pages, which must not drop the items lost with it.
+    """
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        pipeline = cls()
+        crawler.signals.connect(
+            pipeline.item_scraped, signal=signals.item_scraped
+        )
+        crawler.signals.connect(
+            pipeline.items_persisted, signal=items_persisted
+        )
+        # The last items are persisted while the spider closes
+        crawler.signals.connect(
+            pipeline.engine_stopped, signal=signals.engine_stopped
+        )
+        return pipeline
+
+    def open_spider(self, spider):
+        self.index = DedupIndex(DEDUP_INDEX_FILE)
+        # Keys of items stored by this process
+        self.local = DedupIndex()
+        self.unpersisted = []
+
+    def process_item(self, item, spider):
+        if self.index.contains(item) or self.local.seen_before(item):
+            raise DropItem(f"Duplicate listing in this run: {item['url']}")
+        return item
+
+    def item_scraped(self, item):
+        self.unpersisted.extend(key for _, key in record_keys(item))
+
+    def items_persisted(self):
+        self.index.register(self.unpersisted)
+        self.unpersisted = []
+
+    def close_spider(self, spider):
+        duplicates = {
+            kind: self.index.duplicates[kind] + self.local.duplicates[kind]
+            for kind in self.index.duplicates
+        }
+        logger.info(
+            f"Dropped {sum(duplicates.values())} duplicate listing(s)"
+        )
+        update_run_report(f"dedup_spider_{os.getpid()}", duplicates)
+
+    def engine_stopped(self):
+        self.index.close()
+        self.local.close()
+
+
+class ChunkStorePipeline:
+    """
+    Append items to the compressed chunk store set in CHUNK_STORE_FILE,
+    sending items_persisted after every fsync.
+    """
+
+    def __init__(
+        self,
+        path,
+        crawler,
+        frame_records=CHUNK_FRAME_RECORDS,
+        fsync_seconds=CHUNK_FSYNC_SECONDS,
+    ):
+        self.path = path
+        self.crawler = crawler
+        self.frame_records = frame_records
+        self.fsync_seconds = fsync_seconds
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        return cls(
+            settings.get("CHUNK_STORE_FILE"),
+            crawler,
+            settings.getint("CHUNK_FRAME_RECORDS", CHUNK_FRAME_RECORDS),
+            settings.getfloat("CHUNK_FSYNC_SECONDS", CHUNK_FSYNC_SECONDS),
+        )
+
+    def open_spider(self, spider):
+        remove_chunk_store(self.path)
+        self.writer = ChunkWriter(
+            self.path,
+            frame_records=self.frame_records,
+            fsync_seconds=self.fsync_seconds,
+            on_sync=self.synced,
+        )
+
+    def synced(self):
+        self.crawler.signals.send_catch_log(items_persisted)
+
+    def process_item(self, item, spider):
+        self.writer.write(dict(item))
+        return item
+
+    def close_spider(self, spider):
+        self.writer.close()
+        logger.info(f"Stored {self.writer.records} items in {self.path}")
+
+
+class FeedProgressPipeline:
+    """
+    Plain JSON feeds are only readable once Scrapy finishes writing them
+    at close, so their items count as persisted only then. A chunk killed
+    earlier is restarted on all of its pages.
+    """
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        pipeline = cls(crawler)
+        crawler.signals.connect(
+            pipeline.feed_closed, signal=signals.feed_exporter_closed
+        )
+        return pipeline
+
+    def process_item(self, item, spider):
+        return item
+
+    def feed_closed(self):
+        failed = [
+            key
+            for key in self.crawler.stats.get_stats()
+            if key.startswith("feedexport/failed_count")
+        ]
+        if failed:
+            logger.error("Feed export failed, listing pages not committed")
+            return
+        self.crawler.signals.send_catch_log(items_persisted)
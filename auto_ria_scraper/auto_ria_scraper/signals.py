@@ -0,0 +1,4 @@
+# Sent by the output pipelines once every item they stored so far is on
+# disk. Listing page progress and dedup keys shared with the other spider
+# processes are only committed then, see pipelines.py.
+items_persisted = object()
@@ -1,42 +1,217 @@
+import hashlib
+import json
 import re
 import os
+import threading
+import time
 
 import scrapy
 from dotenv import load_dotenv
+from scrapy import signals
+from w3lib.url import add_or_replace_parameter
 from selenium import webdriver
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.chrome.options import Options
+from scrapy.utils.defer import maybe_deferred_to_future
+from twisted.internet.task import LoopingCall, deferLater
 
 from logs.logger import logger
-from auto_ria_scraper.auto_ria_scraper.helpers.odometer_extractor import (
-    extract_odometer,
+from auto_ria_scraper.auto_ria_scraper.helpers.car_extractor import (
+    CarExtractor,
 )
+from auto_ria_scraper.auto_ria_scraper.helpers.card_extractor import (
+    card_changed,
+    extract_cards,
+)
+from auto_ria_scraper.auto_ria_scraper.helpers.memory_monitor import (
+    MEMORY_CHECK_SECONDS,
+    MemoryMonitor,
+    kill_browser,
+)
+from auto_ria_scraper.auto_ria_scraper.helpers.page_progress import (
+    PageProgress,
+)
+from auto_ria_scraper.auto_ria_scraper.helpers import phone_extractor
 from auto_ria_scraper.auto_ria_scraper.helpers.phone_extractor import (
     extract_phone,
     clean_phone,
 )
-from auto_ria_scraper.auto_ria_scraper.helpers.price_extractor import (
-    extract_price,
-)
+from auto_ria_scraper.auto_ria_scraper.signals import items_persisted
+from utils.dedup import listing_id_from_url
+from utils.run_report import update_run_report
 
 
 load_dotenv()
 PAGE_TO_SCRAPE = int(os.getenv("PAGE_TO_SCRAPE", 3))
+DELTA_DETECTION = os.getenv("DELTA_DETECTION", "false").lower() == "true"
+LISTING_SNAPSHOT_FILE = os.getenv(
+    "LISTING_SNAPSHOT_FILE", "listing_snapshot.json"
+)
+PARALLEL_DISCOVERY = (
+    os.getenv("PARALLEL_DISCOVERY", "false").lower() == "true"
+)
+LISTING_URL = "https://auto.ria.com/car/used/"
+# Car pages are scheduled ahead of listing pages to drain the queue first
+CAR_REQUEST_PRIORITY = 1
+# Deadlines that keep a hung Chrome from freezing the spider
+PAGE_LOAD_TIMEOUT = int(os.getenv("PAGE_LOAD_TIMEOUT", 30))
+SCRIPT_TIMEOUT = int(os.getenv("SCRIPT_TIMEOUT", 15))
+PHONE_REVEAL_BUDGET = int(os.getenv("PHONE_REVEAL_BUDGET", 60))
+PHONE_MAX_RETRIES = int(os.getenv("PHONE_MAX_RETRIES", 1))
+# Time the first car page spends looking for the consent popup
+CONSENT_PROBE_SECONDS = int(os.getenv("CONSENT_PROBE_SECONDS", 5))
+# Wait for a remote chromedriver to end a wedged session
+DRIVER_QUIT_TIMEOUT = 10
+# Car pages are saved here as HTML fixtures for the extractor benchmark
+SAVE_FIXTURES_DIR = os.getenv("SAVE_FIXTURES_DIR", "")
+DELETED_NOTICE_RE = re.compile(r"удалено.*не принимает участия")
+# Memory-bounded mode: disk-backed request queues, a cap on pending car
+# pages and RSS guardrails, see helpers/memory_monitor.py
+MEMORY_BOUNDED = os.getenv("MEMORY_BOUNDED", "false").lower() == "true"
+MAX_PENDING_CARS = int(os.getenv("MAX_PENDING_CARS", 200))
+CRAWL_QUEUE_DIR = os.getenv("CRAWL_QUEUE_DIR", "crawl_queues")
+# Car links a listing page in flight is expected to add
+LISTING_PAGE_CARS = 20
+BACKPRESSURE_POLL_SECONDS = 1
+
+
+async def sleep(seconds):
+    """Reactor-agnostic sleep for start()."""
+    from twisted.internet import reactor
+
+    await maybe_deferred_to_future(
+        deferLater(reactor, seconds, lambda: None)
+    )
 
 
 class AutoriaSpider(scrapy.Spider):
     name = "autoria"
     allowed_domains = ["auto.ria.com"]
-    start_urls = ["https://auto.ria.com/car/used/"]
-
-    def __init__(self, start_page=1, end_page=1, *args, **kwargs):
+    start_urls = [LISTING_URL]
+
+    def __init__(
+        self,
+        start_page=1,
+        end_page=1,
+        listing_ranges=None,
+        driver_url=None,
+        progress_file=None,
+        *args,
+        **kwargs,
+    ):
         super().__init__(*args, **kwargs)
+        # A warm chromedriver service may be provided by the worker pool
+        self.driver_url = driver_url
         self.driver = self.get_chrome_driver(headless=False)
         self.start_page = int(start_page)
         self.end_page = int(end_page)
         self.page_counter = self.start_page
-        self.start_urls = [
-            f"https://auto.ria.com/car/used/?page={self.start_page}"
+        # (listing_url, start_page, end_page) ranges, e.g. filter shards
+        self.listing_ranges = listing_ranges or [
+            (LISTING_URL, self.start_page, self.end_page)
         ]
+        self.discovery = PARALLEL_DISCOVERY or listing_ranges is not None
+        # Last listing page with cars per listing URL, known once an empty
+        # page is found
+        self.last_listing_pages = {}
+        self.start_urls = [self.listing_page_url(self.start_page)]
+        self.snapshot = self.load_snapshot() if DELTA_DETECTION else None
+        # Finished listing pages are appended to progress_file for the
+        # chunk watchdog once their items are persisted
+        self.progress = PageProgress(progress_file)
+        self.pending_cars_by_page = {}
+        self.extractor = CarExtractor()
+        self.memory = MemoryMonitor()
+        self.memory_check = None
+        # Listing pages requested but not parsed yet, and next listing
+        # pages held back until pending car pages drain
+        self.pending_listing_pages = 0
+        self.held_listing_requests = []
+        self.backpressure_holds = 0
+        self.started = time.monotonic()
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        for signal in (
+            signals.item_scraped,
+            signals.item_dropped,
+            signals.item_error,
+        ):
+            crawler.signals.connect(
+                spider.progress.item_processed, signal=signal
+            )
+        crawler.signals.connect(
+            spider.progress.persisted, signal=items_persisted
+        )
+        crawler.signals.connect(
+            spider.request_dropped, signal=signals.request_dropped
+        )
+        return spider
+
+    def load_snapshot(self):
+        """Load the last stored card fields of known listings by URL."""
+        if not os.path.exists(LISTING_SNAPSHOT_FILE):
+            logger.warning(
+                f"Listing snapshot '{LISTING_SNAPSHOT_FILE}' not found, "
+                f"all listings will be followed"
+            )
+            return {}
+
+        with open(LISTING_SNAPSHOT_FILE, "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+        logger.info(f"Loaded snapshot of {len(snapshot)} known listings")
+        return snapshot
+
+    @staticmethod
+    def listing_page_url(page, listing_url=LISTING_URL):
+        return add_or_replace_parameter(listing_url, "page", str(page))
+
+    async def start(self):
+        """
+        Yield the first listing page, or in parallel discovery mode all
+        listing pages of the assigned range so they download concurrently.
+        """
+        self.memory_check = LoopingCall(self.check_memory)
+        self.memory_check.start(MEMORY_CHECK_SECONDS, now=False)
+
+        if not self.discovery:
+            async for item_or_request in super().start():
+                yield item_or_request
+            return
+
+        for listing_url, start_page, end_page in self.listing_ranges:
+            logger.info(
+                f"Discovering listing pages {start_page} to {end_page} "
+                f"of {listing_url} concurrently"
+            )
+            for page in range(start_page, end_page + 1):
+                # Start requests are consumed lazily, so an empty page found
+                # meanwhile stops the remaining pages from being scheduled
+                last_page = self.last_listing_pages.get(listing_url)
+                if last_page is not None and page > last_page:
+                    logger.info(
+                        f"Stopping discovery of {listing_url} "
+                        f"after empty page {last_page + 1}"
+                    )
+                    break
+
+                if self.discovery_paused():
+                    self.backpressure_holds += 1
+                    logger.info(
+                        f"Holding listing page {page} until pending car "
+                        f"pages drain"
+                    )
+                    while self.discovery_paused():
+                        await sleep(BACKPRESSURE_POLL_SECONDS)
+
+                self.pending_listing_pages += 1
+                yield scrapy.Request(
+                    self.listing_page_url(page, listing_url),
+                    callback=self.parse_listing_page,
+                    errback=self.listing_failed,
+                    cb_kwargs={"page": page, "listing_url": listing_url},
+                )
 
     def get_chrome_driver(self, headless=False):
         chrome_options = Options()
@@ -67,24 +242,155 @@ class AutoriaSpider(scrapy.Spider):
 
         chrome_options.page_load_strategy = "normal"
 
-        driver = webdriver.Chrome(options=chrome_options)
+        if self.driver_url:
+            driver = webdriver.Remote(
+                command_executor=self.driver_url, options=chrome_options
+            )
+        else:
+            driver = webdriver.Chrome(options=chrome_options)
+
+        driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+        driver.set_script_timeout(SCRIPT_TIMEOUT)
         return driver
 
+    def recycle_driver(self, wedged=True):
+        """Replace the Chrome driver, killing it when it is wedged."""
+        logger.warning(
+            f"Recycling {'wedged' if wedged else 'oversized'} Chrome driver"
+        )
+        if wedged:
+            self.kill_driver()
+        else:
+            try:
+                self.driver.quit()
+            except Exception as e:
+                logger.warning(f"Failed to quit Chrome driver: {e}")
+        # The new browser starts without the consent cookie
+        phone_extractor.popup_handled = False
+        self.driver = self.get_chrome_driver(headless=False)
+
+    def kill_driver(self):
+        """
+        Stop a wedged driver without talking to its hung browser. Chrome
+        is killed directly: under a chromedriver of our own it is its
+        child, under the worker pool's shared chromedriver it is not.
+        """
+        if not kill_browser(self.driver):
+            logger.warning("Chrome process of the driver not found")
+
+        service = getattr(self.driver, "service", None)
+        if service and service.process:
+            service.process.kill()
+            return
+
+        # A remote chromedriver is shared, only end our session on it.
+        # With the browser gone it answers at once, but do not hang on it
+        driver = self.driver
+
+        def quit_session():
+            try:
+                driver.quit()
+            except Exception as e:
+                logger.warning(f"Failed to end remote driver session: {e}")
+
+        quit_thread = threading.Thread(target=quit_session, daemon=True)
+        quit_thread.start()
+        quit_thread.join(DRIVER_QUIT_TIMEOUT)
+        if quit_thread.is_alive():
+            logger.warning("Remote driver session did not end in time")
+
+    def closed(self, reason):
+        """Quit the browser session, drivers of a worker pool outlive us."""
+        logger.info(f"Spider closed ({reason}), quitting Chrome driver")
+        update_run_report(
+            f"extractor_spider_{os.getpid()}", dict(self.extractor.hits)
+        )
+        stats = self.crawler.stats
+        update_run_report(
+            f"crawl_spider_{os.getpid()}",
+            {
+                "seconds": round(time.monotonic() - self.started, 2),
+                **{
+                    key: stats.get_value(f"autoria/{key}", 0)
+                    for key in (
+                        "listing_pages",
+                        "car_pages",
+                        "cars",
+                        "phone_attempts",
+                        "phones_found",
+                    )
+                },
+            },
+        )
+        if self.memory_check and self.memory_check.running:
+            self.memory_check.stop()
+        self.memory.sample()
+        update_run_report(
+            f"memory_spider_{os.getpid()}",
+            {
+                **self.memory.stats,
+                "memory_bounded": MEMORY_BOUNDED,
+                "backpressure_holds": self.backpressure_holds,
+            },
+        )
+        try:
+            self.driver.quit()
+        except Exception as e:
+            logger.warning(f"Failed to quit Chrome driver: {e}")
+
+    def pending_cars(self):
+        return sum(self.pending_cars_by_page.values())
+
+    def discovery_paused(self):
+        """
+        Whether listing expansion waits: too many car pages pending, or
+        memory above the threshold while car pages can still drain.
+        """
+        if not MEMORY_BOUNDED:
+            return False
+        pending = (
+            self.pending_cars()
+            + self.pending_listing_pages * LISTING_PAGE_CARS
+        )
+        return pending >= MAX_PENDING_CARS or (
+            self.memory.paused and pending > 0
+        )
+
+    def release_listing_requests(self):
+        while self.held_listing_requests and not self.discovery_paused():
+            self.crawler.engine.crawl(self.held_listing_requests.pop(0))
+
+    def check_memory(self):
+        total_mb, chrome_mb = self.memory.sample()
+        if not MEMORY_BOUNDED:
+            return
+
+        was_paused = self.memory.paused
+        if self.memory.should_pause(total_mb) != was_paused:
+            logger.warning(
+                f"RSS {total_mb:.0f} MB, "
+                f"{'pausing' if self.memory.paused else 'resuming'} "
+                f"listing discovery"
+            )
+        if self.memory.should_recycle_chrome(chrome_mb):
+            logger.warning(f"Chrome RSS {chrome_mb:.0f} MB")
+            self.recycle_driver(wedged=False)
+        self.release_listing_requests()
+
+    def count(self, key):
+        self.crawler.stats.inc_value(f"autoria/{key}")
+
     def parse(self, response):
         """Extract car links and follow pagination to next listing pages."""
+        self.count("listing_pages")
         logger.info(
             f"Parsing listing page {self.page_counter}/{PAGE_TO_SCRAPE}: "
             f"{response.url}"
         )
 
-        car_links = response.css("a.address::attr(href)").getall()
-        for link in car_links:
-            # Skip links that contain "/newauto/"
-            if "/newauto/" in link:
-                logger.debug(f"Skipping new car URL: {link}")
-                continue
-
-            yield response.follow(link, callback=self.parse_car)
+        yield from self.follow_car_links(
+            response, (LISTING_URL, self.page_counter)
+        )
 
         if self.page_counter < self.end_page:
             next_page = response.css("a.js-next::attr(href)").get()
@@ -93,67 +399,176 @@ class AutoriaSpider(scrapy.Spider):
                 logger.info(
                     f"Following next page ({self.page_counter}): {next_page}"
                 )
-                yield response.follow(next_page, callback=self.parse)
+                request = response.follow(next_page, callback=self.parse)
+                if self.discovery_paused():
+                    self.backpressure_holds += 1
+                    logger.info("Holding next page until car pages drain")
+                    self.held_listing_requests.append(request)
+                else:
+                    yield request
         else:
             logger.info("Reached PAGE_TO_SCRAPE limit")
 
-    def parse_car(self, response):
+    def parse_listing_page(self, response, page, listing_url=LISTING_URL):
+        """Extract car links from a listing page fetched in discovery mode."""
+        logger.info(f"Parsing listing page {page}: {response.url}")
+        self.count("listing_pages")
+        self.pending_listing_pages -= 1
+
+        if not response.css("a.address"):
+            last_page = self.last_listing_pages.get(listing_url)
+            if last_page is None or page <= last_page:
+                self.last_listing_pages[listing_url] = page - 1
+            logger.info(f"Listing page {page} has no cars: {response.url}")
+            self.mark_page_done((listing_url, page))
+            return
+
+        yield from self.follow_car_links(response, (listing_url, page))
+
+    def follow_car_links(self, response, page_key):
+        """Follow car pages linked from a listing page."""
+        # Held while links are followed, so car pages dropped by the
+        # scheduler meanwhile cannot finish the page early
+        self.pending_cars_by_page[page_key] = (
+            self.pending_cars_by_page.get(page_key, 0) + 1
+        )
+        if self.snapshot is not None:
+            yield from self.follow_changed_cards(response, page_key)
+        else:
+            car_links = response.css("a.address::attr(href)").getall()
+            for link in car_links:
+                # Skip links that contain "/newauto/"
+                if "/newauto/" in link:
+                    logger.debug(f"Skipping new car URL: {link}")
+                    continue
+
+                yield self.car_request(response, link, page_key)
+
+        self.car_done(page_key)
+
+    def car_request(self, response, url, page_key):
+        """Request a car page, counted as pending for its listing page."""
+        self.pending_cars_by_page[page_key] = (
+            self.pending_cars_by_page.get(page_key, 0) + 1
+        )
+        return response.follow(
+            url,
+            callback=self.parse_car,
+            errback=self.car_failed,
+            priority=CAR_REQUEST_PRIORITY,
+            cb_kwargs={"page_key": page_key},
+        )
+
+    def car_done(self, page_key):
+        if page_key is None:
+            return
+        self.pending_cars_by_page[page_key] -= 1
+        if not self.pending_cars_by_page[page_key]:
+            self.mark_page_done(page_key)
+        self.release_listing_requests()
+
+    def request_dropped(self, request):
+        """A request the scheduler rejected, e.g. a duplicate car page."""
+        if request.callback == self.parse_car:
+            logger.debug(f"Car page already requested: {request.url}")
+            self.car_done(request.cb_kwargs.get("page_key"))
+        elif request.callback == self.parse_listing_page:
+            self.pending_listing_pages -= 1
+
+    def listing_failed(self, failure):
+        logger.error(f"Listing page request failed: {failure.request.url}")
+        self.pending_listing_pages -= 1
+
+    def car_failed(self, failure):
+        logger.error(f"Car page request failed: {failure.request.url}")
+        self.car_done(failure.request.cb_kwargs.get("page_key"))
+
+    def mark_page_done(self, page_key):
+        """
+        A listing page whose car pages are all finished. It is committed
+        to the progress file once its items are persisted.
+        """
+        self.pending_cars_by_page.pop(page_key, None)
+        self.progress.page_finished(page_key)
+
+    def follow_changed_cards(self, response, page_key):
+        """
+        Follow only new or changed listings, mark the rest as seen.
+        """
+        skipped = 0
+        for card in extract_cards(response):
+            if "/newauto/" in card["url"]:
+                logger.debug(f"Skipping new car URL: {card['url']}")
+                continue
+
+            if card_changed(card, self.snapshot):
+                yield self.car_request(response, card["url"], page_key)
+            else:
+                skipped += 1
+                yield self.progress.track_item(
+                    {"url": card["url"], "unchanged": True}, page_key
+                )
+
+        logger.info(f"Skipped {skipped} unchanged listings on {response.url}")
+
+    def parse_car(self, response, page_key=None):
         """Parse car details and extract data from car page."""
+        try:
+            yield from self.parse_car_page(response, page_key)
+        finally:
+            self.car_done(page_key)
+
+    def save_fixture(self, response):
+        os.makedirs(SAVE_FIXTURES_DIR, exist_ok=True)
+        name = (
+            listing_id_from_url(response.url)
+            or hashlib.sha1(response.url.encode()).hexdigest()
+        )
+        path = os.path.join(SAVE_FIXTURES_DIR, f"{name}.html")
+        with open(path, "wb") as f:
+            f.write(response.body)
+
+    def parse_car_page(self, response, page_key):
         logger.info(f"[parse_car] Parsing car page: {response.url}")
+        self.count("car_pages")
+        if SAVE_FIXTURES_DIR:
+            self.save_fixture(response)
 
-        notice_text = " ".join(
-            response.css("div.notice_head *::text").getall()
-        ).strip()
+        fields, hits = self.extractor.extract(response.selector.root)
+        missed = [field for field, hit in hits.items() if hit is None]
+        if missed:
+            logger.debug(f"No selector matched {missed} on {response.url}")
 
-        if re.search(r"удалено.*не принимает участия", notice_text.lower()):
+        notice_text = fields["notice"]
+        if DELETED_NOTICE_RE.search(notice_text.lower()):
             logger.info(
                 f"Skipping deleted listing: {response.url} "
                 f"— notice: {notice_text}"
             )
             return
 
-        logger.info(f"[parse_car] Parsing car page: {response.url}")
-
-        main_image_url = response.css(
-            'meta[property="og:image"]::attr(content)'
-        ).get(default="")
-
-        photos_text = response.css(
-            "div.action_disp_all_block a.show-all::text"
-        ).get(default="")
-
-        # Extract number from the text (e.g. "Смотреть все 62 фотографий")
-        match = re.search(r"\d+", photos_text)
-        images_count = int(match.group()) - 1 if match else 0
-
-        username_raw = (
-            response.css("div.seller_info_name a::text").get()
-            or response.css("div.seller_info_name::text").get()
-            or response.css("h4.seller_info_name a::text").get()
-            or ""
-        ).strip()
-        car_number = (
-            response.xpath("//span[contains(@class,'state-num')]/text()")
-            .get(default="")
-            .strip()
-        )
-        car_vin = (
-            response.xpath("//span[contains(@class, 'label-vin')]/text()")
-            .get(default="")
-            .strip()
-        )
-
-        if not car_vin:
-            car_vin = (
-                response.xpath(
-                    "//span[@id='badgesVin']//span[contains(@class, "
-                    "'common-text')]/text()"
-                )
-                .get(default="")
-                .strip()
+        self.count("phone_attempts")
+        try:
+            phone = extract_phone(
+                self.driver,
+                response.url,
+                budget=PHONE_REVEAL_BUDGET,
+                consent_wait=CONSENT_PROBE_SECONDS,
             )
-
-        phone = extract_phone(self.driver, response.url)
+        except (TimeoutException, WebDriverException) as e:
+            logger.error(f"Chrome driver wedged on {response.url}: {e}")
+            self.recycle_driver()
+            retries = response.meta.get("phone_retries", 0)
+            if retries < PHONE_MAX_RETRIES:
+                logger.warning(f"Re-queueing car page: {response.url}")
+                if page_key is not None:
+                    self.pending_cars_by_page[page_key] += 1
+                yield response.request.replace(
+                    dont_filter=True,
+                    meta={**response.meta, "phone_retries": retries + 1},
+                )
+                return
+            phone = None
 
         # Check if phone is a dict and contains 'main_phone'
         if isinstance(phone, dict) and "main_phone" in phone:
@@ -162,18 +577,20 @@ class AutoriaSpider(scrapy.Spider):
             raw_phone = phone  # assume it's a string
 
         cleaned_phone = clean_phone(raw_phone) if raw_phone else ""
+        if cleaned_phone:
+            self.count("phones_found")
 
         car_data = {
             "url": response.url,
-            "title": response.css("h1.head::text").get(default="").strip(),
-            "price_usd": extract_price(response),
-            "odometer": extract_odometer(response),
-            "username": username_raw,
+            "title": fields["title"],
+            "price_usd": fields["price_usd"],
+            "odometer": fields["odometer"],
+            "username": fields["username"],
             "phone_number": cleaned_phone,
-            "image_url": main_image_url,
-            "images_count": images_count,
-            "car_number": car_number,
-            "car_vin": car_vin,
+            "image_url": fields["image_url"],
+            "images_count": fields["images_count"],
+            "car_number": fields["car_number"],
+            "car_vin": fields["car_vin"],
             "datetime_found": (
                 response.headers.get("Date").decode("utf-8")
                 if response.headers.get("Date")
@@ -186,4 +603,5 @@ class AutoriaSpider(scrapy.Spider):
             + ", ".join(f"{k}='{v}'" for k, v in car_data.items())
         )
 
-        yield car_data
+        self.count("cars")
+        yield self.progress.track_item(car_data, page_key)
@@ -0,0 +1,86 @@
+import importlib.util
+import os
+import time
+
+from dotenv import load_dotenv
+from scrapy.resolver import CachingThreadedResolver, dnscache
+from twisted.internet.interfaces import IResolverSimple
+from zope.interface.declarations import implementer
+
+from logs.logger import logger
+
+
+load_dotenv()
+
+# Serve https through Scrapy's HTTP/2 handler, needs the h2 package
+TRANSPORT_HTTP2 = os.getenv("TRANSPORT_HTTP2", "false").lower() == "true"
+# Persistent connections kept to auto.ria.com per spider process
+TRANSPORT_POOL_SIZE = int(os.getenv("TRANSPORT_POOL_SIZE", 8))
+# Accept-Encoding offered, "identity" turns decompression off
+TRANSPORT_ACCEPT_ENCODING = os.getenv(
+    "TRANSPORT_ACCEPT_ENCODING", "gzip, deflate"
+)
+# Pages larger than this once decompressed are dropped
+TRANSPORT_MAX_PAGE_MB = int(os.getenv("TRANSPORT_MAX_PAGE_MB", 20))
+DNS_CACHE_TTL = int(os.getenv("DNS_CACHE_TTL", 300))
+DNS_TIMEOUT = int(os.getenv("DNS_TIMEOUT", 10))
+
+H2_DOWNLOAD_HANDLER = "scrapy.core.downloader.handlers.http2.H2DownloadHandler"
+
+
+def http2_available():
+    return importlib.util.find_spec("h2") is not None
+
+
+@implementer(IResolverSimple)
+class TTLCachingResolver(CachingThreadedResolver):
+    """
+    Scrapy's caching resolver with entries expiring after DNS_CACHE_TTL
+    seconds, so a long crawl follows a host that moved.
+    """
+
+    def __init__(self, reactor, cache_size, timeout, ttl=DNS_CACHE_TTL):
+        super().__init__(reactor, cache_size, timeout)
+        self.ttl = ttl
+        self.expires = {}
+
+    @classmethod
+    def from_crawler(cls, crawler, reactor):
+        resolver = super().from_crawler(crawler, reactor)
+        resolver.ttl = crawler.settings.getfloat(
+            "DNS_CACHE_TTL", DNS_CACHE_TTL
+        )
+        return resolver
+
+    def getHostByName(self, name, timeout=()):
+        if name in dnscache and time.monotonic() >= self.expires.get(name, 0):
+            del dnscache[name]
+        return super().getHostByName(name, timeout)
+
+    def _cache_result(self, result, name):
+        self.expires[name] = time.monotonic() + self.ttl
+        return super()._cache_result(result, name)
+
+
+def transport_settings():
+    """Scrapy settings of the configured transport profile."""
+    settings = {
+        "CONCURRENT_REQUESTS_PER_DOMAIN": TRANSPORT_POOL_SIZE,
+        "DNSCACHE_ENABLED": True,
+        "DNS_RESOLVER": (
+            "auto_ria_scraper.auto_ria_scraper.transport.TTLCachingResolver"
+        ),
+        "DNS_CACHE_TTL": DNS_CACHE_TTL,
+        "DNS_TIMEOUT": DNS_TIMEOUT,
+        "DOWNLOAD_MAXSIZE": TRANSPORT_MAX_PAGE_MB * 1024 * 1024,
+        "COMPRESSION_ENABLED": TRANSPORT_ACCEPT_ENCODING != "identity",
+    }
+    if TRANSPORT_HTTP2:
+        if http2_available():
+            settings["DOWNLOAD_HANDLERS"] = {"https": H2_DOWNLOAD_HANDLER}
+        else:
+            logger.warning(
+                "TRANSPORT_HTTP2 is set but the h2 package is missing, "
+                "using HTTP/1.1"
+            )
+    return settings
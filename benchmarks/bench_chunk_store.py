@@ -0,0 +1,91 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic import generate_records
+from utils.chunk_store import (
+    INDEX_EXTENSION,
+    ChunkWriter,
+    iter_chunk_records,
+)
+
+
+def write_json(records, path):
+    """The merged output.json, one JSON array with indent=2."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(records, f, ensure_ascii=False, indent=2)
+
+
+def read_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return sum(1 for _ in json.load(f))
+
+
+def write_chunk_store(records, path):
+    # No periodic fsync inside the timing, the store syncs once on close
+    with ChunkWriter(path, fsync_seconds=float("inf")) as writer:
+        for record in records:
+            writer.write(record)
+
+
+def read_chunk_store(path):
+    return sum(1 for _ in iter_chunk_records(path))
+
+
+FORMATS = {
+    "json": (".json", write_json, read_json),
+    "chunk_store": (".jsonl.zst", write_chunk_store, read_chunk_store),
+}
+
+
+def file_size(path):
+    size = os.path.getsize(path)
+    if os.path.exists(path + INDEX_EXTENSION):
+        size += os.path.getsize(path + INDEX_EXTENSION)
+    return size
+
+
+def best_time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare output size and throughput of JSON files "
+        "and the compressed chunk store."
+    )
+    parser.add_argument("--records", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    records = generate_records(args.records)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, (extension, write, read) in FORMATS.items():
+            path = os.path.join(tmp_dir, f"output{extension}")
+
+            def write_once():
+                for file_path in (path, path + INDEX_EXTENSION):
+                    if os.path.exists(file_path):
+                        os.remove(file_path)
+                write(records, path)
+
+            write_time = best_time(write_once, args.repeat)
+            read_time = best_time(lambda: read(path), args.repeat)
+            size = file_size(path)
+            print(
+                f"{name:>12}: {size / 1024 / 1024:8.2f} MB  "
+                f"write {args.records / write_time:>10,.0f} rec/s  "
+                f"read {args.records / read_time:>10,.0f} rec/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+import argparse
+import asyncio
+import json
+import os
+import resource
+import time
+from datetime import datetime
+
+from benchmarks.synthetic import iter_record_batches
+from database.connection import Database
+from database.normalize import CAR_COLUMNS, normalize_records
+from database.save import (
+    INSERT_CARS_QUERY,
+    SKIP_DUPLICATES,
+    UPSERT_CAR_CONFLICT,
+    keep_last_per_listing,
+)
+
+
+BENCH_TABLE = "cars_bench"
+LOAD_COLUMNS = CAR_COLUMNS + ["last_seen"]
+
+INSERT_ROW_QUERY = f"""
+    INSERT INTO {BENCH_TABLE} ({", ".join(LOAD_COLUMNS)})
+    VALUES ({", ".join(f"${i}" for i in range(1, len(LOAD_COLUMNS) + 1))})
+    ON CONFLICT (listing_key) DO NOTHING
+"""
+
+
+def bench_query(query):
+    return query.replace("INSERT INTO cars ", f"INSERT INTO {BENCH_TABLE} ")
+
+
+def to_rows(batch, run_started):
+    columns = normalize_records(batch)
+    return [
+        row + (run_started,)
+        for row in zip(*(columns[name] for name in CAR_COLUMNS))
+    ]
+
+
+async def load_per_row(conn, batch, run_started):
+    for row in to_rows(batch, run_started):
+        await conn.execute(INSERT_ROW_QUERY, *row)
+
+
+async def load_executemany(conn, batch, run_started):
+    await conn.executemany(INSERT_ROW_QUERY, to_rows(batch, run_started))
+
+
+async def load_copy(conn, batch, run_started):
+    await conn.copy_records_to_table(
+        BENCH_TABLE,
+        records=to_rows(batch, run_started),
+        columns=LOAD_COLUMNS,
+    )
+
+
+async def load_unnest(conn, batch, run_started):
+    columns = normalize_records(batch)
+    await conn.fetch(
+        bench_query(INSERT_CARS_QUERY + SKIP_DUPLICATES),
+        *(columns[name] for name in CAR_COLUMNS),
+        run_started,
+    )
+
+
+async def load_upsert(conn, batch, run_started):
+    columns = normalize_records(keep_last_per_listing(batch))
+    await conn.fetch(
+        bench_query(INSERT_CARS_QUERY + UPSERT_CAR_CONFLICT),
+        *(columns[name] for name in CAR_COLUMNS),
+        run_started,
+    )
+
+
+STRATEGIES = {
+    "per_row": load_per_row,
+    "executemany": load_executemany,
+    # COPY has no conflict handling, so it only runs without duplicates
+    "copy": load_copy,
+    "unnest": load_unnest,
+    "upsert": load_upsert,
+}
+
+
+def reset_peak_rss():
+    """Reset the kernel's peak RSS counter of this process (Linux only)."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_kb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+async def recreate_bench_table(conn):
+    await conn.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE};")
+    await conn.execute(
+        f"CREATE TABLE {BENCH_TABLE} (LIKE cars INCLUDING ALL);"
+    )
+
+
+async def run_strategy(db, strategy, size, duplicate_ratio, batch_size):
+    load = STRATEGIES[strategy]
+    run_started = datetime.now()
+
+    async with db.pool.acquire() as conn:
+        await recreate_bench_table(conn)
+        wal_before = await conn.fetchval(
+            "SELECT pg_current_wal_lsn()::text;"
+        )
+        reset_peak_rss()
+        started = time.perf_counter()
+
+        for batch in iter_record_batches(size, batch_size, duplicate_ratio):
+            await load(conn, batch, run_started)
+
+        elapsed = time.perf_counter() - started
+        wal_bytes = await conn.fetchval(
+            "SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), $1::pg_lsn);",
+            wal_before,
+        )
+        rows = await conn.fetchval(f"SELECT count(*) FROM {BENCH_TABLE};")
+        await conn.execute(f"DROP TABLE {BENCH_TABLE};")
+
+    return {
+        "strategy": strategy,
+        "records": size,
+        "duplicate_ratio": duplicate_ratio,
+        "rows_loaded": rows,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(size / elapsed, 1),
+        "wal_bytes": int(wal_bytes),
+        "peak_rss_kb": peak_rss_kb(),
+    }
+
+
+async def time_ensure_tables(db):
+    started = time.perf_counter()
+    await db.ensure_tables()
+    return round(time.perf_counter() - started, 3)
+
+
+async def run_benchmarks(args):
+    db = Database()
+    await db.connect()
+    results = []
+    try:
+        ensure_tables_seconds = await time_ensure_tables(db)
+        print(f"ensure_tables: {ensure_tables_seconds}s")
+
+        for size in args.sizes:
+            for ratio in args.duplicate_ratios:
+                for strategy in args.strategies:
+                    if strategy == "copy" and ratio > 0:
+                        continue
+                    result = await run_strategy(
+                        db, strategy, size, ratio, args.batch_size
+                    )
+                    print(
+                        f"{strategy:>12} records={size:<9} "
+                        f"dup={ratio:<5} {result['rows_per_sec']:>12,.0f} "
+                        f"rows/s  wal={result['wal_bytes']:,}B  "
+                        f"rss={result['peak_rss_kb']:,}kB"
+                    )
+                    results.append(result)
+    finally:
+        await db.close()
+
+    return {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "batch_size": args.batch_size,
+        "ensure_tables_seconds": ensure_tables_seconds,
+        "results": results,
+    }
+
+
+def save_results(run, output_file):
+    """Append the run to the results file, keeping earlier runs."""
+    runs = []
+    if os.path.exists(output_file):
+        with open(output_file, "r", encoding="utf-8") as f:
+            runs = json.load(f)
+    runs.append(run)
+
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump(runs, f, indent=2)
+    print(f"Results saved to {output_file}")
+
+
+def parse_list(value, cast):
+    return [cast(v) for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark cars ingestion strategies on local Postgres."
+    )
+    parser.add_argument(
+        "--sizes",
+        type=lambda v: parse_list(v, int),
+        default=[10_000, 100_000],
+        help="comma separated record counts, e.g. 10000,1000000,5000000",
+    )
+    parser.add_argument(
+        "--duplicate-ratios",
+        type=lambda v: parse_list(v, float),
+        default=[0.0, 0.1, 0.5],
+    )
+    parser.add_argument(
+        "--strategies",
+        type=lambda v: parse_list(v, str),
+        default=list(STRATEGIES),
+    )
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--output", default="bench_db_load_results.json")
+    args = parser.parse_args()
+
+    unknown = set(args.strategies) - set(STRATEGIES)
+    if unknown:
+        parser.error(f"unknown strategies: {', '.join(sorted(unknown))}")
+
+    run = asyncio.run(run_benchmarks(args))
+    save_results(run, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import argparse
+import glob
+import os
+import re
+import time
+
+from scrapy.http import HtmlResponse
+
+from auto_ria_scraper.auto_ria_scraper.helpers.car_extractor import (
+    CarExtractor,
+)
+from auto_ria_scraper.auto_ria_scraper.helpers.odometer_extractor import (
+    extract_odometer,
+)
+from auto_ria_scraper.auto_ria_scraper.helpers.price_extractor import (
+    extract_price,
+)
+from benchmarks.synthetic import car_page_html, generate_records
+from logs.logger import logger
+
+
+def extract_with_selectors(response):
+    """The previous parse_car field extraction, one query per selector."""
+    notice_text = " ".join(
+        response.css("div.notice_head ::text").getall()
+    ).strip()
+    photos_text = response.css(
+        "div.action_disp_all_block a.show-all::text"
+    ).get(default="")
+    match = re.search(r"\d+", photos_text)
+    car_vin = (
+        response.xpath("//span[contains(@class, 'label-vin')]/text()")
+        .get(default="")
+        .strip()
+    )
+    if not car_vin:
+        car_vin = (
+            response.xpath(
+                "//span[@id='badgesVin']//span[contains(@class, "
+                "'common-text')]/text()"
+            )
+            .get(default="")
+            .strip()
+        )
+    return {
+        "notice": notice_text,
+        "title": response.css("h1.head::text").get(default="").strip(),
+        "price_usd": extract_price(response),
+        "odometer": extract_odometer(response),
+        "username": (
+            response.css("div.seller_info_name a::text").get()
+            or response.css("div.seller_info_name::text").get()
+            or response.css("h4.seller_info_name a::text").get()
+            or ""
+        ).strip(),
+        "image_url": response.css(
+            'meta[property="og:image"]::attr(content)'
+        ).get(default=""),
+        "images_count": int(match.group()) - 1 if match else 0,
+        "car_number": (
+            response.xpath("//span[contains(@class,'state-num')]/text()")
+            .get(default="")
+            .strip()
+        ),
+        "car_vin": car_vin,
+    }
+
+
+# Notice markups seen on car pages, text directly in the div and nested
+NOTICES = [
+    None,
+    "Объявление удалено и не принимает участия в поиске",
+    "<span>Объявление удалено</span> и не принимает участия в поиске",
+]
+
+
+def load_pages(fixtures_dir, synthetic_pages):
+    """HTML bodies of saved fixtures, or synthetic pages if there are none."""
+    paths = sorted(glob.glob(os.path.join(fixtures_dir, "*.html")))
+    if paths:
+        pages = []
+        for path in paths:
+            with open(path, "rb") as f:
+                pages.append(f.read())
+        return pages, f"{len(pages)} fixtures from {fixtures_dir}"
+
+    pages = [
+        car_page_html(record, notice=NOTICES[i % len(NOTICES)]).encode(
+            "utf-8"
+        )
+        for i, record in enumerate(generate_records(synthetic_pages))
+    ]
+    return pages, f"{len(pages)} synthetic pages"
+
+
+def to_responses(pages):
+    responses = [
+        HtmlResponse(
+            url=f"https://auto.ria.com/uk/auto_car_{i}.html",
+            body=body,
+            encoding="utf-8",
+        )
+        for i, body in enumerate(pages)
+    ]
+    # Parse the documents up front, both approaches share the lxml tree
+    for response in responses:
+        response.selector
+    return responses
+
+
+def timed(func, responses, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for response in responses:
+            func(response)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the single-pass car extractor with the "
+        "per-selector queries it replaced."
+    )
+    parser.add_argument(
+        "--fixtures",
+        default="fixtures/car_pages",
+        help="directory of car pages saved with SAVE_FIXTURES_DIR",
+    )
+    parser.add_argument("--synthetic-pages", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # Extraction logs every price, keep the timings about parsing
+    logger.disabled = True
+
+    pages, source = load_pages(args.fixtures, args.synthetic_pages)
+    responses = to_responses(pages)
+    extractor = CarExtractor()
+
+    mismatches = 0
+    for response in responses:
+        values, _ = extractor.extract(response.selector.root)
+        if values != extract_with_selectors(response):
+            mismatches += 1
+
+    extractor.hits.clear()
+    selectors_time = timed(extract_with_selectors, responses, args.repeat)
+    engine_time = timed(
+        lambda response: extractor.extract(response.selector.root),
+        responses,
+        args.repeat,
+    )
+
+    print(f"pages:        {source}")
+    print(
+        f"selectors:    {selectors_time:.3f}s "
+        f"({len(responses) / selectors_time:,.0f} pages/s)"
+    )
+    print(
+        f"single pass:  {engine_time:.3f}s "
+        f"({len(responses) / engine_time:,.0f} pages/s)"
+    )
+    print(f"speedup:      {selectors_time / engine_time:.1f}x")
+    print(f"mismatches:   {mismatches}")
+    print("fallback hits:")
+    for hit, count in sorted(extractor.hits.items()):
+        print(f"  {hit:<32} {count // args.repeat}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import sys
+
+
+# Modules each command imports before it starts working
+COMMAND_IMPORTS = {
+    "cli": ["cli"],
+    "backup": ["cli", "database.backup_db"],
+    "load-only": ["cli", "database.db_utils"],
+    "merge-only": ["cli", "utils.file_utils"],
+    "scheduler": ["utils.scheduler"],
+    "scrape": ["cli", "main", "utils.scraper_utils"],
+}
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_times(modules):
+    """
+    Import modules in a fresh interpreter under -X importtime. Returns
+    (total ms, {top-level package: self ms}, [(self ms, module)]).
+    """
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            f"import {', '.join(modules)}",
+        ],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    total = 0
+    packages = {}
+    nested = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        nested.append((int(self_us) / 1000, name))
+        # Self time per package, wherever in the import tree it was pulled
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0) + int(self_us) / 1000
+        # Cumulative time of the outermost imports covers the nested ones
+        if len(indent) == 1:
+            total += int(cumulative_us)
+    return total / 1000, packages, nested
+
+
+def bench_command(command, repeat):
+    modules = COMMAND_IMPORTS[command]
+    runs = [import_times(modules) for _ in range(repeat)]
+    # Breakdown of the median run, the first one also warms the disk cache
+    runs.sort(key=lambda run: run[0])
+    _, packages, nested = runs[len(runs) // 2]
+    return {
+        "total_ms": round(statistics.median(run[0] for run in runs), 1),
+        "packages": {
+            name: round(ms, 1)
+            for name, ms in sorted(
+                packages.items(), key=lambda item: item[1], reverse=True
+            )
+        },
+        "slowest_modules": [
+            {"module": name, "self_ms": round(ms, 1)}
+            for ms, name in sorted(nested, reverse=True)[:10]
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Cold-start import time of each entry point, from "
+        "python -X importtime, with a per-package breakdown."
+    )
+    parser.add_argument(
+        "--commands",
+        default=",".join(COMMAND_IMPORTS),
+        help="comma separated, of: " + ", ".join(COMMAND_IMPORTS),
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("--output", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    results = {}
+    for command in args.commands.split(","):
+        results[command] = bench_command(command, args.repeat)
+        print(f"{command:>12}  {results[command]['total_ms']:>8.1f} ms")
+        for name, ms in list(results[command]["packages"].items())[
+            : args.top
+        ]:
+            print(f"{'':>14}{name:<28}{ms:>8.1f} ms")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
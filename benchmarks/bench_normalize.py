@@ -0,0 +1,66 @@
+import argparse
+import time
+
+from dateutil import parser as date_parser
+
+from benchmarks.synthetic import generate_records
+from database.normalize import normalize_records, parse_http_date
+
+
+def normalize_row_by_row(records):
+    """The previous per-record normalization loop of save_json_to_db."""
+    for record in records:
+        record["price_usd"] = (
+            int(record["price_usd"]) if record.get("price_usd") else None
+        )
+        record["odometer"] = (
+            int(record["odometer"]) if record.get("odometer") else None
+        )
+        if record.get("datetime_found"):
+            dt = date_parser.parse(record["datetime_found"])
+            if dt.tzinfo is not None:
+                dt = dt.astimezone(tz=None).replace(tzinfo=None)
+            record["datetime_found"] = dt
+        else:
+            record["datetime_found"] = None
+    return records
+
+
+def timed(func, records, repeat):
+    best = None
+    for _ in range(repeat):
+        parse_http_date.cache_clear()
+        batch = [dict(record) for record in records]
+        started = time.perf_counter()
+        func(batch)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        description="Compare batch normalization with the row loop."
+    )
+    arg_parser.add_argument("--records", type=int, default=50000)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    records = generate_records(args.records)
+    row_time = timed(normalize_row_by_row, records, args.repeat)
+    batch_time = timed(normalize_records, records, args.repeat)
+
+    print(f"records:      {args.records}")
+    print(
+        f"row by row:   {row_time:.3f}s "
+        f"({args.records / row_time:,.0f} rows/s)"
+    )
+    print(
+        f"batch:        {batch_time:.3f}s "
+        f"({args.records / batch_time:,.0f} rows/s)"
+    )
+    print(f"speedup:      {row_time / batch_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
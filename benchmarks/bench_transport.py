@@ -0,0 +1,196 @@
+import argparse
+import http.client
+import json
+import socket
+import ssl
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from auto_ria_scraper.auto_ria_scraper.transport import (
+    TRANSPORT_ACCEPT_ENCODING,
+)
+
+
+TIMEOUT = 30
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/115.0.0.0 Safari/537.36"
+)
+PHASES = ["dns", "connect", "tls", "ttfb", "transfer", "total"]
+
+
+def ms_since(started):
+    return (time.perf_counter() - started) * 1000
+
+
+def open_connection(host, port, context, resolve=None):
+    """TLS connection to host, timing DNS, TCP connect and handshake."""
+    started = time.perf_counter()
+    family, kind, proto, _, address = socket.getaddrinfo(
+        resolve or host, port, type=socket.SOCK_STREAM
+    )[0]
+    dns = ms_since(started)
+
+    started = time.perf_counter()
+    sock = socket.socket(family, kind, proto)
+    sock.settimeout(TIMEOUT)
+    sock.connect(address)
+    connect = ms_since(started)
+
+    started = time.perf_counter()
+    tls_sock = context.wrap_socket(sock, server_hostname=host)
+    tls = ms_since(started)
+    return tls_sock, {"dns": dns, "connect": connect, "tls": tls}
+
+
+def fetch(sock, host, path, accept_encoding):
+    """
+    One keep-alive HTTP/1.1 GET on sock, timing the first byte and the
+    body. Returns (timings, status, body bytes, connection reusable).
+    """
+    request = (
+        f"GET {path} HTTP/1.1\r\n"
+        f"Host: {host}\r\n"
+        f"User-Agent: {USER_AGENT}\r\n"
+        f"Accept-Encoding: {accept_encoding}\r\n"
+        "Connection: keep-alive\r\n\r\n"
+    )
+    started = time.perf_counter()
+    sock.sendall(request.encode("ascii"))
+    response = http.client.HTTPResponse(sock)
+    response.begin()
+    ttfb = ms_since(started)
+
+    started = time.perf_counter()
+    body = response.read()
+    transfer = ms_since(started)
+    return (
+        {"ttfb": ttfb, "transfer": transfer},
+        response.status,
+        len(body),
+        not response.will_close,
+    )
+
+
+def run(url, requests, reuse, context, accept_encoding, resolve=None):
+    """Timings of requests GETs, on one reused or on fresh connections."""
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 443
+    path = parts.path or "/"
+    if parts.query:
+        path += f"?{parts.query}"
+
+    samples = []
+    sock = None
+    for _ in range(requests):
+        timings = {"dns": 0.0, "connect": 0.0, "tls": 0.0}
+        if sock is None:
+            sock, timings = open_connection(host, port, context, resolve)
+        fetched, status, size, reusable = fetch(
+            sock, host, path, accept_encoding
+        )
+        timings.update(fetched)
+        timings["total"] = sum(timings.values())
+        timings["status"], timings["bytes"] = status, size
+        samples.append(timings)
+
+        if not (reuse and reusable):
+            sock.close()
+            sock = None
+    if sock is not None:
+        sock.close()
+    return samples
+
+
+def summarize(samples):
+    return {
+        phase: round(statistics.median(s[phase] for s in samples), 2)
+        for phase in PHASES
+    }
+
+
+def negotiated_protocol(url, context, resolve=None):
+    """ALPN protocol the server picks when offered h2 and HTTP/1.1."""
+    parts = urlsplit(url)
+    context.set_alpn_protocols(["h2", "http/1.1"])
+    sock, _ = open_connection(
+        parts.hostname, parts.port or 443, context, resolve
+    )
+    protocol = sock.selected_alpn_protocol() or "http/1.1"
+    sock.close()
+    return protocol
+
+
+def make_context(cafile=None, insecure=False):
+    context = ssl.create_default_context(cafile=cafile)
+    if insecure:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    context.set_alpn_protocols(["http/1.1"])
+    return context
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Latency per connection phase (DNS, TCP connect, TLS "
+        "handshake, first byte, transfer) with fresh and with reused "
+        "keep-alive connections. Run benchmarks.tls_standin for a local "
+        "target."
+    )
+    parser.add_argument("--url", default="https://auto.ria.com/car/used/")
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument(
+        "--accept-encoding", default=TRANSPORT_ACCEPT_ENCODING
+    )
+    parser.add_argument("--cafile", help="CA file, e.g. of the stand-in")
+    parser.add_argument("--insecure", action="store_true")
+    parser.add_argument(
+        "--resolve", help="connect to this address, keeping the URL's SNI"
+    )
+    parser.add_argument("--output", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    results = {
+        "url": args.url,
+        "alpn": negotiated_protocol(
+            args.url, make_context(args.cafile, args.insecure), args.resolve
+        ),
+    }
+    for mode, reuse in (("fresh", False), ("keep_alive", True)):
+        samples = run(
+            args.url,
+            args.requests,
+            reuse,
+            make_context(args.cafile, args.insecure),
+            args.accept_encoding,
+            args.resolve,
+        )
+        # The first keep-alive request pays for the connection too
+        steady = samples[1:] if reuse and len(samples) > 1 else samples
+        results[mode] = summarize(steady)
+        results[f"{mode}_bytes"] = samples[-1]["bytes"]
+
+    results["saved_ms_per_request"] = round(
+        results["fresh"]["total"] - results["keep_alive"]["total"], 2
+    )
+
+    print(f"Server ALPN with h2 offered: {results['alpn']}")
+    print(f"{'phase (median ms)':>18}" + "".join(f"{p:>10}" for p in PHASES))
+    for mode in ("fresh", "keep_alive"):
+        print(
+            f"{mode:>18}"
+            + "".join(f"{results[mode][p]:>10.2f}" for p in PHASES)
+        )
+    print(
+        f"Keep-alive saves {results['saved_ms_per_request']} ms per request"
+    )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
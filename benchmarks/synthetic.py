@@ -0,0 +1,97 @@
+import hashlib
+import random
+from datetime import datetime, timedelta, timezone
+
+
+TITLES = [
+    "BMW X5 2015",
+    "Volkswagen Passat B8 2017",
+    "Toyota Camry 2019",
+    "Skoda Octavia A7 2016",
+    "Renault Megane 2018",
+    "Audi A6 2014",
+]
+
+
+def vin_for(index, seed):
+    """Deterministic 17 character VIN of the record with the given index."""
+    digest = hashlib.sha1(f"{seed}:{index}".encode()).hexdigest()
+    return digest[:17].upper()
+
+
+def iter_records(count, duplicate_ratio=0.0, seed=42):
+    """
+    Yield spider-like car records. A share of records reuses the VIN of an
+    earlier record to simulate duplicates. Records are generated lazily,
+    so millions of them never sit in memory at once.
+    """
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+
+    for i in range(count):
+        if i and rng.random() < duplicate_ratio:
+            car_vin = vin_for(rng.randrange(i), seed)
+        else:
+            car_vin = vin_for(i, seed)
+
+        found = now - timedelta(seconds=rng.randint(0, 86400))
+        yield {
+            "url": f"https://auto.ria.com/uk/auto_car_{i}.html",
+            "title": rng.choice(TITLES),
+            "price_usd": str(rng.randint(1000, 90000)),
+            "odometer": rng.randint(0, 400) * 1000,
+            "username": f"seller {rng.randint(1, count // 10 + 1)}",
+            "phone_number": f"380{rng.randint(500000000, 999999999)}",
+            "image_url": f"https://cdn.riastatic.com/photos/{i}.jpg",
+            "images_count": rng.randint(0, 60),
+            "car_number": f"AA {rng.randint(1000, 9999)} BB",
+            "car_vin": car_vin,
+            "datetime_found": found.strftime("%a, %d %b %Y %H:%M:%S GMT"),
+        }
+
+
+def iter_record_batches(count, batch_size, duplicate_ratio=0.0, seed=42):
+    batch = []
+    for record in iter_records(count, duplicate_ratio, seed):
+        batch.append(record)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def generate_records(count, duplicate_ratio=0.0, seed=42):
+    return list(iter_records(count, duplicate_ratio, seed))
+
+
+def car_page_html(record, filler_blocks=200, notice=None):
+    """
+    A car page shaped like AutoRia's, with the fields parse_car reads and
+    filler markup so selectors have a realistic document to scan. notice
+    is inner HTML of a div.notice_head, e.g. for a deleted listing.
+    """
+    notice_html = (
+        f'<div class="notice_head">{notice}</div>\n' if notice else ""
+    )
+    filler = "".join(
+        f'<div class="item-{i}"><span>spec {i}</span><a href="#">link</a>'
+        f"<p>text</p></div>"
+        for i in range(filler_blocks)
+    )
+    return f"""<html><head>
+<meta property="og:image" content="{record['image_url']}">
+</head><body>
+{notice_html}<h1 class="head">{record['title']}</h1>
+<div class="price_value"><strong>{record['price_usd']} $</strong>
+<span data-currency="USD">{record['price_usd']}</span></div>
+<div class="bold dhide">{record['odometer'] // 1000} тыс. км</div>
+{filler}
+<div class="action_disp_all_block">
+<a class="show-all">Смотреть все {record['images_count'] + 1} фотографий</a>
+</div>
+<h4 class="seller_info_name"><a href="#">{record['username']}</a></h4>
+<span class="state-num ua">{record['car_number']}</span>
+<span id="badgesVin"><span class="common-text ws-pre-wrap">\
+{record['car_vin']}</span></span>
+</body></html>"""
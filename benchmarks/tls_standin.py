@@ -0,0 +1,126 @@
+import argparse
+import datetime
+import gzip
+import ipaddress
+import os
+import ssl
+import tempfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+from benchmarks.synthetic import car_page_html, generate_records
+
+
+LISTING_CARS = 20
+
+
+def write_self_signed_cert(cert_file, key_file, host="localhost"):
+    """Self-signed certificate for host and 127.0.0.1, valid for a day."""
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, host)])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=5))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(
+            x509.SubjectAlternativeName(
+                [
+                    x509.DNSName(host),
+                    x509.IPAddress(ipaddress.ip_address("127.0.0.1")),
+                ]
+            ),
+            critical=False,
+        )
+        .sign(key, hashes.SHA256())
+    )
+    with open(cert_file, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_file, "wb") as f:
+        f.write(
+            key.private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.PKCS8,
+                serialization.NoEncryption(),
+            )
+        )
+
+
+def listing_page_html(page):
+    links = "".join(
+        f'<a class="address" href="/auto_standin_{page}_{i}.html">Car</a>'
+        for i in range(LISTING_CARS)
+    )
+    return f"<html><body>{links}</body></html>"
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    """Keep-alive HTTP/1.1 stand-in of auto.ria.com listing and car pages."""
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes, Nagle would delay the body
+    disable_nagle_algorithm = True
+    car_page = None
+
+    def do_GET(self):
+        if self.path.startswith("/auto_"):
+            body = self.car_page
+        else:
+            body = listing_page_html(1).encode("utf-8")
+
+        encoding = None
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body, encoding = gzip.compress(body), "gzip"
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port, cert_file, key_file):
+    StandinHandler.car_page = car_page_html(generate_records(1)[0]).encode(
+        "utf-8"
+    )
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert_file, key_file)
+    server = ThreadingHTTPServer(("127.0.0.1", port), StandinHandler)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    print(f"Serving https://localhost:{port}/ with CA file {cert_file}")
+    server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Local TLS stand-in of auto.ria.com for transport "
+        "benchmarks."
+    )
+    parser.add_argument("--port", type=int, default=8443)
+    parser.add_argument(
+        "--cert-dir", default=None, help="temporary directory if unset"
+    )
+    args = parser.parse_args()
+
+    cert_dir = args.cert_dir or tempfile.mkdtemp(prefix="tls_standin_")
+    cert_file = os.path.join(cert_dir, "cert.pem")
+    key_file = os.path.join(cert_dir, "key.pem")
+    write_self_signed_cert(cert_file, key_file)
+    serve(args.port, cert_file, key_file)
+
+
+if __name__ == "__main__":
+    main()
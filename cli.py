@@ -0,0 +1,66 @@
+import argparse
+import asyncio
+import sys
+
+
+# Every command imports its own modules, so a backup or a DB-only task
+# does not pay for importing Scrapy, Selenium and the spider
+
+
+def scrape(args):
+    from main import main as run_workflow
+
+    asyncio.run(run_workflow())
+
+
+def backup(args):
+    from database.backup_db import create_backup
+
+    if not create_backup():
+        sys.exit(1)
+
+
+def load_only(args):
+    from database.db_utils import run_db_tasks
+
+    asyncio.run(run_db_tasks(args.file))
+
+
+def merge_only(args):
+    from utils.file_utils import merge_output_chunks
+
+    merge_output_chunks(merged_file=args.output)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run the whole workflow or one of its steps."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser(
+        "scrape", help="crawl, merge and load, like main.py"
+    ).set_defaults(func=scrape)
+
+    commands.add_parser(
+        "backup", help="pg_dump the database into dumps/"
+    ).set_defaults(func=backup)
+
+    load = commands.add_parser(
+        "load-only", help="load merged output into the DB without crawling"
+    )
+    load.add_argument("--file", help="merged output file if unset")
+    load.set_defaults(func=load_only)
+
+    merge = commands.add_parser(
+        "merge-only", help="merge the output chunks of the last crawl"
+    )
+    merge.add_argument("--output", help="merged output file if unset")
+    merge.set_defaults(func=merge_only)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import asyncio
+import json
+import os
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+
+from database.connection import Database
+from logs.logger import logger
+from utils.run_report import update_run_report
+
+
+load_dotenv()
+
+CHANGE_FEED = os.getenv("CHANGE_FEED", "true").lower() == "true"
+CHANGE_FEED_RETENTION_DAYS = int(os.getenv("CHANGE_FEED_RETENTION_DAYS", 90))
+CHANGE_BATCH_SIZE = int(os.getenv("CHANGE_BATCH_SIZE", 1000))
+# Consumers also poll, in case a notification was missed
+CHANGE_POLL_SECONDS = int(os.getenv("CHANGE_POLL_SECONDS", 300))
+# Payload: {"run_started", "last_id", "counts": {change_type: n}}
+LISTING_CHANGES_CHANNEL = "listing_changes"
+
+# One row per listing that is new, changed price or disappeared since
+# the snapshot taken before the load
+RECORD_CHANGES_QUERY = """
+    WITH inserted AS (
+        INSERT INTO listing_changes (change_type, listing_key, car_vin,
+                                     url, old_price_usd, new_price_usd,
+                                     run_started)
+        SELECT CASE
+                   WHEN p.listing_key IS NULL THEN 'new'
+                   WHEN c.listing_key IS NULL THEN 'removed'
+                   ELSE 'price_changed'
+               END,
+               coalesce(c.listing_key, p.listing_key),
+               coalesce(c.car_vin, p.car_vin),
+               coalesce(c.url, p.url),
+               p.price_usd,
+               c.price_usd,
+               $1
+        FROM cars c
+        FULL JOIN cars_previous p ON p.listing_key = c.listing_key
+        WHERE p.listing_key IS NULL
+           OR c.listing_key IS NULL
+           OR c.price_usd IS DISTINCT FROM p.price_usd
+        ORDER BY 1, 2
+        RETURNING id, change_type
+    )
+    SELECT change_type, count(*) AS changes, max(id) AS last_id
+    FROM inserted
+    GROUP BY change_type;
+"""
+
+
+async def snapshot_previous_listings(db: Database):
+    """Keep the listings as they were before the load replaces them."""
+    async with db.pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.execute("TRUNCATE cars_previous;")
+            result = await conn.execute(
+                """
+                INSERT INTO cars_previous (listing_key, car_vin, url,
+                                           price_usd)
+                SELECT listing_key, car_vin, url, price_usd FROM cars;
+                """
+            )
+    logger.info(f"Snapshot of listings before the load: {result}")
+
+
+async def publish_changes(db: Database, run_started):
+    """
+    Append the run's listing diffs to listing_changes and notify
+    LISTING_CHANGES_CHANNEL, both on commit.
+    """
+    async with db.pool.acquire() as conn:
+        async with conn.transaction():
+            rows = await conn.fetch(RECORD_CHANGES_QUERY, run_started)
+            counts = {row["change_type"]: row["changes"] for row in rows}
+            last_id = max((row["last_id"] for row in rows), default=None)
+            payload = {
+                "run_started": run_started.isoformat(),
+                "last_id": last_id,
+                "counts": counts,
+            }
+            await conn.execute(
+                "SELECT pg_notify($1, $2);",
+                LISTING_CHANGES_CHANNEL,
+                json.dumps(payload),
+            )
+
+        cutoff = datetime.now() - timedelta(days=CHANGE_FEED_RETENTION_DAYS)
+        result = await conn.execute(
+            "DELETE FROM listing_changes WHERE changed_at < $1;", cutoff
+        )
+        logger.info(f"Expired listing changes: {result}")
+
+    logger.info(f"Published listing changes: {counts}")
+    update_run_report("changes", counts)
+    return counts
+
+
+async def fetch_changes(conn, after_id, limit=CHANGE_BATCH_SIZE):
+    """Changes with ids after the cursor, oldest first."""
+    return await conn.fetch(
+        """
+        SELECT id, change_type, listing_key, car_vin, url, old_price_usd,
+               new_price_usd, run_started, changed_at
+        FROM listing_changes
+        WHERE id > $1
+        ORDER BY id
+        LIMIT $2;
+        """,
+        after_id,
+        limit,
+    )
+
+
+async def load_cursor(conn, consumer):
+    last_id = await conn.fetchval(
+        "SELECT last_id FROM change_cursors WHERE consumer = $1;", consumer
+    )
+    return last_id or 0
+
+
+async def save_cursor(conn, consumer, last_id):
+    await conn.execute(
+        """
+        INSERT INTO change_cursors (consumer, last_id, updated_at)
+        VALUES ($1, $2, now())
+        ON CONFLICT (consumer) DO UPDATE SET
+            last_id = EXCLUDED.last_id,
+            updated_at = EXCLUDED.updated_at;
+        """,
+        consumer,
+        last_id,
+    )
+
+
+async def tail_changes(
+    db: Database,
+    consumer=None,
+    after_id=None,
+    batch_size=CHANGE_BATCH_SIZE,
+    poll_seconds=CHANGE_POLL_SECONDS,
+):
+    """
+    Yield listing changes after a cursor forever, waiting for
+    LISTING_CHANGES_CHANNEL notifications between batches.
+
+    With a consumer name the cursor is loaded from change_cursors and
+    saved after every batch the caller consumed, so a restarted consumer
+    resumes where it stopped and may see at most one batch again.
+    """
+    notified = asyncio.Event()
+
+    def on_notify(connection, pid, channel, payload):
+        notified.set()
+
+    listener = await db.pool.acquire()
+    await listener.add_listener(LISTING_CHANGES_CHANNEL, on_notify)
+    try:
+        if after_id is None:
+            after_id = await load_cursor(listener, consumer) if consumer else 0
+
+        while True:
+            # Cleared before the fetch so a notification during it counts
+            notified.clear()
+            async with db.pool.acquire() as conn:
+                rows = await fetch_changes(conn, after_id, batch_size)
+
+            for row in rows:
+                yield row
+            if rows:
+                after_id = rows[-1]["id"]
+                if consumer:
+                    await save_cursor(listener, consumer, after_id)
+
+            if len(rows) < batch_size:
+                try:
+                    await asyncio.wait_for(notified.wait(), poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+    finally:
+        await listener.remove_listener(LISTING_CHANGES_CHANNEL, on_notify)
+        await db.pool.release(listener)
@@ -5,6 +5,58 @@ import asyncpg
 from logs.logger import logger
 
 
+# Materialized views refreshed after each load. The unique index on each
+# view is required by REFRESH MATERIALIZED VIEW CONCURRENTLY.
+ANALYTICS_VIEWS = {
+    "cars_title_price_stats": """
+    CREATE MATERIALIZED VIEW IF NOT EXISTS cars_title_price_stats AS
+    SELECT title,
+           count(*) AS listings,
+           round(avg(price_usd)) AS avg_price_usd,
+           percentile_cont(0.5) WITHIN GROUP (ORDER BY price_usd)
+               AS median_price_usd,
+           round(avg(odometer)) AS avg_odometer,
+           percentile_cont(0.5) WITHIN GROUP (ORDER BY odometer)
+               AS median_odometer
+    FROM cars
+    WHERE title IS NOT NULL
+    GROUP BY title;
+    CREATE UNIQUE INDEX IF NOT EXISTS cars_title_price_stats_title_idx
+    ON cars_title_price_stats (title);
+    CREATE INDEX IF NOT EXISTS cars_title_price_stats_trgm_idx
+    ON cars_title_price_stats USING gin (title gin_trgm_ops);
+    """,
+    "cars_make_price_stats": """
+    CREATE MATERIALIZED VIEW IF NOT EXISTS cars_make_price_stats AS
+    SELECT make,
+           count(*) AS listings,
+           round(avg(price_usd)) AS avg_price_usd,
+           percentile_cont(0.5) WITHIN GROUP (ORDER BY price_usd)
+               AS median_price_usd,
+           round(avg(odometer)) AS avg_odometer,
+           percentile_cont(0.5) WITHIN GROUP (ORDER BY odometer)
+               AS median_odometer
+    FROM cars
+    WHERE make IS NOT NULL
+    GROUP BY make;
+    CREATE UNIQUE INDEX IF NOT EXISTS cars_make_price_stats_make_idx
+    ON cars_make_price_stats (make);
+    """,
+    "cars_daily_new_listings": """
+    CREATE MATERIALIZED VIEW IF NOT EXISTS cars_daily_new_listings AS
+    SELECT first_seen::date AS day, count(*) AS new_listings
+    FROM (
+        SELECT listing_key, min(observed_at) AS first_seen
+        FROM car_observations
+        GROUP BY listing_key
+    ) first_observations
+    GROUP BY 1;
+    CREATE UNIQUE INDEX IF NOT EXISTS cars_daily_new_listings_day_idx
+    ON cars_daily_new_listings (day);
+    """,
+}
+
+
 class Database:
     def __init__(self):
         self.pool = None
@@ -45,17 +97,339 @@ class Database:
             image_url TEXT,
             images_count INTEGER,
             car_number TEXT,
-            car_vin TEXT PRIMARY KEY,
-            datetime_found TIMESTAMP
+            car_vin TEXT,
+            listing_key TEXT PRIMARY KEY,
+            datetime_found TIMESTAMP,
+            last_seen TIMESTAMP,
+            make TEXT,
+            model TEXT,
+            year INTEGER,
+            seller_id BIGINT
+        );
+        """
+        add_last_seen_column = """
+        ALTER TABLE cars ADD COLUMN IF NOT EXISTS last_seen TIMESTAMP;
+        """
+        # Parsed out of the title at ingest, see normalize.parse_title
+        add_title_columns = """
+        ALTER TABLE cars ADD COLUMN IF NOT EXISTS make TEXT;
+        ALTER TABLE cars ADD COLUMN IF NOT EXISTS model TEXT;
+        ALTER TABLE cars ADD COLUMN IF NOT EXISTS year INTEGER;
+        """
+        # Rows were keyed on car_vin, holding 'id:<listing id>' or
+        # 'url:<hash>' for listings without a VIN. The key moves to its
+        # own column and car_vin keeps real VINs only.
+        add_listing_key_column = """
+        DO $$
+        DECLARE
+            vin_constraint TEXT;
+        BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM information_schema.columns
+                WHERE table_name = 'cars' AND column_name = 'listing_key'
+            ) THEN
+                ALTER TABLE cars ADD COLUMN listing_key TEXT;
+                UPDATE cars SET listing_key = car_vin;
+                FOR vin_constraint IN
+                    SELECT con.conname
+                    FROM pg_constraint con
+                    JOIN pg_attribute att
+                      ON att.attrelid = con.conrelid
+                     AND att.attnum = ANY (con.conkey)
+                    WHERE con.conrelid = 'cars'::regclass
+                      AND con.contype IN ('p', 'u')
+                      AND att.attname = 'car_vin'
+                LOOP
+                    EXECUTE format(
+                        'ALTER TABLE cars DROP CONSTRAINT %I', vin_constraint
+                    );
+                END LOOP;
+                ALTER TABLE cars ALTER COLUMN car_vin DROP NOT NULL;
+                UPDATE cars SET car_vin = NULL
+                WHERE car_vin LIKE 'id:%' OR car_vin LIKE 'url:%';
+                ALTER TABLE cars ALTER COLUMN listing_key SET NOT NULL;
+                ALTER TABLE cars
+                ADD CONSTRAINT cars_listing_key_key UNIQUE (listing_key);
+            END IF;
+        END $$;
+        """
+        # Sellers by phone, see database/sellers.py. username and
+        # phone_number stay on listings without a phone only.
+        create_sellers_table = """
+        CREATE TABLE IF NOT EXISTS sellers (
+            id BIGSERIAL PRIMARY KEY,
+            phone TEXT NOT NULL UNIQUE,
+            username TEXT,
+            first_seen TIMESTAMP,
+            last_seen TIMESTAMP
+        );
+        ALTER TABLE cars ADD COLUMN IF NOT EXISTS seller_id BIGINT;
+        DO $$
+        BEGIN
+            ALTER TABLE cars ADD CONSTRAINT cars_seller_id_fkey
+            FOREIGN KEY (seller_id) REFERENCES sellers (id);
+        EXCEPTION WHEN duplicate_object THEN NULL;
+        END $$;
+        CREATE INDEX IF NOT EXISTS cars_seller_idx
+        ON cars (seller_id, datetime_found DESC);
+        CREATE INDEX IF NOT EXISTS cars_seller_backfill_idx
+        ON cars (phone_number)
+        WHERE seller_id IS NULL AND phone_number <> '';
+        """
+        # The flat listing columns of before the sellers table
+        create_cars_with_sellers_view = """
+        CREATE OR REPLACE VIEW cars_with_sellers AS
+        SELECT c.url, c.title, c.price_usd, c.odometer,
+               coalesce(s.username, c.username) AS username,
+               coalesce(s.phone, c.phone_number) AS phone_number,
+               c.image_url, c.images_count, c.car_number, c.car_vin,
+               c.datetime_found, c.last_seen, c.make, c.model, c.year,
+               c.seller_id, c.listing_key
+        FROM cars c
+        LEFT JOIN sellers s ON s.id = c.seller_id;
+        """
+        # Listing history, one row per listing per run, partitioned by day
+        create_observations_table = """
+        CREATE TABLE IF NOT EXISTS car_observations (
+            car_vin TEXT,
+            listing_key TEXT NOT NULL,
+            url TEXT,
+            price_usd INTEGER,
+            odometer INTEGER,
+            observed_at TIMESTAMP NOT NULL
+        ) PARTITION BY RANGE (observed_at);
+        """
+        # The run start was stored as datetime_found, name it for what it is
+        rename_observed_at_column = """
+        DO $$
+        BEGIN
+            IF EXISTS (
+                SELECT 1 FROM information_schema.columns
+                WHERE table_name = 'car_observations'
+                  AND column_name = 'datetime_found'
+            ) THEN
+                ALTER TABLE car_observations
+                RENAME COLUMN datetime_found TO observed_at;
+            END IF;
+        END $$;
+        """
+        add_observations_listing_key = """
+        DO $$
+        BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM information_schema.columns
+                WHERE table_name = 'car_observations'
+                  AND column_name = 'listing_key'
+            ) THEN
+                ALTER TABLE car_observations ADD COLUMN listing_key TEXT;
+                ALTER TABLE car_observations
+                ALTER COLUMN car_vin DROP NOT NULL;
+                UPDATE car_observations SET
+                    listing_key = car_vin,
+                    car_vin = CASE
+                        WHEN car_vin LIKE 'id:%' OR car_vin LIKE 'url:%'
+                        THEN NULL ELSE car_vin
+                    END;
+                ALTER TABLE car_observations
+                ALTER COLUMN listing_key SET NOT NULL;
+                DROP INDEX IF EXISTS car_observations_vin_found_idx;
+                -- Recreated on listing_key from ANALYTICS_VIEWS
+                DROP MATERIALIZED VIEW IF EXISTS cars_daily_new_listings;
+            END IF;
+        END $$;
+        """
+        # The make view first grouped by the first word of the title,
+        # which cut makes like "Land Rover" short
+        drop_title_make_view = """
+        DO $$
+        BEGIN
+            IF EXISTS (
+                SELECT 1 FROM pg_matviews
+                WHERE matviewname = 'cars_make_price_stats'
+                  AND definition LIKE '%split_part%'
+            ) THEN
+                DROP MATERIALIZED VIEW cars_make_price_stats;
+            END IF;
+        END $$;
+        """
+        create_observations_index = """
+        CREATE INDEX IF NOT EXISTS car_observations_key_observed_idx
+        ON car_observations (listing_key, observed_at);
+        """
+        # Back keyset pagination and range filters of the read API
+        create_cars_indexes = """
+        DROP INDEX IF EXISTS cars_found_vin_idx;
+        CREATE INDEX IF NOT EXISTS cars_found_key_idx
+        ON cars (datetime_found DESC, listing_key DESC);
+        CREATE INDEX IF NOT EXISTS cars_price_idx ON cars (price_usd);
+        CREATE INDEX IF NOT EXISTS cars_odometer_idx ON cars (odometer);
+        """
+        # Title search: trigrams back ILIKE '%...%', the tsvector index
+        # backs word search and (make, model, year) exact lookups
+        create_search_indexes = """
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        CREATE INDEX IF NOT EXISTS cars_title_trgm_idx
+        ON cars USING gin (title gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS cars_title_tsv_idx
+        ON cars USING gin (to_tsvector('simple', coalesce(title, '')));
+        CREATE INDEX IF NOT EXISTS cars_make_model_year_idx
+        ON cars (lower(make), lower(model), year);
+        DROP INDEX IF EXISTS cars_title_backfill_idx;
+        CREATE INDEX IF NOT EXISTS cars_title_backfill_key_idx
+        ON cars (listing_key) WHERE make IS NULL AND title IS NOT NULL;
+        """
+        # Content-addressed images, see database/images.py
+        create_images_tables = """
+        CREATE TABLE IF NOT EXISTS images (
+            content_hash TEXT PRIMARY KEY,
+            width INTEGER,
+            height INTEGER,
+            size_bytes INTEGER,
+            content_type TEXT,
+            first_seen TIMESTAMP NOT NULL DEFAULT now()
+        );
+        CREATE TABLE IF NOT EXISTS image_urls (
+            url TEXT PRIMARY KEY,
+            content_hash TEXT NOT NULL REFERENCES images (content_hash),
+            fetched_at TIMESTAMP NOT NULL DEFAULT now()
         );
+        CREATE INDEX IF NOT EXISTS image_urls_hash_idx
+        ON image_urls (content_hash);
+        """
+        # Key the change feed on listing_key too, see add_listing_key_column
+        migrate_changes_tables = """
+        DO $$
+        BEGIN
+            -- Rebuilt before every load, nothing to keep
+            IF EXISTS (
+                SELECT 1 FROM information_schema.tables
+                WHERE table_name = 'cars_previous'
+            ) AND NOT EXISTS (
+                SELECT 1 FROM information_schema.columns
+                WHERE table_name = 'cars_previous'
+                  AND column_name = 'listing_key'
+            ) THEN
+                DROP TABLE cars_previous;
+            END IF;
+            IF EXISTS (
+                SELECT 1 FROM information_schema.columns
+                WHERE table_name = 'listing_changes'
+                  AND column_name = 'car_vin'
+            ) AND NOT EXISTS (
+                SELECT 1 FROM information_schema.columns
+                WHERE table_name = 'listing_changes'
+                  AND column_name = 'listing_key'
+            ) THEN
+                ALTER TABLE listing_changes ADD COLUMN listing_key TEXT;
+                ALTER TABLE listing_changes
+                ALTER COLUMN car_vin DROP NOT NULL;
+                UPDATE listing_changes SET
+                    listing_key = car_vin,
+                    car_vin = CASE
+                        WHEN car_vin LIKE 'id:%' OR car_vin LIKE 'url:%'
+                        THEN NULL ELSE car_vin
+                    END;
+                ALTER TABLE listing_changes
+                ALTER COLUMN listing_key SET NOT NULL;
+            END IF;
+        END $$;
+        """
+        # Change feed, see database/changes.py. cars_previous is rebuilt
+        # before every load, so it skips the WAL as an unlogged table.
+        create_changes_tables = """
+        CREATE UNLOGGED TABLE IF NOT EXISTS cars_previous (
+            listing_key TEXT PRIMARY KEY,
+            car_vin TEXT,
+            url TEXT,
+            price_usd INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS listing_changes (
+            id BIGSERIAL PRIMARY KEY,
+            change_type TEXT NOT NULL,
+            car_vin TEXT,
+            listing_key TEXT NOT NULL,
+            url TEXT,
+            old_price_usd INTEGER,
+            new_price_usd INTEGER,
+            run_started TIMESTAMP NOT NULL,
+            changed_at TIMESTAMP NOT NULL DEFAULT now()
+        );
+        CREATE INDEX IF NOT EXISTS listing_changes_changed_at_idx
+        ON listing_changes (changed_at);
+        CREATE TABLE IF NOT EXISTS change_cursors (
+            consumer TEXT PRIMARY KEY,
+            last_id BIGINT NOT NULL,
+            updated_at TIMESTAMP NOT NULL DEFAULT now()
+        );
+        """
+        # Metrics of every workflow run, see database/run_reports.py
+        create_run_reports_table = """
+        CREATE TABLE IF NOT EXISTS run_reports (
+            id BIGSERIAL PRIMARY KEY,
+            run_started TIMESTAMP NOT NULL,
+            node TEXT,
+            metrics JSONB NOT NULL,
+            report JSONB NOT NULL
+        );
+        """
+        # Scheduled job runs, see utils/job_runner.py
+        create_job_runs_table = """
+        CREATE TABLE IF NOT EXISTS job_runs (
+            id BIGSERIAL PRIMARY KEY,
+            job TEXT NOT NULL,
+            scheduled_for TIMESTAMP NOT NULL,
+            started_at TIMESTAMP NOT NULL,
+            finished_at TIMESTAMP,
+            duration_seconds DOUBLE PRECISION,
+            status TEXT NOT NULL,
+            node TEXT,
+            error TEXT
+        );
+        CREATE INDEX IF NOT EXISTS job_runs_job_scheduled_idx
+        ON job_runs (job, scheduled_for);
         """
         try:
             async with self.pool.acquire() as conn:
                 logger.info("Checking and creating 'cars' table if needed...")
                 await conn.execute(create_cars_table)
+                await conn.execute(add_listing_key_column)
+                await conn.execute(add_last_seen_column)
+                await conn.execute(add_title_columns)
+                await conn.execute(create_cars_indexes)
+                await conn.execute(create_search_indexes)
                 logger.info("Table 'cars' created or already exists.")
+
+                await conn.execute(create_sellers_table)
+                await conn.execute(create_cars_with_sellers_view)
+                logger.info("Table 'sellers' and its listings view ready.")
+
+                logger.info("Checking and creating 'car_observations'...")
+                await conn.execute(create_observations_table)
+                await conn.execute(rename_observed_at_column)
+                await conn.execute(add_observations_listing_key)
+                await conn.execute(create_observations_index)
+                logger.info("Table 'car_observations' ready.")
+
+                await conn.execute(create_images_tables)
+                logger.info("Tables 'images' and 'image_urls' ready.")
+
+                await conn.execute(migrate_changes_tables)
+                await conn.execute(create_changes_tables)
+                logger.info("Change feed tables ready.")
+
+                await conn.execute(create_run_reports_table)
+                logger.info("Table 'run_reports' ready.")
+
+                await conn.execute(create_job_runs_table)
+                logger.info("Table 'job_runs' ready.")
+
+                logger.info("Checking and creating analytics views...")
+                await conn.execute(drop_title_make_view)
+                for view in ANALYTICS_VIEWS.values():
+                    await conn.execute(view)
+                logger.info("Analytics views ready.")
         except Exception as e:
-            logger.error(f"Error creating 'cars' table: {e}")
+            logger.error(f"Error creating tables: {e}")
             raise
 
     async def truncate_cars_table(self):
@@ -69,5 +443,34 @@ class Database:
             logger.error(f"Error cleaning 'cars' table: {e}")
             raise
 
+    async def refresh_analytics_views(self):
+        """Refresh analytics views without blocking their readers."""
+        try:
+            async with self.pool.acquire() as conn:
+                for name in ANALYTICS_VIEWS:
+                    logger.info(f"Refreshing materialized view '{name}'...")
+                    await conn.execute(
+                        f"REFRESH MATERIALIZED VIEW CONCURRENTLY {name};"
+                    )
+                logger.info("Analytics views refreshed.")
+        except Exception as e:
+            logger.error(f"Error refreshing analytics views: {e}")
+            raise
+
+    async def delete_stale_cars(self, run_started):
+        """Delete listings that were not seen since the run started."""
+        try:
+            async with self.pool.acquire() as conn:
+                logger.info("Deleting listings not seen in this run...")
+                result = await conn.execute(
+                    "DELETE FROM cars "
+                    "WHERE last_seen IS NULL OR last_seen < $1;",
+                    run_started,
+                )
+                logger.info(f"Stale listings deleted: {result}")
+        except Exception as e:
+            logger.error(f"Error deleting stale listings: {e}")
+            raise
+
 
 db = Database()
@@ -1,6 +1,33 @@
+import os
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+from database.changes import (
+    CHANGE_FEED,
+    publish_changes,
+    snapshot_previous_listings,
+)
 from database.connection import Database
+from database.export import EXPORT_PARQUET, export_snapshot_parquet
+from database.history import record_observations
+from database.images import IMAGE_PIPELINE, fetch_car_images
 from database.save import save_json_to_db
+from database.search import backfill_title_parts
+from database.sellers import backfill_sellers
+from database.snapshot import export_listing_snapshot
 from logs.logger import logger
+from utils.chunk_store import merged_output_file
+
+
+load_dotenv()
+
+DELTA_DETECTION = os.getenv("DELTA_DETECTION", "false").lower() == "true"
+LISTING_SNAPSHOT_FILE = os.getenv(
+    "LISTING_SNAPSHOT_FILE", "listing_snapshot.json"
+)
+# Readers such as the API clear their caches on this notification
+LOAD_COMPLETE_CHANNEL = "cars_loaded"
 
 
 async def connect_db():
@@ -15,9 +42,55 @@ async def clear_old_data(db):
     logger.info("Old records removed from DB.")
 
 
-async def save_data(db, json_file="output.json"):
-    await save_json_to_db(json_file, db)
+async def save_data(db, json_file=None, run_started=None):
+    await save_json_to_db(
+        json_file or merged_output_file(),
+        db, run_started=run_started, upsert=DELTA_DETECTION
+    )
     logger.info("Data from JSON saved to DB.")
+    await backfill_title_parts(db)
+    await backfill_sellers(db)
+
+
+async def save_images(db, json_file):
+    await fetch_car_images(db, json_file)
+    logger.info("Car images fetched and recorded.")
+
+
+async def clear_stale_data(db, run_started):
+    await db.delete_stale_cars(run_started)
+    logger.info("Listings not seen in this run removed from DB.")
+
+
+async def snapshot_listings(db):
+    await snapshot_previous_listings(db)
+    logger.info("Listings snapshot taken for the change feed.")
+
+
+async def save_changes(db, run_started):
+    await publish_changes(db, run_started)
+    logger.info("Listing changes published.")
+
+
+async def save_history(db, run_started):
+    await record_observations(db, run_started)
+    logger.info("Listing observations saved to history.")
+
+
+async def refresh_views(db):
+    await db.refresh_analytics_views()
+    logger.info("Analytics views refreshed after load.")
+
+
+async def notify_load_complete(db):
+    async with db.pool.acquire() as conn:
+        await conn.execute(f"NOTIFY {LOAD_COMPLETE_CHANNEL};")
+    logger.info(f"Sent '{LOAD_COMPLETE_CHANNEL}' notification.")
+
+
+async def export_data(db, run_started):
+    await export_snapshot_parquet(db, run_started)
+    logger.info("Snapshot exported to Parquet.")
 
 
 async def close_db(db):
@@ -25,10 +98,36 @@ async def close_db(db):
     logger.info("Database connection closed.")
 
 
-async def run_db_tasks(json_file="output.json"):
+async def export_snapshot(snapshot_file=LISTING_SNAPSHOT_FILE):
+    db = await connect_db()
+    try:
+        await export_listing_snapshot(db, snapshot_file)
+    finally:
+        await close_db(db)
+
+
+async def run_db_tasks(json_file=None):
+    json_file = json_file or merged_output_file()
+    run_started = datetime.now()
     db = await connect_db()
     try:
-        await clear_old_data(db)
-        await save_data(db, json_file)
+        if CHANGE_FEED:
+            await snapshot_listings(db)
+        if DELTA_DETECTION:
+            # Unchanged listings are kept and only their last_seen refreshed
+            await save_data(db, json_file, run_started)
+            await clear_stale_data(db, run_started)
+        else:
+            await clear_old_data(db)
+            await save_data(db, json_file, run_started)
+        if CHANGE_FEED:
+            await save_changes(db, run_started)
+        if IMAGE_PIPELINE:
+            await save_images(db, json_file)
+        await save_history(db, run_started)
+        await refresh_views(db)
+        await notify_load_complete(db)
+        if EXPORT_PARQUET:
+            await export_data(db, run_started)
     finally:
         await close_db(db)
@@ -0,0 +1,131 @@
+import os
+from functools import lru_cache
+
+from dotenv import load_dotenv
+
+from database.connection import Database
+from logs.logger import logger
+
+
+load_dotenv()
+
+EXPORT_PARQUET = os.getenv("EXPORT_PARQUET", "false").lower() == "true"
+EXPORT_DIR = os.getenv("EXPORT_DIR", "exports")
+EXPORT_ROW_GROUP_SIZE = int(os.getenv("EXPORT_ROW_GROUP_SIZE", 50000))
+EXPORT_COMPRESSION = os.getenv("EXPORT_COMPRESSION", "zstd")
+
+CARS_COLUMNS = [
+    ("url", "string"),
+    ("title", "string"),
+    ("price_usd", "int32"),
+    ("odometer", "int32"),
+    ("username", "string"),
+    ("phone_number", "string"),
+    ("image_url", "string"),
+    ("images_count", "int32"),
+    ("car_number", "string"),
+    ("car_vin", "string"),
+    ("listing_key", "string"),
+    ("datetime_found", "timestamp"),
+    ("make", "string"),
+    ("model", "string"),
+    ("year", "int32"),
+    ("last_seen", "timestamp"),
+]
+
+
+@lru_cache(maxsize=None)
+def cars_schema():
+    """Arrow schema of the cars snapshot. pyarrow is imported on first use,
+    it is the slowest import of the load."""
+    import pyarrow as pa
+
+    types = {
+        "string": pa.string(),
+        "int32": pa.int32(),
+        "timestamp": pa.timestamp("us"),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in CARS_COLUMNS])
+
+
+def snapshot_path(day, export_dir=EXPORT_DIR):
+    """Date-partitioned path of a run's snapshot, day as date or ISO str."""
+    if not isinstance(day, str):
+        day = f"{day:%Y-%m-%d}"
+    return os.path.join(export_dir, f"date={day}", "cars.parquet")
+
+
+def rows_to_table(rows):
+    import pyarrow as pa
+
+    schema = cars_schema()
+    return pa.Table.from_pydict(
+        {name: [row[name] for row in rows] for name in schema.names},
+        schema=schema,
+    )
+
+
+async def export_snapshot_parquet(db: Database, run_started):
+    """
+    Stream the cars table into a compressed Parquet file, one row group
+    at a time so memory stays bounded by EXPORT_ROW_GROUP_SIZE rows.
+    """
+    path = snapshot_path(run_started)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    logger.info(f"Exporting cars snapshot to {path}")
+
+    import pyarrow.parquet as pq
+
+    schema = cars_schema()
+    exported = 0
+    with pq.ParquetWriter(
+        tmp_path, schema, compression=EXPORT_COMPRESSION
+    ) as writer:
+        async with db.pool.acquire() as conn:
+            async with conn.transaction():
+                rows = []
+                async for row in conn.cursor(
+                    f"SELECT {', '.join(schema.names)} "
+                    f"FROM cars_with_sellers "
+                    f"ORDER BY listing_key;",
+                    prefetch=10000,
+                ):
+                    rows.append(row)
+                    if len(rows) == EXPORT_ROW_GROUP_SIZE:
+                        writer.write_table(rows_to_table(rows))
+                        exported += len(rows)
+                        rows = []
+                if rows:
+                    writer.write_table(rows_to_table(rows))
+                    exported += len(rows)
+
+    os.replace(tmp_path, path)
+    logger.info(f"Exported {exported} records to {path}")
+    return path
+
+
+def list_snapshot_days(export_dir=EXPORT_DIR):
+    """Dates of the exported snapshots, oldest first."""
+    if not os.path.isdir(export_dir):
+        return []
+    return sorted(
+        name[len("date="):]
+        for name in os.listdir(export_dir)
+        if name.startswith("date=")
+    )
+
+
+def read_snapshot(day, columns=None, filters=None, export_dir=EXPORT_DIR):
+    """
+    Read a snapshot memory-mapped, loading only the requested columns.
+    Filters use pyarrow syntax, e.g. [("price_usd", "<", 10000)].
+    """
+    import pyarrow.parquet as pq
+
+    return pq.read_table(
+        snapshot_path(day, export_dir),
+        columns=columns,
+        filters=filters,
+        memory_map=True,
+    )
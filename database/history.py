@@ -0,0 +1,138 @@
+import os
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+
+from database.connection import Database
+from logs.logger import logger
+
+
+load_dotenv()
+
+OBSERVATION_RETENTION_DAYS = int(os.getenv("OBSERVATION_RETENTION_DAYS", 365))
+# Partitions created ahead of today so inserts never miss a partition
+OBSERVATION_PARTITIONS_AHEAD = int(
+    os.getenv("OBSERVATION_PARTITIONS_AHEAD", 2)
+)
+# Keep detached partitions as standalone tables instead of dropping them
+OBSERVATION_KEEP_DETACHED = (
+    os.getenv("OBSERVATION_KEEP_DETACHED", "false").lower() == "true"
+)
+
+PARTITION_PREFIX = "car_observations_"
+
+
+def partition_name(day):
+    return f"{PARTITION_PREFIX}{day:%Y%m%d}"
+
+
+async def ensure_partitions(conn, first_day, last_day):
+    """Create daily partitions covering first_day..last_day."""
+    day = first_day
+    while day <= last_day:
+        await conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(day)} "
+            f"PARTITION OF car_observations "
+            f"FOR VALUES FROM ('{day:%Y-%m-%d}') "
+            f"TO ('{day + timedelta(days=1):%Y-%m-%d}');"
+        )
+        day += timedelta(days=1)
+
+
+async def detach_old_partitions(conn, retention_days):
+    """Detach (and drop) daily partitions older than the retention."""
+    cutoff = datetime.now().date() - timedelta(days=retention_days)
+    partitions = await conn.fetch(
+        """
+        SELECT child.relname AS name
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = 'car_observations';
+        """
+    )
+
+    for row in partitions:
+        try:
+            day = datetime.strptime(
+                row["name"][len(PARTITION_PREFIX):], "%Y%m%d"
+            ).date()
+        except ValueError:
+            continue
+        if day >= cutoff:
+            continue
+
+        await conn.execute(
+            f"ALTER TABLE car_observations DETACH PARTITION {row['name']};"
+        )
+        if not OBSERVATION_KEEP_DETACHED:
+            await conn.execute(f"DROP TABLE {row['name']};")
+        logger.info(f"Detached observations partition {row['name']}")
+
+
+async def record_observations(db: Database, run_started):
+    """
+    Append one row per listing seen in this run to car_observations,
+    observed at the run start.
+    """
+    today = run_started.date()
+    async with db.pool.acquire() as conn:
+        await ensure_partitions(
+            conn, today, today + timedelta(days=OBSERVATION_PARTITIONS_AHEAD)
+        )
+        result = await conn.execute(
+            """
+            INSERT INTO car_observations (listing_key, car_vin, url,
+                                          price_usd, odometer, observed_at)
+            SELECT listing_key, car_vin, url, price_usd, odometer, $1
+            FROM cars
+            WHERE last_seen >= $1;
+            """,
+            run_started,
+        )
+        logger.info(f"Recorded listing observations: {result}")
+
+        await detach_old_partitions(conn, OBSERVATION_RETENTION_DAYS)
+
+
+async def price_history(db: Database, listing_key, since=None):
+    """Observed prices of one listing, by its listing_key, oldest first."""
+    since = since or datetime.now() - timedelta(
+        days=OBSERVATION_RETENTION_DAYS
+    )
+    async with db.pool.acquire() as conn:
+        return await conn.fetch(
+            """
+            SELECT observed_at, price_usd, odometer
+            FROM car_observations
+            WHERE listing_key = $1 AND observed_at >= $2
+            ORDER BY observed_at;
+            """,
+            listing_key,
+            since,
+        )
+
+
+async def price_drops(db: Database, since, limit=100):
+    """Listings whose price dropped between two observations since a date."""
+    async with db.pool.acquire() as conn:
+        return await conn.fetch(
+            """
+            SELECT listing_key, car_vin, url, observed_at,
+                   previous_price, price_usd,
+                   previous_price - price_usd AS drop_usd
+            FROM (
+                SELECT listing_key, car_vin, url, observed_at, price_usd,
+                       lag(price_usd) OVER (
+                           PARTITION BY listing_key ORDER BY observed_at
+                       ) AS previous_price
+                FROM car_observations
+                WHERE observed_at >= $1
+            ) observed
+            WHERE price_usd < previous_price
+            ORDER BY drop_usd DESC
+            LIMIT $2;
+            """,
+            since,
+            limit,
+        )
@@ -0,0 +1,200 @@
+import asyncio
+import os
+
+from dotenv import load_dotenv
+
+from database.connection import Database
+from logs.logger import logger
+from utils.chunk_store import iter_records
+from utils.image_store import ImageStore, image_size
+from utils.run_report import update_run_report
+
+
+load_dotenv()
+
+IMAGE_PIPELINE = os.getenv("IMAGE_PIPELINE", "false").lower() == "true"
+IMAGE_STORE_DIR = os.getenv("IMAGE_STORE_DIR", "images")
+IMAGE_STORE_MAX_MB = int(os.getenv("IMAGE_STORE_MAX_MB", 1024))
+IMAGE_CONCURRENCY = int(os.getenv("IMAGE_CONCURRENCY", 8))
+IMAGE_TIMEOUT = int(os.getenv("IMAGE_TIMEOUT", 30))
+# Larger responses are not images we want to keep
+IMAGE_MAX_BYTES = 20 * 1024 * 1024
+
+IMAGE_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/115.0.0.0 Safari/537.36"
+    )
+}
+
+SAVE_IMAGES_QUERY = """
+    INSERT INTO images (content_hash, width, height, size_bytes, content_type)
+    SELECT * FROM unnest($1::text[], $2::int[], $3::int[], $4::int[],
+                         $5::text[])
+    ON CONFLICT (content_hash) DO NOTHING;
+"""
+
+SAVE_IMAGE_URLS_QUERY = """
+    INSERT INTO image_urls (url, content_hash)
+    SELECT * FROM unnest($1::text[], $2::text[])
+    ON CONFLICT (url) DO UPDATE SET
+        content_hash = EXCLUDED.content_hash,
+        fetched_at = now();
+"""
+
+
+async def fetch_image(session, semaphore, store, url):
+    """Download one image into the store, None when it fails."""
+    import aiohttp
+
+    async with semaphore:
+        try:
+            async with session.get(url) as response:
+                if response.status != 200:
+                    logger.warning(f"Image {url} returned {response.status}")
+                    return None
+                if (response.content_length or 0) > IMAGE_MAX_BYTES:
+                    logger.warning(f"Skipping image over the limit: {url}")
+                    return None
+                # content.read(n) only returns what is buffered, read the
+                # chunks up to EOF
+                chunks, size = [], 0
+                async for chunk in response.content.iter_chunked(1 << 16):
+                    size += len(chunk)
+                    if size > IMAGE_MAX_BYTES:
+                        logger.warning(
+                            f"Skipping image over the limit: {url}"
+                        )
+                        return None
+                    chunks.append(chunk)
+                data = b"".join(chunks)
+                content_type = response.content_type
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning(f"Failed to fetch image {url}: {e}")
+            return None
+
+    content_hash, _, stored = await asyncio.to_thread(
+        store.put, data, content_type
+    )
+    width, height = image_size(data) or (None, None)
+    return {
+        "url": url,
+        "content_hash": content_hash,
+        "width": width,
+        "height": height,
+        "size_bytes": len(data),
+        "content_type": content_type,
+        "stored": stored,
+    }
+
+
+async def fetch_images(urls, store, concurrency=IMAGE_CONCURRENCY):
+    """Fetch urls with at most concurrency requests in flight."""
+    # Imported here, the load imports this module even with the pipeline off
+    import aiohttp
+
+    semaphore = asyncio.Semaphore(concurrency)
+    timeout = aiohttp.ClientTimeout(total=IMAGE_TIMEOUT)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(
+        timeout=timeout, connector=connector, headers=IMAGE_HEADERS
+    ) as session:
+        results = await asyncio.gather(
+            *(fetch_image(session, semaphore, store, url) for url in urls)
+        )
+    return [result for result in results if result]
+
+
+async def save_image_metadata(conn, images):
+    async with conn.transaction():
+        await conn.execute(
+            SAVE_IMAGES_QUERY,
+            [i["content_hash"] for i in images],
+            [i["width"] for i in images],
+            [i["height"] for i in images],
+            [i["size_bytes"] for i in images],
+            [i["content_type"] for i in images],
+        )
+        await conn.execute(
+            SAVE_IMAGE_URLS_QUERY,
+            [i["url"] for i in images],
+            [i["content_hash"] for i in images],
+        )
+
+
+async def forget_images(conn, content_hashes):
+    """Drop evicted blobs, so their URLs are fetched again."""
+    async with conn.transaction():
+        await conn.execute(
+            "DELETE FROM image_urls WHERE content_hash = ANY($1::text[]);",
+            content_hashes,
+        )
+        await conn.execute(
+            "DELETE FROM images WHERE content_hash = ANY($1::text[]);",
+            content_hashes,
+        )
+
+
+async def fetch_car_images(db: Database, json_file, store=None):
+    """
+    Fetch the main image of every scraped car not fetched before.
+    Image URLs already in image_urls are skipped while their blob is
+    stored, which marks it used for the LRU eviction. Identical images at
+    different URLs are stored and recorded once by their hash. Blobs
+    evicted from the store are removed from both tables.
+    """
+    store = store or ImageStore(IMAGE_STORE_DIR, IMAGE_STORE_MAX_MB << 20)
+    urls = {
+        record["image_url"]
+        for record in iter_records(json_file)
+        if record.get("image_url")
+    }
+
+    async with db.pool.acquire() as conn:
+        known = await conn.fetch(
+            """
+            SELECT u.url, u.content_hash, i.content_type
+            FROM image_urls u JOIN images i USING (content_hash)
+            WHERE u.url = ANY($1::text[]);
+            """,
+            list(urls),
+        )
+        # Seen again this run, so recently used; a missing blob is fetched
+        stored_urls = await asyncio.to_thread(
+            lambda: {
+                row["url"]
+                for row in known
+                if store.touch(row["content_hash"], row["content_type"])
+            }
+        )
+        new_urls = sorted(urls - stored_urls)
+        logger.info(
+            f"Fetching {len(new_urls)} new image(s), "
+            f"{len(urls) - len(new_urls)} already fetched"
+        )
+
+        images = await fetch_images(new_urls, store)
+        if images:
+            await save_image_metadata(conn, images)
+
+        evicted = await asyncio.to_thread(store.enforce_limit)
+        if evicted:
+            await forget_images(conn, evicted)
+
+    stored = sum(1 for image in images if image["stored"])
+    logger.info(
+        f"Fetched {len(images)} image(s), {stored} new blob(s), "
+        f"{len(images) - stored} identical to stored ones"
+    )
+    update_run_report(
+        "images",
+        {
+            "image_urls": len(urls),
+            "fetched": len(images),
+            "failed": len(new_urls) - len(images),
+            "new_blobs": stored,
+            "evicted_blobs": len(evicted),
+        },
+    )
+    return images
@@ -0,0 +1,134 @@
+import hashlib
+import socket
+
+from logs.logger import logger
+
+
+def advisory_lock_key(job_name):
+    """Stable signed 64-bit advisory lock key of a job."""
+    digest = hashlib.sha1(f"job:{job_name}".encode()).digest()
+    return int.from_bytes(digest[:8], "big", signed=True)
+
+
+async def try_lock_job(conn, job_name):
+    """
+    Take the job's session advisory lock on conn, False if another
+    scheduler instance (on any node) holds it.
+    """
+    return await conn.fetchval(
+        "SELECT pg_try_advisory_lock($1);", advisory_lock_key(job_name)
+    )
+
+
+async def unlock_job(conn, job_name):
+    await conn.fetchval(
+        "SELECT pg_advisory_unlock($1);", advisory_lock_key(job_name)
+    )
+
+
+async def job_locked(conn, job_name):
+    """Whether a run of the job holds its lock, on any node."""
+    if await try_lock_job(conn, job_name):
+        await unlock_job(conn, job_name)
+        return False
+    return True
+
+
+async def record_run_start(conn, job_name, scheduled_for):
+    return await conn.fetchval(
+        """
+        INSERT INTO job_runs (job, scheduled_for, started_at, status, node)
+        VALUES ($1, $2, now(), 'running', $3)
+        RETURNING id;
+        """,
+        job_name,
+        scheduled_for,
+        socket.gethostname(),
+    )
+
+
+async def record_run_finish(conn, run_id, status, error=None):
+    await conn.execute(
+        """
+        UPDATE job_runs
+        SET finished_at = now(),
+            duration_seconds = extract(epoch FROM now() - started_at),
+            status = $2,
+            error = $3
+        WHERE id = $1;
+        """,
+        run_id,
+        status,
+        error,
+    )
+
+
+async def record_skipped_run(conn, job_name, scheduled_for, status):
+    await conn.execute(
+        """
+        INSERT INTO job_runs (job, scheduled_for, started_at, finished_at,
+                              duration_seconds, status, node)
+        VALUES ($1, $2, now(), now(), 0, $3, $4);
+        """,
+        job_name,
+        scheduled_for,
+        status,
+        socket.gethostname(),
+    )
+
+
+async def last_run_scheduled_for(conn, job_name):
+    """Slot of the job's last run that started, None if it never ran."""
+    return await conn.fetchval(
+        """
+        SELECT max(scheduled_for) FROM job_runs
+        WHERE job = $1 AND status IN ('running', 'success', 'failed');
+        """,
+        job_name,
+    )
+
+
+async def run_finished(conn, job_name, scheduled_for):
+    """
+    Whether the job finished its run for the slot (or a later one).
+    Skipped runs have finished_at set too but never ran.
+    """
+    return await conn.fetchval(
+        """
+        SELECT EXISTS (
+            SELECT 1 FROM job_runs
+            WHERE job = $1 AND scheduled_for >= $2
+              AND status IN ('success', 'failed')
+        );
+        """,
+        job_name,
+        scheduled_for,
+    )
+
+
+async def job_duration_stats(conn, days=30):
+    """Run count and duration percentiles per job, for capacity planning."""
+    rows = await conn.fetch(
+        """
+        SELECT job,
+               count(*) AS runs,
+               percentile_cont(0.5) WITHIN GROUP (ORDER BY duration_seconds)
+                   AS p50_seconds,
+               percentile_cont(0.95) WITHIN GROUP (ORDER BY duration_seconds)
+                   AS p95_seconds,
+               max(duration_seconds) AS max_seconds
+        FROM job_runs
+        WHERE status = 'success'
+          AND started_at >= now() - make_interval(days => $1)
+        GROUP BY job
+        ORDER BY job;
+        """,
+        days,
+    )
+    for row in rows:
+        logger.info(
+            f"Job '{row['job']}': {row['runs']} run(s) in {days} days, "
+            f"p50 {row['p50_seconds']:.0f}s, p95 {row['p95_seconds']:.0f}s, "
+            f"max {row['max_seconds']:.0f}s"
+        )
+    return rows
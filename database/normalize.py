@@ -0,0 +1,147 @@
+import hashlib
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from dateutil import parser
+
+from logs.logger import logger
+from utils.dedup import listing_id_from_url, normalize_vin
+
+
+CAR_COLUMNS = [
+    "url",
+    "title",
+    "price_usd",
+    "odometer",
+    "username",
+    "phone_number",
+    "image_url",
+    "images_count",
+    "car_number",
+    "car_vin",
+    "listing_key",
+    "datetime_found",
+    "make",
+    "model",
+    "year",
+    # Filled by the loader once sellers are resolved, see database/sellers.py
+    "seller_id",
+]
+
+# Makes whose name spans two words in listing titles
+MULTI_WORD_MAKES = {
+    "alfa romeo",
+    "aston martin",
+    "great wall",
+    "land rover",
+    "rolls royce",
+}
+
+MONTHS = {
+    "Jan": 1,
+    "Feb": 2,
+    "Mar": 3,
+    "Apr": 4,
+    "May": 5,
+    "Jun": 6,
+    "Jul": 7,
+    "Aug": 8,
+    "Sep": 9,
+    "Oct": 10,
+    "Nov": 11,
+    "Dec": 12,
+}
+
+
+@lru_cache(maxsize=4096)
+def parse_http_date(value):
+    """
+    Parse an HTTP Date header into a naive local datetime.
+    Fixed-format RFC 1123 dates ('Sun, 19 Oct 2025 12:00:00 GMT') are
+    sliced directly, anything else falls back to dateutil.
+    """
+    if len(value) == 29 and value.endswith(" GMT") and value[3] == ",":
+        try:
+            dt = datetime(
+                int(value[12:16]),
+                MONTHS[value[8:11]],
+                int(value[5:7]),
+                int(value[17:19]),
+                int(value[20:22]),
+                int(value[23:25]),
+                tzinfo=timezone.utc,
+            )
+            return dt.astimezone(tz=None).replace(tzinfo=None)
+        except (KeyError, ValueError):
+            logger.debug(f"Not a fixed-format RFC 1123 date: {value}")
+
+    dt = parser.parse(value)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(tz=None).replace(tzinfo=None)
+    return dt
+
+
+@lru_cache(maxsize=16384)
+def parse_title(title):
+    """
+    Split a listing title such as 'Volkswagen Passat B8 2017' into
+    (make, model, year). Parts that are missing are None.
+    """
+    words = title.split()
+    year = None
+    if words and len(words[-1]) == 4 and words[-1].isdigit():
+        year = int(words.pop())
+
+    make_words = 2 if " ".join(words[:2]).lower() in MULTI_WORD_MAKES else 1
+
+    make = " ".join(words[:make_words]) or None
+    model = " ".join(words[make_words:]) or None
+    return make, model, year
+
+
+def listing_key(record):
+    """
+    Unique key of a record in cars: its VIN, or a key made of the listing
+    id in its URL when it has none, so listings without a VIN don't all
+    collide on the same empty key. car_vin itself stays the real VIN.
+    """
+    car_vin = normalize_vin(record.get("car_vin"))
+    if car_vin:
+        return car_vin
+    url = record.get("url") or ""
+    listing_id = listing_id_from_url(url)
+    if listing_id:
+        return f"id:{listing_id}"
+    # Hashed, listing_key columns created from the README are VARCHAR(50)
+    return f"url:{hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]}"
+
+
+def to_int_column(values):
+    return [int(v) if v else None for v in values]
+
+
+def normalize_records(records):
+    """
+    Normalize a chunk of scraped records into typed columns, in the
+    CAR_COLUMNS order, ready for a bulk load.
+    """
+    columns = {
+        name: [record.get(name) for record in records] for name in CAR_COLUMNS
+    }
+    columns["car_vin"] = [normalize_vin(v) for v in columns["car_vin"]]
+    columns["listing_key"] = [listing_key(record) for record in records]
+    columns["price_usd"] = to_int_column(columns["price_usd"])
+    columns["odometer"] = to_int_column(columns["odometer"])
+    columns["images_count"] = [
+        int(v) if v is not None else None for v in columns["images_count"]
+    ]
+    columns["datetime_found"] = [
+        parse_http_date(v) if v else None for v in columns["datetime_found"]
+    ]
+    title_parts = [
+        parse_title(v) if v else (None, None, None) for v in columns["title"]
+    ]
+    columns["make"] = [parts[0] for parts in title_parts]
+    columns["model"] = [parts[1] for parts in title_parts]
+    columns["year"] = [parts[2] for parts in title_parts]
+    return columns
@@ -0,0 +1,211 @@
+import argparse
+import asyncio
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+
+from dotenv import load_dotenv
+
+from database.backup_db import (
+    DB_HOST,
+    DB_NAME,
+    DB_PASSWORD,
+    DB_PORT,
+    DB_USER,
+    DUMP_FOLDER,
+    connect,
+    manifest_file_for,
+    table_manifest,
+)
+from logs.logger import logger
+
+
+load_dotenv()
+
+RESTORE_JOBS = int(os.getenv("RESTORE_JOBS", os.cpu_count() or 2))
+# Scratch database the dump is restored into, dropped and recreated
+RESTORE_DB_NAME = os.getenv("RESTORE_DB_NAME", f"{DB_NAME}_restore_check")
+RESTORE_KEEP_DB = os.getenv("RESTORE_KEEP_DB", "false").lower() == "true"
+
+
+def latest_dump(folder=DUMP_FOLDER):
+    dumps = glob.glob(os.path.join(folder, "backup_*.sql"))
+    # Timestamped names sort by creation time
+    return max(dumps) if dumps else None
+
+
+async def recreate_database(name):
+    if name == DB_NAME:
+        raise ValueError(f"Refusing to restore over the source DB '{name}'")
+    conn = await connect()
+    try:
+        await conn.execute(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE);')
+        await conn.execute(f'CREATE DATABASE "{name}";')
+    finally:
+        await conn.close()
+    logger.info(f"Created scratch database '{name}'")
+
+
+async def drop_database(name):
+    conn = await connect()
+    try:
+        await conn.execute(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE);')
+    finally:
+        await conn.close()
+    logger.info(f"Dropped scratch database '{name}'")
+
+
+def run_pg_restore(dump_file, target_db, jobs):
+    """Restore dump_file into target_db with jobs parallel workers."""
+    pg_restore_cmd = [
+        "pg_restore",
+        f"--host={DB_HOST}",
+        f"--port={DB_PORT}",
+        f"--username={DB_USER}",
+        f"--dbname={target_db}",
+        f"--jobs={jobs}",
+        "--no-owner",
+        "--no-privileges",
+        dump_file,
+    ]
+    env = os.environ.copy()
+    env["PGPASSWORD"] = DB_PASSWORD
+
+    logger.info(f"Restoring {dump_file} into '{target_db}' with {jobs} jobs")
+    started = time.monotonic()
+    result = subprocess.run(
+        pg_restore_cmd, env=env, capture_output=True, text=True
+    )
+    seconds = time.monotonic() - started
+    if result.returncode:
+        logger.error(f"pg_restore exited with {result.returncode}")
+        for line in result.stderr.splitlines()[-20:]:
+            logger.error(line)
+    return seconds, result.returncode
+
+
+def compare_manifests(expected, restored):
+    """Tables whose row count or checksum differs after the restore."""
+    mismatches = []
+    for table, values in expected.items():
+        got = restored.get(table)
+        if got is None:
+            mismatches.append({"table": table, "problem": "missing"})
+        elif got != values:
+            mismatches.append(
+                {"table": table, "expected": values, "restored": got}
+            )
+    return mismatches
+
+
+async def expected_manifest(dump_file):
+    """The dump's manifest, or the source database when there is none."""
+    manifest_file = manifest_file_for(dump_file)
+    if os.path.exists(manifest_file):
+        with open(manifest_file, "r", encoding="utf-8") as f:
+            return json.load(f)["tables"], "manifest"
+
+    logger.warning(
+        f"No manifest for {dump_file}, verifying against the live "
+        "database, which may have changed since the dump"
+    )
+    conn = await connect()
+    try:
+        return await table_manifest(conn), "source"
+    finally:
+        await conn.close()
+
+
+async def restore_check(
+    dump_file=None,
+    jobs=RESTORE_JOBS,
+    target_db=RESTORE_DB_NAME,
+    keep=RESTORE_KEEP_DB,
+):
+    """
+    Restore a dump (the latest by default) into a scratch database,
+    verify row counts and checksums of every table and report the
+    restore throughput. The report is also written next to the dump.
+    """
+    dump_file = dump_file or latest_dump()
+    if not dump_file:
+        raise FileNotFoundError(f"No backup_*.sql dumps in {DUMP_FOLDER}")
+
+    expected, verified_against = await expected_manifest(dump_file)
+    await recreate_database(target_db)
+    try:
+        seconds, returncode = await asyncio.to_thread(
+            run_pg_restore, dump_file, target_db, jobs
+        )
+        conn = await connect(target_db)
+        try:
+            restored = await table_manifest(conn)
+        finally:
+            await conn.close()
+    finally:
+        if not keep:
+            await drop_database(target_db)
+
+    mismatches = compare_manifests(expected, restored)
+    dump_mb = os.path.getsize(dump_file) / 1024 / 1024
+    rows = sum(table["rows"] for table in restored.values())
+    report = {
+        "dump_file": dump_file,
+        "verified_against": verified_against,
+        "jobs": jobs,
+        "seconds": round(seconds, 2),
+        "dump_mb": round(dump_mb, 2),
+        "mb_per_second": round(dump_mb / seconds, 2) if seconds else None,
+        "rows": rows,
+        "rows_per_second": round(rows / seconds) if seconds else None,
+        "tables": len(restored),
+        "pg_restore_exit_code": returncode,
+        "mismatches": mismatches,
+        "ok": returncode == 0 and not mismatches,
+    }
+
+    report_file = f"{os.path.splitext(dump_file)[0]}.restore.json"
+    with open(report_file, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    logger.info(
+        f"Restored {rows} rows of {len(restored)} tables in "
+        f"{seconds:.1f}s ({report['mb_per_second']} MB/s, "
+        f"{report['rows_per_second']} rows/s)"
+    )
+    if report["ok"]:
+        logger.info(
+            f"Dump {dump_file} verified against the {verified_against}"
+        )
+    else:
+        logger.error(
+            f"Dump {dump_file} failed verification: "
+            f"{len(mismatches)} table(s) differ, see {report_file}"
+        )
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Restore a dump into a scratch database and verify it."
+    )
+    parser.add_argument("dump_file", nargs="?", help="latest dump if unset")
+    parser.add_argument("--jobs", type=int, default=RESTORE_JOBS)
+    parser.add_argument("--target-db", default=RESTORE_DB_NAME)
+    parser.add_argument(
+        "--keep", action="store_true", default=RESTORE_KEEP_DB,
+        help="keep the scratch database for inspection",
+    )
+    args = parser.parse_args()
+
+    report = asyncio.run(
+        restore_check(args.dump_file, args.jobs, args.target_db, args.keep)
+    )
+    sys.exit(0 if report["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import socket
+import statistics
+import sys
+from collections import Counter
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+from database.connection import Database
+from logs.logger import logger
+from utils.run_report import RUN_REPORT_FILE
+
+
+load_dotenv()
+
+RUN_REPORT_STORE = os.getenv("RUN_REPORT_STORE", "true").lower() == "true"
+# Runs before the compared one that form its baseline
+RUN_BASELINE_RUNS = int(os.getenv("RUN_BASELINE_RUNS", 14))
+# Robust z-score above which a metric counts as regressed
+RUN_REGRESSION_Z = float(os.getenv("RUN_REGRESSION_Z", 3.5))
+# Smaller relative changes are never flagged, however stable the baseline
+RUN_MIN_CHANGE = float(os.getenv("RUN_MIN_CHANGE", 0.1))
+MIN_BASELINE_RUNS = 5
+
+# 1 when a higher value is worse, -1 when a lower value is worse
+METRIC_DIRECTIONS = {
+    "total_seconds": 1,
+    "snapshot_seconds": 1,
+    "crawl_seconds": 1,
+    "merge_seconds": 1,
+    "db_seconds": 1,
+    "seconds_per_car": 1,
+    "chunk_imbalance": 1,
+    "listing_pages": -1,
+    "car_pages": -1,
+    "cars": -1,
+    "phone_success_rate": -1,
+    "db_rows_per_second": -1,
+}
+
+SPIDER_COUNTERS = (
+    "listing_pages",
+    "car_pages",
+    "cars",
+    "phone_attempts",
+    "phones_found",
+)
+
+
+def run_metrics(report):
+    """Flat per-run metrics out of the sections of a run report."""
+    metrics = {
+        f"{phase}_seconds": seconds
+        for phase, seconds in report.get("phases", {}).items()
+    }
+
+    spiders = [
+        data
+        for section, data in report.items()
+        if section.startswith("crawl_spider_")
+    ]
+    totals = Counter()
+    for spider in spiders:
+        for key in SPIDER_COUNTERS:
+            totals[key] += spider.get(key, 0)
+    for key in ("listing_pages", "car_pages", "cars"):
+        metrics[key] = totals[key]
+    if totals["phone_attempts"]:
+        metrics["phone_success_rate"] = round(
+            totals["phones_found"] / totals["phone_attempts"], 4
+        )
+    if totals["cars"] and metrics.get("crawl_seconds"):
+        metrics["seconds_per_car"] = round(
+            metrics["crawl_seconds"] / totals["cars"], 3
+        )
+
+    # Slowest spider process against the average one, 1.0 is balanced
+    durations = [s["seconds"] for s in spiders if s.get("seconds")]
+    if len(durations) > 1:
+        metrics["chunk_imbalance"] = round(
+            max(durations) / statistics.fmean(durations), 3
+        )
+
+    rows_per_second = report.get("db_load", {}).get("rows_per_second")
+    if rows_per_second:
+        metrics["db_rows_per_second"] = rows_per_second
+    return metrics
+
+
+async def store_run_report(report, run_started):
+    """Persist a run report and its metrics, None if that fails."""
+    metrics = run_metrics(report)
+    db = Database()
+    try:
+        await db.connect()
+        async with db.pool.acquire() as conn:
+            run_id = await conn.fetchval(
+                """
+                INSERT INTO run_reports (run_started, node, metrics, report)
+                VALUES ($1, $2, $3::jsonb, $4::jsonb)
+                RETURNING id;
+                """,
+                run_started,
+                socket.gethostname(),
+                json.dumps(metrics),
+                json.dumps(report, default=str),
+            )
+    except Exception as e:
+        logger.error(f"Failed to store run report: {e}")
+        return None
+    finally:
+        await db.close()
+
+    logger.info(f"Stored run report {run_id} with {len(metrics)} metrics")
+    return run_id
+
+
+def robust_z(value, history):
+    """
+    Modified z-score of value against history (median and MAD), robust to
+    the odd outlier run in the baseline. Falls back to the standard
+    deviation when most runs are identical.
+    """
+    median = statistics.median(history)
+    mad = statistics.median(abs(x - median) for x in history)
+    if mad:
+        return 0.6745 * (value - median) / mad, median
+    stdev = statistics.pstdev(history)
+    if stdev:
+        return (value - median) / stdev, median
+    if value == median:
+        return 0.0, median
+    return math.copysign(math.inf, value - median), median
+
+
+def compare_metrics(
+    latest,
+    baseline,
+    z_threshold=RUN_REGRESSION_Z,
+    min_change=RUN_MIN_CHANGE,
+):
+    """
+    Compare the metrics of a run with those of baseline runs. A metric
+    regressed when it moved in its worse direction by at least z_threshold
+    robust z-scores and by at least min_change relative to the median.
+    """
+    results = []
+    for metric, direction in METRIC_DIRECTIONS.items():
+        value = latest.get(metric)
+        history = [m[metric] for m in baseline if m.get(metric) is not None]
+        if value is None:
+            continue
+        if len(history) < MIN_BASELINE_RUNS:
+            results.append(
+                {"metric": metric, "value": value, "status": "no_baseline"}
+            )
+            continue
+
+        z, median = robust_z(value, history)
+        change = (value - median) / median if median else None
+        worse = direction * z
+        regressed = worse >= z_threshold and (
+            change is None or abs(change) >= min_change
+        )
+        improved = -worse >= z_threshold and (
+            change is None or abs(change) >= min_change
+        )
+        results.append(
+            {
+                "metric": metric,
+                "value": value,
+                "baseline_median": round(median, 4),
+                "change": round(change, 4) if change is not None else None,
+                "z": round(z, 2) if math.isfinite(z) else z,
+                "status": (
+                    "regressed"
+                    if regressed
+                    else "improved" if improved else "ok"
+                ),
+            }
+        )
+    return results
+
+
+async def fetch_runs(conn, run_id=None, baseline_runs=RUN_BASELINE_RUNS):
+    """The compared run (latest by default) and its baseline runs."""
+    if run_id is None:
+        run_id = await conn.fetchval("SELECT max(id) FROM run_reports;")
+    latest = await conn.fetchrow(
+        "SELECT id, run_started, metrics FROM run_reports WHERE id = $1;",
+        run_id,
+    )
+    if latest is None:
+        return None, []
+    baseline = await conn.fetch(
+        """
+        SELECT id, run_started, metrics FROM run_reports
+        WHERE id < $1
+        ORDER BY id DESC
+        LIMIT $2;
+        """,
+        run_id,
+        baseline_runs,
+    )
+    return latest, baseline
+
+
+async def compare_latest_run(run_id=None, baseline_runs=RUN_BASELINE_RUNS):
+    db = Database()
+    await db.connect()
+    try:
+        async with db.pool.acquire() as conn:
+            latest, baseline = await fetch_runs(conn, run_id, baseline_runs)
+    finally:
+        await db.close()
+
+    if latest is None:
+        logger.error("No stored run reports to compare")
+        return None, []
+
+    results = compare_metrics(
+        json.loads(latest["metrics"]),
+        [json.loads(row["metrics"]) for row in baseline],
+    )
+    return latest, results
+
+
+async def list_runs(limit):
+    db = Database()
+    await db.connect()
+    try:
+        async with db.pool.acquire() as conn:
+            return await conn.fetch(
+                """
+                SELECT id, run_started, node, metrics FROM run_reports
+                ORDER BY id DESC
+                LIMIT $1;
+                """,
+                limit,
+            )
+    finally:
+        await db.close()
+
+
+def print_comparison(latest, results):
+    print(f"Run {latest['id']} started {latest['run_started']}")
+    print(
+        f"{'metric':>20} {'value':>12} {'baseline':>12} "
+        f"{'change':>8} {'z':>7}  status"
+    )
+    for r in results:
+        if r["status"] == "no_baseline":
+            print(f"{r['metric']:>20} {r['value']:>12}  no baseline")
+            continue
+        change = f"{r['change']:+.1%}" if r["change"] is not None else "-"
+        status = r["status"]
+        print(
+            f"{r['metric']:>20} {r['value']:>12} "
+            f"{r['baseline_median']:>12} {change:>8} {r['z']:>7}  "
+            f"{status.upper() if status == 'regressed' else status}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Stored run reports and performance regressions."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    compare = commands.add_parser(
+        "compare", help="compare a run with its rolling baseline"
+    )
+    compare.add_argument("--run-id", type=int, help="latest run if unset")
+    compare.add_argument("--baseline", type=int, default=RUN_BASELINE_RUNS)
+
+    store = commands.add_parser("store", help="store a run report file")
+    store.add_argument("report_file", nargs="?", default=RUN_REPORT_FILE)
+
+    runs = commands.add_parser("list", help="list stored runs")
+    runs.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        latest, results = asyncio.run(
+            compare_latest_run(args.run_id, args.baseline)
+        )
+        if latest is None:
+            sys.exit(1)
+        print_comparison(latest, results)
+        regressed = [r for r in results if r["status"] == "regressed"]
+        sys.exit(1 if regressed else 0)
+
+    if args.command == "store":
+        with open(args.report_file, "r", encoding="utf-8") as f:
+            report = json.load(f)
+        run_started = datetime.fromtimestamp(
+            os.path.getmtime(args.report_file)
+        )
+        run_id = asyncio.run(store_run_report(report, run_started))
+        sys.exit(0 if run_id else 1)
+
+    for row in asyncio.run(list_runs(args.limit)):
+        metrics = json.loads(row["metrics"])
+        print(
+            f"{row['id']:>6}  {row['run_started']:%Y-%m-%d %H:%M}  "
+            f"{row['node']}  total {metrics.get('total_seconds', '-')}s  "
+            f"cars {metrics.get('cars', '-')}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,69 +1,162 @@
-import json
+import itertools
+import os
+import time
+from datetime import datetime
 
-import asyncpg
-from dateutil import parser
+from dotenv import load_dotenv
 
 from database.connection import Database
+from database.normalize import CAR_COLUMNS, listing_key, normalize_records
+from database.sellers import SellerCache, link_sellers
 from logs.logger import logger
+from utils.chunk_store import iter_records
+from utils.run_report import update_run_report
 
 
-async def save_json_to_db(json_file, db: Database):
-    """Load JSON records and save them asynchronously to database."""
-    logger.info(f"Loading JSON file: {json_file}")
+load_dotenv()
 
+SAVE_BATCH_SIZE = int(os.getenv("SAVE_BATCH_SIZE", 1000))
+
+# Column arrays are unnested server side, one statement per batch
+INSERT_CARS_QUERY = """
+    INSERT INTO cars (url, title, price_usd,
+                      odometer, username,
+                      phone_number, image_url,
+                      images_count,
+                      car_number, car_vin,
+                      listing_key, datetime_found,
+                      make, model, year,
+                      seller_id, last_seen)
+    SELECT *, $17::timestamp
+    FROM unnest($1::text[], $2::text[], $3::int[],
+                $4::int[], $5::text[], $6::text[],
+                $7::text[], $8::int[], $9::text[],
+                $10::text[], $11::text[], $12::timestamp[],
+                $13::text[], $14::text[], $15::int[],
+                $16::bigint[])
+"""
+
+SKIP_DUPLICATES = """
+    ON CONFLICT (listing_key) DO NOTHING
+    RETURNING listing_key
+"""
+
+UPSERT_CAR_CONFLICT = """
+    ON CONFLICT (listing_key) DO UPDATE SET
+        url = EXCLUDED.url,
+        title = EXCLUDED.title,
+        price_usd = EXCLUDED.price_usd,
+        odometer = EXCLUDED.odometer,
+        username = EXCLUDED.username,
+        phone_number = EXCLUDED.phone_number,
+        image_url = EXCLUDED.image_url,
+        images_count = EXCLUDED.images_count,
+        car_number = EXCLUDED.car_number,
+        car_vin = EXCLUDED.car_vin,
+        datetime_found = EXCLUDED.datetime_found,
+        make = EXCLUDED.make,
+        model = EXCLUDED.model,
+        year = EXCLUDED.year,
+        seller_id = EXCLUDED.seller_id,
+        last_seen = EXCLUDED.last_seen
+    RETURNING listing_key
+"""
+
+
+async def touch_unchanged_listings(conn, urls, run_started):
+    """Refresh last_seen of listings skipped as unchanged by the spider."""
+    if not urls:
+        return
+
+    result = await conn.execute(
+        "UPDATE cars SET last_seen = $1 WHERE url = ANY($2::text[]);",
+        run_started,
+        urls,
+    )
+    logger.info(f"Refreshed last_seen of unchanged listings: {result}")
+
+
+def keep_last_per_listing(records):
+    """An upsert statement cannot update the same row twice."""
+    return list({listing_key(record): record for record in records}.values())
+
+
+def iter_batches(records, size):
+    records = iter(records)
+    while batch := list(itertools.islice(records, size)):
+        yield batch
+
+
+async def save_json_to_db(
+    json_file, db: Database, run_started=None, upsert=False
+):
+    """
+    Stream records of a spider output file (JSON or chunk store) and
+    save them asynchronously to database.
+    """
+    logger.info(f"Loading records from: {json_file}")
+    run_started = run_started or datetime.now()
+    query = INSERT_CARS_QUERY + (
+        UPSERT_CAR_CONFLICT if upsert else SKIP_DUPLICATES
+    )
+
+    started = time.perf_counter()
+    sellers = SellerCache()
     async with db.pool.acquire() as conn:
-        with open(json_file, "r", encoding="utf-8") as f:
-            records = json.load(f)
-        logger.info(f"Loaded {len(records)} records from JSON.")
-
-        for i, record in enumerate(records, 1):
-            # Normalize and prepare fields
-            record["price_usd"] = (
-                int(record["price_usd"]) if record.get("price_usd") else None
-            )
-            record["odometer"] = (
-                int(record["odometer"]) if record.get("odometer") else None
+        unchanged_urls = []
+        total = saved = 0
+        for batch in iter_batches(iter_records(json_file), SAVE_BATCH_SIZE):
+            unchanged_urls.extend(
+                r["url"] for r in batch if r.get("unchanged")
             )
+            batch = [r for r in batch if not r.get("unchanged")]
+            if not batch:
+                continue
+            start, total = total, total + len(batch)
+            if upsert:
+                batch = keep_last_per_listing(batch)
 
-            if record.get("datetime_found"):
-                dt = parser.parse(record["datetime_found"])
-                if dt.tzinfo is not None:
-                    dt = dt.astimezone(tz=None).replace(tzinfo=None)
-                record["datetime_found"] = dt
-            else:
-                record["datetime_found"] = None
-
-            try:
-                await conn.execute(
-                    """
-                    INSERT INTO cars (url, title, price_usd,
-                                      odometer, username,
-                                      phone_number, image_url,
-                                      images_count,
-                                      car_number, car_vin,
-                                      datetime_found)
-                    VALUES ($1, $2, $3, $4, $5,
-                            $6, $7, $8, $9, $10, $11)
-                    """,
-                    record["url"],
-                    record["title"],
-                    record["price_usd"],
-                    record["odometer"],
-                    record["username"],
-                    record["phone_number"],
-                    record["image_url"],
-                    record["images_count"],
-                    record["car_number"],
-                    record["car_vin"],
-                    record["datetime_found"],
-                )
-                logger.info(
-                    f"Saved record {i}/{len(records)}: URL={record['url']}"
-                )
+            columns = normalize_records(batch)
+            seller_ids = await sellers.resolve(
+                conn,
+                columns["phone_number"],
+                columns["username"],
+                run_started,
+            )
+            link_sellers(columns, seller_ids)
+            rows = await conn.fetch(
+                query,
+                *(columns[name] for name in CAR_COLUMNS),
+                run_started,
+            )
+            saved += len(rows)
 
-            except asyncpg.exceptions.UniqueViolationError:
+            skipped = len(batch) - len(rows)
+            if skipped:
                 logger.warning(
-                    f"Skipped DB duplicate at insert time: index={i}, URL={record['url']}"
+                    f"Skipped {skipped} DB duplicate(s) at insert time "
+                    f"in records {start + 1}-{start + len(batch)}"
                 )
+            logger.info(f"Saved {saved}/{total} records")
+
+        logger.info(
+            f"{total} changed and {len(unchanged_urls)} "
+            f"unchanged listings processed."
+        )
+        await touch_unchanged_listings(conn, unchanged_urls, run_started)
 
+    seconds = time.perf_counter() - started
+    update_run_report(
+        "db_load",
+        {
+            "records": total,
+            "saved": saved,
+            "db_duplicates": total - saved,
+            "unchanged": len(unchanged_urls),
+            "seconds": round(seconds, 2),
+            "rows_per_second": round(total / seconds) if seconds else None,
+        },
+    )
+    update_run_report("sellers", sellers.stats())
+    logger.info(f"Sellers resolved: {sellers.stats()}")
     logger.info("All records processed.")
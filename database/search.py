@@ -0,0 +1,146 @@
+import re
+
+from database.connection import Database
+from database.normalize import parse_title
+from logs.logger import logger
+
+
+SEARCH_COLUMNS = """
+    url, title, make, model, year, price_usd, odometer,
+    car_vin, listing_key, datetime_found
+"""
+# Trigrams of prefixes shorter than this match too much to be selective
+MIN_TRIGRAM_LENGTH = 3
+BACKFILL_BATCH_SIZE = 5000
+
+
+def escape_like(text):
+    return (
+        text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    )
+
+
+async def suggest_titles(conn, prefix, limit=10):
+    """
+    Typeahead suggestions for a title prefix, most listed first.
+    Distinct titles come from cars_title_price_stats, which is far
+    smaller than cars and carries its own trigram index.
+    """
+    prefix = prefix.strip()
+    if not prefix:
+        return []
+
+    if len(prefix) < MIN_TRIGRAM_LENGTH:
+        condition = "lower(title) LIKE lower($1) || '%'"
+    else:
+        condition = "title ILIKE '%' || $1 || '%'"
+    return await conn.fetch(
+        f"""
+        SELECT title, listings
+        FROM cars_title_price_stats
+        WHERE {condition}
+        ORDER BY title ILIKE $1 || '%' DESC, listings DESC, title
+        LIMIT $2;
+        """,
+        escape_like(prefix),
+        limit,
+    )
+
+
+async def search_cars(conn, text, limit=50):
+    """
+    Listings whose title contains all words of text, best matches first.
+    Words are matched as prefixes, so 'volks pas' finds Volkswagen Passat.
+    """
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return []
+
+    query = " & ".join(f"{word}:*" for word in words)
+    return await conn.fetch(
+        f"""
+        SELECT {SEARCH_COLUMNS}
+        FROM cars
+        WHERE to_tsvector('simple', coalesce(title, ''))
+              @@ to_tsquery('simple', $1)
+        ORDER BY ts_rank(
+                     to_tsvector('simple', coalesce(title, '')),
+                     to_tsquery('simple', $1)
+                 ) DESC,
+                 datetime_found DESC NULLS LAST
+        LIMIT $2;
+        """,
+        query,
+        limit,
+    )
+
+
+async def find_cars(
+    conn, make, model=None, year_from=None, year_to=None, limit=50
+):
+    """Listings of a make, optionally narrowed by model and year range."""
+    conditions = ["lower(make) = lower($1)"]
+    args = [make]
+    if model:
+        args.append(model)
+        conditions.append(f"lower(model) = lower(${len(args)})")
+    if year_from:
+        args.append(year_from)
+        conditions.append(f"year >= ${len(args)}")
+    if year_to:
+        args.append(year_to)
+        conditions.append(f"year <= ${len(args)}")
+    args.append(limit)
+
+    return await conn.fetch(
+        f"""
+        SELECT {SEARCH_COLUMNS}
+        FROM cars
+        WHERE {" AND ".join(conditions)}
+        ORDER BY datetime_found DESC NULLS LAST
+        LIMIT ${len(args)};
+        """,
+        *args,
+    )
+
+
+async def backfill_title_parts(db: Database):
+    """
+    Fill make, model and year of rows saved before these columns existed.
+    Rows are kept across runs in delta mode, so they are not reloaded.
+    """
+    updated = 0
+    last_key = ""
+    async with db.pool.acquire() as conn:
+        while True:
+            # Walk by listing_key, titles without a make would match again
+            rows = await conn.fetch(
+                "SELECT listing_key, title FROM cars "
+                "WHERE make IS NULL AND title IS NOT NULL "
+                "AND listing_key > $1 "
+                "ORDER BY listing_key LIMIT $2;",
+                last_key,
+                BACKFILL_BATCH_SIZE,
+            )
+            if not rows:
+                break
+            last_key = rows[-1]["listing_key"]
+
+            parts = [parse_title(row["title"]) for row in rows]
+            await conn.execute(
+                """
+                UPDATE cars SET make = u.make, model = u.model, year = u.year
+                FROM unnest($1::text[], $2::text[], $3::text[], $4::int[])
+                     AS u(listing_key, make, model, year)
+                WHERE cars.listing_key = u.listing_key;
+                """,
+                [row["listing_key"] for row in rows],
+                [p[0] for p in parts],
+                [p[1] for p in parts],
+                [p[2] for p in parts],
+            )
+            updated += len(rows)
+
+    if updated:
+        logger.info(f"Backfilled make, model and year of {updated} listings")
+    return updated
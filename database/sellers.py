@@ -0,0 +1,106 @@
+from database.connection import Database
+from logs.logger import logger
+
+
+# One statement per batch for the phones not resolved yet in this load.
+# DO UPDATE rather than DO NOTHING, so existing sellers are returned too.
+GET_OR_CREATE_SELLERS_QUERY = """
+    INSERT INTO sellers (phone, username, first_seen, last_seen)
+    SELECT u.phone, u.username, $3, $3
+    FROM unnest($1::text[], $2::text[]) AS u(phone, username)
+    ON CONFLICT (phone) DO UPDATE SET
+        username = coalesce(
+            nullif(EXCLUDED.username, ''), sellers.username
+        ),
+        last_seen = EXCLUDED.last_seen
+    RETURNING id, phone, (xmax = 0) AS inserted
+"""
+
+
+class SellerCache:
+    """
+    Seller ids by phone number (as cleaned by clean_phone), kept for one
+    load so a dealer with hundreds of listings is resolved once.
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.created = 0
+        self.linked = 0
+
+    async def resolve(self, conn, phones, usernames, seen_at):
+        """Seller id of every listing, None for listings without a phone."""
+        missing = {}
+        for phone, username in zip(phones, usernames):
+            if phone and phone not in self.ids:
+                # A phone twice in one statement would be updated twice
+                missing[phone] = username or missing.get(phone)
+
+        if missing:
+            rows = await conn.fetch(
+                GET_OR_CREATE_SELLERS_QUERY,
+                list(missing),
+                list(missing.values()),
+                seen_at,
+            )
+            for row in rows:
+                self.ids[row["phone"]] = row["id"]
+                self.created += row["inserted"]
+
+        seller_ids = [
+            self.ids.get(phone) if phone else None for phone in phones
+        ]
+        self.linked += sum(1 for seller_id in seller_ids if seller_id)
+        return seller_ids
+
+    def stats(self):
+        return {
+            "sellers": len(self.ids),
+            "created": self.created,
+            "listings_linked": self.linked,
+        }
+
+
+def link_sellers(columns, seller_ids):
+    """
+    Point listings at their seller, keeping username and phone_number on
+    the listing only when it has no seller.
+    """
+    columns["seller_id"] = seller_ids
+    for name in ("username", "phone_number"):
+        columns[name] = [
+            None if seller_id else value
+            for seller_id, value in zip(seller_ids, columns[name])
+        ]
+    return columns
+
+
+async def backfill_sellers(db: Database):
+    """
+    Move seller columns of rows saved before the sellers table existed.
+    Rows are kept across runs in delta mode, so they are not reloaded.
+    """
+    async with db.pool.acquire() as conn:
+        async with conn.transaction():
+            created = await conn.execute(
+                """
+                INSERT INTO sellers (phone, username, first_seen, last_seen)
+                SELECT DISTINCT ON (phone_number)
+                       phone_number, username, datetime_found, last_seen
+                FROM cars
+                WHERE seller_id IS NULL AND phone_number <> ''
+                ORDER BY phone_number, last_seen DESC NULLS LAST
+                ON CONFLICT (phone) DO NOTHING;
+                """
+            )
+            linked = await conn.execute(
+                """
+                UPDATE cars
+                SET seller_id = s.id, username = NULL, phone_number = NULL
+                FROM sellers s
+                WHERE cars.seller_id IS NULL
+                  AND cars.phone_number <> ''
+                  AND s.phone = cars.phone_number;
+                """
+            )
+    logger.info(f"Sellers backfilled: {created}, listings linked: {linked}")
@@ -0,0 +1,28 @@
+import json
+
+from database.connection import Database
+from logs.logger import logger
+
+
+async def export_listing_snapshot(db: Database, snapshot_file):
+    """Write last stored card fields of every listing, keyed by URL."""
+    logger.info(f"Exporting listing snapshot to {snapshot_file}")
+
+    async with db.pool.acquire() as conn:
+        rows = await conn.fetch(
+            "SELECT url, title, price_usd, odometer FROM cars;"
+        )
+
+    snapshot = {
+        row["url"]: {
+            "title": row["title"],
+            "price_usd": row["price_usd"],
+            "odometer": row["odometer"],
+        }
+        for row in rows
+    }
+
+    with open(snapshot_file, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, ensure_ascii=False)
+
+    logger.info(f"Exported snapshot of {len(snapshot)} listings.")
@@ -9,6 +9,7 @@ CREATE TABLE cars (
     image_url TEXT,
     images_count INTEGER,
     car_number TEXT,
-    car_vin VARCHAR(50) UNIQUE NOT NULL,
+    car_vin VARCHAR(50),
+    listing_key VARCHAR(50) UNIQUE NOT NULL,
     datetime_found TIMESTAMP
 );
\ No newline at end of file
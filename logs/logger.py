@@ -23,8 +23,9 @@ console_handler.setLevel(logging.DEBUG)
 console_format = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
 console_handler.setFormatter(console_format)
 
-# File handler for logging info and higher-level messages to file
-file_handler = logging.FileHandler(log_filename, encoding="utf-8")
+# File handler for logging info and higher-level messages to file,
+# the file is only created once something is logged
+file_handler = logging.FileHandler(log_filename, encoding="utf-8", delay=True)
 file_handler.setLevel(logging.DEBUG)
 file_format = logging.Formatter(
     "%(asctime)s - %(levelname)s - %(name)s - %(message)s"
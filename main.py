@@ -1,37 +1,98 @@
 import asyncio
 import os
+import time
+from contextlib import nullcontext
+from datetime import datetime
 
 from dotenv import load_dotenv
 
 from logs.logger import logger
-from database.db_utils import run_db_tasks
+from database.db_utils import (
+    DELTA_DETECTION,
+    export_snapshot,
+    run_db_tasks,
+)
+from database.run_reports import RUN_REPORT_STORE, store_run_report
+from utils.dedup import reset_dedup_index
 from utils.file_utils import cleanup_old_chunks, merge_output_chunks
-from utils.scraper_utils import run_parallel_spiders
+from utils.profiling import (
+    PROFILE_DB,
+    merge_profiles,
+    profiled,
+    start_profile_run,
+)
+from utils.run_report import (
+    build_run_report,
+    reset_run_report,
+    timed_phase,
+    update_run_report,
+)
 
 
 load_dotenv()
 
 PAGE_TO_SCRAPE = int(os.getenv("PAGE_TO_SCRAPE", 3))
 CHUNKS = int(os.getenv("CHUNKS", 3))
+SHARDING = os.getenv("SHARDING", "false").lower() == "true"
 
 
-async def main():
+async def main(pool=None):
+    # Scrapy and Selenium are imported by the workflow only, not by the
+    # scheduler or the CLI commands that import this module
+    from utils.scraper_utils import (
+        cleanup_crawl_queues,
+        run_parallel_spiders,
+        run_sharded_spiders,
+    )
+
     logger.info("Starting full scraping workflow")
+    run_started = datetime.now()
+    started = time.perf_counter()
+    profile_dir = start_profile_run()
 
     logger.info("Cleaning up old chunk files")
     # Delete old chunk files to avoid merging stale data
     cleanup_old_chunks()
+    cleanup_crawl_queues()
+    reset_dedup_index()
+    reset_run_report()
 
-    logger.info(
-        f"Running spiders for {PAGE_TO_SCRAPE} pages in {CHUNKS} chunks"
-    )
-    run_parallel_spiders(total_pages=PAGE_TO_SCRAPE, chunks=CHUNKS)
+    if DELTA_DETECTION:
+        logger.info("Exporting listing snapshot for delta detection")
+        with timed_phase("snapshot"):
+            await export_snapshot()
+
+    with timed_phase("crawl"):
+        if SHARDING:
+            logger.info(
+                f"Running spiders for filter shards in {CHUNKS} chunks"
+            )
+            run_sharded_spiders(workers=CHUNKS, pool=pool)
+        else:
+            logger.info(
+                f"Running spiders for {PAGE_TO_SCRAPE} pages "
+                f"in {CHUNKS} chunks"
+            )
+            run_parallel_spiders(
+                total_pages=PAGE_TO_SCRAPE, chunks=CHUNKS, pool=pool
+            )
 
     logger.info("Merging output chunk files")
-    merge_output_chunks()
+    with timed_phase("merge"):
+        merge_output_chunks()
 
     logger.info("Running DB tasks (save and backup)")
-    await run_db_tasks()
+    with timed_phase("db"):
+        with profiled("db", profile_dir) if PROFILE_DB else nullcontext():
+            await run_db_tasks()
+
+    merge_profiles(profile_dir)
+    update_run_report(
+        "phases", {"total": round(time.perf_counter() - started, 2)}
+    )
+    report = build_run_report()
+    if RUN_REPORT_STORE:
+        await store_run_report(report, run_started)
 
     logger.info("Workflow complete")
 
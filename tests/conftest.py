@@ -0,0 +1,22 @@
+import os
+
+import pytest
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+# Postgres tests truncate tables, so they only run against a scratch DB
+TEST_DB_NAME = os.getenv("TEST_DB_NAME")
+
+requires_db = pytest.mark.skipif(
+    not TEST_DB_NAME or TEST_DB_NAME == os.getenv("DB_NAME"),
+    reason="set TEST_DB_NAME to a scratch database other than DB_NAME",
+)
+
+
+@pytest.fixture
+def test_db(monkeypatch):
+    """Point Database() at the scratch database."""
+    monkeypatch.setenv("DB_NAME", TEST_DB_NAME)
+    return TEST_DB_NAME
@@ -0,0 +1,121 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer, make_mocked_request
+
+from api.server import create_app, query_int
+from tests.conftest import requires_db
+
+
+FOUND = datetime(2026, 1, 1, 12, 0)
+# Two listings share a datetime_found, the cursor must tell them apart
+CARS = [
+    (f"VIN{i:03d}", 1000 * (i + 1), FOUND - timedelta(hours=i // 2 * 2 + 1))
+    for i in range(7)
+]
+
+
+async def seed(conn):
+    await conn.execute("TRUNCATE cars;")
+    await conn.executemany(
+        """
+        INSERT INTO cars (url, title, price_usd, odometer, car_vin,
+                          listing_key, datetime_found, last_seen)
+        VALUES ($1, 'Volkswagen Passat 2015', $2, 100000, $3, $3, $4, $4);
+        """,
+        [
+            (f"https://auto.ria.com/{vin}.html", price, vin, found)
+            for vin, price, found in CARS
+        ],
+    )
+
+
+def run_with_client(check):
+    async def go():
+        app = create_app(cache_ttl=0)
+        async with TestClient(TestServer(app)) as client:
+            async with app["db"].pool.acquire() as conn:
+                await seed(conn)
+            await check(client)
+
+    asyncio.run(go())
+
+
+@pytest.mark.parametrize("value", ["0", "-1", "abc"])
+def test_query_int_rejects_bad_limits(value):
+    request = make_mocked_request("GET", f"/cars?limit={value}")
+    with pytest.raises(web.HTTPBadRequest):
+        query_int(request, "limit", 50, 100, minimum=1)
+
+
+def test_query_int_caps_at_maximum():
+    request = make_mocked_request("GET", "/cars?limit=500")
+    assert query_int(request, "limit", 50, 100, minimum=1) == 100
+
+
+@requires_db
+def test_pagination_walks_every_listing_once(test_db):
+    async def check(client):
+        seen, cursor = [], None
+        while True:
+            params = {"limit": "3"}
+            if cursor:
+                params["cursor"] = cursor
+            response = await client.get("/cars", params=params)
+            assert response.status == 200
+            body = await response.json()
+            seen.extend(item["car_vin"] for item in body["items"])
+            cursor = body["next_cursor"]
+            if not cursor:
+                break
+
+        expected = [
+            vin
+            for vin, _, found in sorted(
+                CARS, key=lambda car: (car[2], car[0]), reverse=True
+            )
+        ]
+        assert seen == expected
+
+    run_with_client(check)
+
+
+@requires_db
+def test_filters_match_count(test_db):
+    async def check(client):
+        params = {"price_min": "2000", "price_max": "5000"}
+        response = await client.get("/cars", params=params)
+        items = (await response.json())["items"]
+        assert sorted(item["price_usd"] for item in items) == [
+            2000,
+            3000,
+            4000,
+            5000,
+        ]
+
+        response = await client.get("/stats/count", params=params)
+        assert (await response.json())["count"] == 4
+
+    run_with_client(check)
+
+
+@requires_db
+@pytest.mark.parametrize(
+    "query",
+    [
+        "limit=0",
+        "limit=-5",
+        "limit=abc",
+        "price_min=cheap",
+        "found_from=yesterday",
+        "cursor=not-a-cursor",
+    ],
+)
+def test_bad_input_is_a_client_error(test_db, query):
+    async def check(client):
+        response = await client.get(f"/cars?{query}")
+        assert response.status == 400
+
+    run_with_client(check)
@@ -0,0 +1,25 @@
+import pytest
+from scrapy.http import HtmlResponse
+
+from auto_ria_scraper.auto_ria_scraper.helpers.car_extractor import (
+    CarExtractor,
+)
+from auto_ria_scraper.auto_ria_scraper.spiders.autoria import (
+    DELETED_NOTICE_RE,
+)
+from benchmarks.bench_extractor import NOTICES, extract_with_selectors
+from benchmarks.synthetic import car_page_html, generate_records
+
+
+@pytest.mark.parametrize("notice", NOTICES)
+def test_single_pass_matches_selectors(notice):
+    record = generate_records(1)[0]
+    response = HtmlResponse(
+        url=record["url"],
+        body=car_page_html(record, filler_blocks=5, notice=notice),
+        encoding="utf-8",
+    )
+    values, _ = CarExtractor().extract(response.selector.root)
+    assert values == extract_with_selectors(response)
+    if notice:
+        assert DELETED_NOTICE_RE.search(values["notice"].lower())
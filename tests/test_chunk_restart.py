@@ -0,0 +1,128 @@
+import multiprocessing
+import os
+import signal
+from types import SimpleNamespace
+
+from scrapy import signals
+from scrapy.exceptions import DropItem
+from scrapy.settings import Settings
+from scrapy.signalmanager import SignalManager
+from scrapy.statscollectors import MemoryStatsCollector
+
+from auto_ria_scraper.auto_ria_scraper.helpers.page_progress import (
+    PageProgress,
+)
+from auto_ria_scraper.auto_ria_scraper.pipelines import (
+    ChunkStorePipeline,
+    DedupPipeline,
+)
+from auto_ria_scraper.auto_ria_scraper.signals import items_persisted
+from utils.chunk_store import iter_records
+from utils.file_utils import merge_output_chunks
+from utils.watchdog import ChunkWatchdog
+
+
+LISTING = "https://auto.ria.com/uk/search/?page={}"
+PAGES = 5
+ITEMS_PER_PAGE = 2
+FRAME_RECORDS = 3
+# The fsync interval passes after page 2, the chunk is killed after page 4
+SYNC_AFTER = 4
+KILL_AFTER = 8
+
+
+def car_url(page, n):
+    return f"https://auto.ria.com/uk/auto_car_{page * 100 + n}.html"
+
+
+def crawl_chunk(args, progress_file):
+    """Emulate run_spider with the real pipelines and page progress."""
+    start, end, output_file = args[:3]
+    ranges = args[3] if len(args) > 3 else [(LISTING, start, end)]
+
+    crawler = SimpleNamespace(
+        settings=Settings(
+            {
+                "CHUNK_STORE_FILE": output_file,
+                "CHUNK_FRAME_RECORDS": FRAME_RECORDS,
+                "CHUNK_FSYNC_SECONDS": 3600,
+            }
+        ),
+        signals=SignalManager(),
+    )
+    crawler.stats = MemoryStatsCollector(crawler)
+    dedup = DedupPipeline.from_crawler(crawler)
+    store = ChunkStorePipeline.from_crawler(crawler)
+    progress = PageProgress(progress_file)
+    for signal_ in (signals.item_scraped, signals.item_dropped):
+        crawler.signals.connect(progress.item_processed, signal=signal_)
+    crawler.signals.connect(progress.persisted, signal=items_persisted)
+
+    dedup.open_spider(None)
+    store.open_spider(None)
+    scraped = 0
+    for listing_url, first, last in ranges:
+        for page in range(first, last + 1):
+            page_key = (listing_url, page)
+            for n in range(ITEMS_PER_PAGE):
+                item = progress.track_item({"url": car_url(page, n)}, page_key)
+                try:
+                    dedup.process_item(item, None)
+                except DropItem:
+                    crawler.signals.send_catch_log(
+                        signals.item_dropped, item=item
+                    )
+                    continue
+                store.process_item(item, None)
+                crawler.signals.send_catch_log(signals.item_scraped, item=item)
+                scraped += 1
+            progress.page_finished(page_key)
+            if "_retry" in output_file:
+                continue
+            if scraped == SYNC_AFTER:
+                store.writer.last_fsync = float("-inf")
+            elif scraped >= KILL_AFTER:
+                os.kill(os.getpid(), signal.SIGKILL)
+
+    dedup.close_spider(None)
+    store.close_spider(None)
+    crawler.signals.send_catch_log(signals.engine_stopped)
+
+
+def start_process(args, progress_file):
+    p = multiprocessing.get_context("fork").Process(
+        target=crawl_chunk, args=(args, progress_file)
+    )
+    p.start()
+    return p
+
+
+def test_killed_chunk_loses_no_items(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    watchdog = ChunkWatchdog(start_process, timeout=60, max_restarts=1)
+    watchdog.add_chunk(
+        (1, PAGES, "output_chunk_1.jsonl.zst"), [(LISTING, 1, PAGES)]
+    )
+
+    assert watchdog.run() == {"chunk_1": {"restarts": 1}}
+
+    # The fsync on the first item of page 3 committed pages 1 and 2. Pages
+    # 3 and 4 were finished but not persisted before the kill, so the
+    # restart redid them with all of their listings
+    assert len(list(iter_records("output_chunk_1.jsonl.zst"))) == 5
+    with open("output_chunk_1.progress", encoding="utf-8") as f:
+        assert f.read().splitlines() == [
+            f"{LISTING}\t{page}" for page in range(1, PAGES + 1)
+        ]
+    retried = list(iter_records("output_chunk_1_retry1.jsonl.zst"))
+    assert [record["url"] for record in retried] == [
+        car_url(page, n) for page in (3, 4, 5) for n in range(ITEMS_PER_PAGE)
+    ]
+
+    merge_output_chunks("output_chunk_*.jsonl.zst", "merged.jsonl.zst")
+    urls = [record["url"] for record in iter_records("merged.jsonl.zst")]
+    assert sorted(urls) == sorted(
+        car_url(page, n)
+        for page in range(1, PAGES + 1)
+        for n in range(ITEMS_PER_PAGE)
+    )
@@ -0,0 +1,36 @@
+from utils.chunk_store import ChunkWriter, iter_records, read_index
+from utils.file_utils import merge_output_chunks
+
+
+def record(n):
+    return {"url": f"https://auto.ria.com/uk/auto_car_{n}.html"}
+
+
+def test_write_flushes_partial_frame_after_fsync_interval(tmp_path):
+    path = str(tmp_path / "chunk.jsonl.zst")
+    synced = []
+    writer = ChunkWriter(
+        path,
+        frame_records=100,
+        fsync_seconds=0,
+        on_sync=lambda: synced.append(1),
+    )
+    writer.write(record(1))
+    # Readable and durable before the frame filled up or close
+    assert [frame[2] for frame in read_index(path)] == [1]
+    assert synced
+    writer.close()
+
+
+def test_merge_skips_corrupt_chunk(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with ChunkWriter("output_chunk_1.jsonl.zst") as writer:
+        writer.write(record(1))
+    with ChunkWriter("output_chunk_2.jsonl.zst") as writer:
+        writer.write(record(2))
+    with open("output_chunk_2.jsonl.zst", "r+b") as f:
+        f.seek(8)
+        f.write(b"\xff" * 8)
+
+    merge_output_chunks("output_chunk_*.jsonl.zst", "merged.jsonl.zst")
+    assert list(iter_records("merged.jsonl.zst")) == [record(1)]
@@ -0,0 +1,160 @@
+import asyncio
+import json
+import os
+import struct
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from database import images
+from database.connection import Database
+from database.images import fetch_car_images, fetch_images
+from tests.conftest import requires_db
+from utils.image_store import ImageStore
+
+
+def png(width, height, padding=1000):
+    """Header of a PNG image, padded to a realistic size."""
+    return (
+        b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR"
+        + struct.pack(">II", width, height)
+        + b"\x00" * padding
+    )
+
+
+BIG_PHOTO_WRITES = 48
+
+
+def image_app(stats):
+    """Local stand-in for the image CDN: /<name>.png, 'same_*' share bytes."""
+
+    async def photo(request):
+        name = request.match_info["name"]
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(
+            stats["max_in_flight"], stats["in_flight"]
+        )
+        stats["requests"] += 1
+        await asyncio.sleep(0.02)
+        stats["in_flight"] -= 1
+        if name.startswith("same_"):
+            body = png(640, 480)
+        else:
+            body = png(100 + int(name), 50)
+        return web.Response(body=body, content_type="image/png")
+
+    async def big_photo(request):
+        # Streamed in many writes, so the client sees several chunks
+        response = web.StreamResponse(headers={"Content-Type": "image/png"})
+        await response.prepare(request)
+        await response.write(png(4000, 3000, padding=0))
+        for _ in range(BIG_PHOTO_WRITES):
+            await response.write(b"\x00" * 65536)
+            await asyncio.sleep(0)
+        await response.write_eof()
+        return response
+
+    app = web.Application()
+    app.router.add_get("/big.png", big_photo)
+    app.router.add_get("/{name}.png", photo)
+    return app
+
+
+def new_stats():
+    return {"in_flight": 0, "max_in_flight": 0, "requests": 0}
+
+
+def test_fetch_images_limits_concurrency_and_stores_duplicates_once(
+    tmp_path,
+):
+    stats = new_stats()
+    store = ImageStore(str(tmp_path), 1 << 30)
+
+    async def go():
+        async with TestServer(image_app(stats)) as server:
+            urls = [str(server.make_url(f"/{n}.png")) for n in range(6)]
+            urls += [str(server.make_url(f"/same_{n}.png")) for n in range(3)]
+            return await fetch_images(urls, store, concurrency=2)
+
+    images = asyncio.run(go())
+    assert len(images) == 9
+    assert stats["max_in_flight"] <= 2
+    same = [image for image in images if "same_" in image["url"]]
+    assert len({image["content_hash"] for image in same}) == 1
+    assert sum(image["stored"] for image in same) == 1
+    assert (same[0]["width"], same[0]["height"]) == (640, 480)
+
+
+def test_fetch_image_reads_whole_multi_chunk_body(tmp_path, monkeypatch):
+    store = ImageStore(str(tmp_path), 1 << 30)
+
+    async def go(max_bytes):
+        monkeypatch.setattr(images, "IMAGE_MAX_BYTES", max_bytes)
+        async with TestServer(image_app(new_stats())) as server:
+            url = str(server.make_url("/big.png"))
+            return await fetch_images([url], store)
+
+    size = 24 + BIG_PHOTO_WRITES * 65536
+    [image] = asyncio.run(go(20 << 20))
+    assert image["size_bytes"] == size
+    assert (image["width"], image["height"]) == (4000, 3000)
+    with open(store.path(image["content_hash"], ".png"), "rb") as f:
+        assert len(f.read()) == size
+
+    assert asyncio.run(go(size - 1)) == []
+
+
+def test_touch_refreshes_stored_blobs_only(tmp_path):
+    store = ImageStore(str(tmp_path), 1 << 30)
+    content_hash, path, _ = store.put(png(1, 1), "image/png")
+    os.utime(path, (0, 0))
+
+    assert store.touch(content_hash, "image/png")
+    assert os.stat(path).st_mtime > 0
+    assert not store.touch("0" * 64, "image/png")
+
+
+def test_enforce_limit_returns_evicted_hashes(tmp_path):
+    store = ImageStore(str(tmp_path), 2500)
+    hashes = []
+    for n in range(3):
+        content_hash, path, _ = store.put(png(n, n), "image/png")
+        os.utime(path, (n, n))
+        hashes.append(content_hash)
+
+    assert store.enforce_limit() == hashes[:1]
+    assert not os.path.exists(store.path(hashes[0], ".png"))
+
+
+@requires_db
+def test_evicted_images_are_fetched_again(test_db, tmp_path):
+    stats = new_stats()
+    # Room for one image, the other one is evicted on every run
+    store = ImageStore(str(tmp_path / "images"), 1500)
+    records_file = str(tmp_path / "cars.json")
+
+    async def go():
+        db = Database()
+        await db.connect()
+        try:
+            async with db.pool.acquire() as conn:
+                await conn.execute("TRUNCATE image_urls, images;")
+            async with TestServer(image_app(stats)) as server:
+                urls = [str(server.make_url(f"/{n}.png")) for n in (1, 2)]
+                with open(records_file, "w", encoding="utf-8") as f:
+                    json.dump([{"image_url": url} for url in urls], f)
+
+                await fetch_car_images(db, records_file, store)
+                async with db.pool.acquire() as conn:
+                    kept = await conn.fetchval(
+                        "SELECT count(*) FROM image_urls;"
+                    )
+                await fetch_car_images(db, records_file, store)
+            return kept
+        finally:
+            await db.close()
+
+    kept = asyncio.run(go())
+    assert kept == 1
+    # The evicted image was downloaded again, the kept one was not
+    assert stats["requests"] == 3
@@ -0,0 +1,38 @@
+import asyncio
+from datetime import datetime
+
+from database.connection import Database
+from database.job_runs import (
+    record_run_finish,
+    record_run_start,
+    record_skipped_run,
+    run_finished,
+)
+from tests.conftest import requires_db
+
+
+SLOT = datetime(2026, 1, 1, 6, 0)
+
+
+@requires_db
+def test_skipped_run_does_not_finish_the_slot(test_db):
+    async def go():
+        db = Database()
+        await db.connect()
+        try:
+            async with db.pool.acquire() as conn:
+                await conn.execute("TRUNCATE job_runs;")
+                await record_skipped_run(
+                    conn, "scrape", SLOT, "skipped_locked"
+                )
+                skipped = await run_finished(conn, "scrape", SLOT)
+
+                run_id = await record_run_start(conn, "scrape", SLOT)
+                running = await run_finished(conn, "scrape", SLOT)
+                await record_run_finish(conn, run_id, "success")
+                finished = await run_finished(conn, "scrape", SLOT)
+            return skipped, running, finished
+        finally:
+            await db.close()
+
+    assert asyncio.run(go()) == (False, False, True)
@@ -0,0 +1,97 @@
+import subprocess
+import sys
+import time
+from types import SimpleNamespace
+
+import psutil
+import pytest
+from selenium.common.exceptions import (
+    NoSuchElementException,
+    TimeoutException,
+    WebDriverException,
+)
+
+from auto_ria_scraper.auto_ria_scraper.helpers import phone_extractor
+from auto_ria_scraper.auto_ria_scraper.helpers.memory_monitor import (
+    kill_browser,
+)
+from auto_ria_scraper.auto_ria_scraper.helpers.phone_extractor import (
+    extract_phone,
+    handle_consent_popup,
+)
+
+
+class EmptyPage:
+    """A driver on a page where no element ever shows up."""
+
+    def __init__(self, responsive=True):
+        self.responsive = responsive
+        self.scripts = []
+
+    def get(self, url):
+        pass
+
+    def find_element(self, by, value):
+        raise NoSuchElementException(value)
+
+    def execute_script(self, script, *args):
+        if not self.responsive:
+            raise WebDriverException("script timeout")
+        self.scripts.append(script)
+        return 1
+
+
+@pytest.fixture(autouse=True)
+def fresh_popup(monkeypatch):
+    monkeypatch.setattr(phone_extractor, "popup_handled", False)
+
+
+def test_consent_probe_is_capped_and_falls_back_to_js():
+    driver = EmptyPage()
+    started = time.monotonic()
+    handle_consent_popup(driver, wait_time=0.5)
+    # Each of the selectors would wait 0.5s without the shared cap
+    assert time.monotonic() - started < 2
+    assert any("fc-dialog" in script for script in driver.scripts)
+
+
+def test_page_without_popup_or_phone_gives_none():
+    driver = EmptyPage()
+    started = time.monotonic()
+    phone = extract_phone(
+        driver, "url", wait_time=0.2, budget=1.2, consent_wait=0.5
+    )
+    assert phone is None
+    assert phone_extractor.popup_handled
+    assert time.monotonic() - started < 4
+
+
+def test_unresponsive_driver_raises():
+    driver = EmptyPage(responsive=False)
+    with pytest.raises(TimeoutException):
+        extract_phone(
+            driver, "url", wait_time=0.2, budget=0.3, consent_wait=0.1
+        )
+
+
+def test_kill_browser_finds_chrome_by_profile_dir(tmp_path):
+    profile = str(tmp_path / "profile")
+    # Stands in for the main Chrome process, same --user-data-dir flag
+    browser = subprocess.Popen(
+        [
+            sys.executable,
+            "-c",
+            "import time; time.sleep(60)",
+            f"--user-data-dir={profile}",
+        ]
+    )
+    try:
+        driver = SimpleNamespace(
+            capabilities={"chrome": {"userDataDir": profile}}
+        )
+        assert kill_browser(driver)
+        assert not psutil.pid_exists(browser.pid)
+    finally:
+        browser.kill()
+
+    assert not kill_browser(SimpleNamespace(capabilities={}))
@@ -0,0 +1,43 @@
+from database.normalize import listing_key, normalize_records
+from database.save import keep_last_per_listing
+from utils.dedup import record_keys
+
+
+def record(url, car_vin="", price="1000"):
+    return {"url": url, "car_vin": car_vin, "price_usd": price}
+
+
+def test_listings_without_vin_get_distinct_keys():
+    records = [
+        record("https://auto.ria.com/uk/auto_bmw_x5_38527421.html"),
+        record("https://auto.ria.com/uk/auto_bmw_x3_38527422.html", "  "),
+        record("https://auto.ria.com/uk/no-listing-id"),
+    ]
+    columns = normalize_records(records)
+    keys = columns["listing_key"]
+    assert keys[:2] == ["id:38527421", "id:38527422"]
+    assert keys[2].startswith("url:") and len(keys[2]) <= 50
+    assert len(set(keys)) == 3
+    # The synthetic keys never pass for a VIN
+    assert columns["car_vin"] == [None, None, None]
+
+
+def test_vin_is_normalized_once_for_key_and_dedup():
+    r = record("https://auto.ria.com/x_1.html", " wvw1 ")
+    assert listing_key(r) == "WVW1"
+    assert normalize_records([r])["car_vin"] == ["WVW1"]
+    assert ("vin", "vin:WVW1") in record_keys(r)
+
+
+def test_upsert_batch_keeps_every_listing_without_vin():
+    records = [
+        record("https://auto.ria.com/uk/auto_a_1.html"),
+        record("https://auto.ria.com/uk/auto_b_2.html"),
+        record("https://auto.ria.com/uk/auto_b_2.html", price="900"),
+    ]
+    kept = keep_last_per_listing(records)
+    assert [r["url"] for r in kept] == [
+        "https://auto.ria.com/uk/auto_a_1.html",
+        "https://auto.ria.com/uk/auto_b_2.html",
+    ]
+    assert kept[1]["price_usd"] == "900"
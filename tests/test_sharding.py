@@ -0,0 +1,46 @@
+from urllib.parse import parse_qs, urlparse
+
+from utils import sharding
+
+
+def price_bounds(url):
+    query = parse_qs(urlparse(url).query)
+    low = int(query.get("price.USD.gte", ["0"])[0])
+    high = query.get("price.USD.lte")
+    return low, int(high[0]) if high else None
+
+
+def test_price_bands_are_half_open():
+    low = sharding.filter_params(price_band=(0, 5000))
+    high = sharding.filter_params(price_band=(5000, None))
+    assert "price.USD.gte" not in low
+    assert low["price.USD.lte"] == "4999"
+    assert high["price.USD.gte"] == "5000"
+    assert "price.USD.lte" not in high
+
+
+def test_oversized_shard_is_split_until_it_fits(monkeypatch):
+    cap = sharding.LISTING_PAGE_SIZE * sharding.SHARD_MAX_PAGES
+    # Listings spread evenly, one per dollar between 0 and 4 caps
+    total = 4 * cap
+
+    def estimate(url):
+        low, high = price_bounds(url)
+        high = total - 1 if high is None else min(high, total - 1)
+        return max(high - low + 1, 0)
+
+    monkeypatch.setattr(sharding, "estimate_shard_size", estimate)
+    monkeypatch.setattr(sharding, "SHARD_PRICE_BANDS", "0-1000,1000-")
+    monkeypatch.setattr(sharding, "SHARD_MAX_SPLIT_DEPTH", 20)
+
+    shards = [
+        part
+        for shard in sharding.build_shards()
+        for part in sharding.fit_shard(shard)
+    ]
+
+    assert all(shard["size"] <= cap for shard in shards)
+    assert sum(shard["size"] for shard in shards) == total
+    bounds = sorted(price_bounds(shard["url"]) for shard in shards)
+    for (_, high), (next_low, _) in zip(bounds, bounds[1:]):
+        assert high + 1 == next_low
@@ -0,0 +1,47 @@
+from scrapy.http import HtmlResponse
+
+from auto_ria_scraper.auto_ria_scraper.spiders.autoria import (
+    LISTING_URL,
+    AutoriaSpider,
+)
+
+
+CAR = "https://auto.ria.com/uk/auto_car_{}.html"
+
+
+def listing_response(*car_ids):
+    links = "".join(
+        f'<a class="address" href="{CAR.format(n)}">car</a>' for n in car_ids
+    )
+    return HtmlResponse(
+        url=f"{LISTING_URL}?page=1",
+        body=f"<html><body>{links}</body></html>".encode("utf-8"),
+        encoding="utf-8",
+    )
+
+
+def test_duplicate_car_links_do_not_leak_pending_pages(monkeypatch):
+    monkeypatch.setattr(
+        AutoriaSpider, "get_chrome_driver", lambda self, headless=False: None
+    )
+    spider = AutoriaSpider()
+    spider.snapshot = None
+    page_key = (LISTING_URL, 1)
+
+    # Emulate the dupefilter: the second link to car 1 is dropped while
+    # the listing page is still being followed
+    scheduled, seen = [], set()
+    response = listing_response(1, 1, 2)
+    for request in spider.follow_car_links(response, page_key):
+        if request.url in seen:
+            spider.request_dropped(request)
+        else:
+            seen.add(request.url)
+            scheduled.append(request)
+
+    assert page_key not in spider.progress.stored
+    for request in scheduled:
+        spider.car_done(request.cb_kwargs["page_key"])
+
+    assert spider.pending_cars() == 0
+    assert spider.progress.stored == [page_key]
@@ -0,0 +1,199 @@
+import json
+import os
+import time
+
+import zstandard
+from dotenv import load_dotenv
+
+from logs.logger import logger
+
+
+load_dotenv()
+
+# "zstd" for compressed JSONL frames, "json" for plain JSON arrays
+OUTPUT_FORMAT = os.getenv("OUTPUT_FORMAT", "zstd").lower()
+CHUNK_FRAME_RECORDS = int(os.getenv("CHUNK_FRAME_RECORDS", 500))
+CHUNK_FSYNC_SECONDS = float(os.getenv("CHUNK_FSYNC_SECONDS", 10))
+CHUNK_COMPRESSION_LEVEL = int(os.getenv("CHUNK_COMPRESSION_LEVEL", 3))
+
+CHUNK_STORE_EXTENSION = ".jsonl.zst"
+INDEX_EXTENSION = ".idx"
+
+
+def output_extension():
+    if OUTPUT_FORMAT == "zstd":
+        return CHUNK_STORE_EXTENSION
+    return ".json"
+
+
+def merged_output_file():
+    return f"output{output_extension()}"
+
+
+def is_chunk_store(path):
+    return path.endswith(CHUNK_STORE_EXTENSION)
+
+
+def split_extension(path):
+    """Like os.path.splitext, keeping '.jsonl.zst' as one extension."""
+    if is_chunk_store(path):
+        return path[: -len(CHUNK_STORE_EXTENSION)], CHUNK_STORE_EXTENSION
+    return os.path.splitext(path)
+
+
+class ChunkWriter:
+    """
+    Appends records to a chunk store: a sequence of independent zstd
+    frames, each holding CHUNK_FRAME_RECORDS records as JSON lines.
+
+    Every frame gets a line '<offset> <length> <records>' in the .idx
+    sidecar, written after the frame itself. Both files are fsynced at
+    most every CHUNK_FSYNC_SECONDS and on close. Once that interval has
+    passed write() also flushes a partial frame, so a slow crawl does not
+    keep records buffered. After a crash the index only lists frames
+    that reached the disk. on_sync is called
+    after every fsync, when all records written so far are durable.
+    """
+
+    def __init__(
+        self,
+        path,
+        frame_records=CHUNK_FRAME_RECORDS,
+        fsync_seconds=CHUNK_FSYNC_SECONDS,
+        on_sync=None,
+    ):
+        self.path = path
+        self.frame_records = frame_records
+        self.fsync_seconds = fsync_seconds
+        self.on_sync = on_sync
+        self.compressor = zstandard.ZstdCompressor(
+            level=CHUNK_COMPRESSION_LEVEL
+        )
+        self.data = open(path, "ab")
+        self.index = open(path + INDEX_EXTENSION, "a", encoding="utf-8")
+        self.offset = self.data.seek(0, os.SEEK_END)
+        self.lines = []
+        self.records = 0
+        self.last_fsync = time.monotonic()
+
+    def write(self, record):
+        self.lines.append(json.dumps(record, ensure_ascii=False))
+        # A slow crawl must not keep records buffered past the interval
+        if (
+            len(self.lines) >= self.frame_records
+            or time.monotonic() - self.last_fsync >= self.fsync_seconds
+        ):
+            self.flush_frame()
+
+    def flush_frame(self):
+        if not self.lines:
+            return
+
+        frame = self.compressor.compress(
+            ("\n".join(self.lines) + "\n").encode("utf-8")
+        )
+        self.data.write(frame)
+        self.index.write(f"{self.offset} {len(frame)} {len(self.lines)}\n")
+        self.offset += len(frame)
+        self.records += len(self.lines)
+        self.lines = []
+
+        if time.monotonic() - self.last_fsync >= self.fsync_seconds:
+            self.sync()
+
+    def sync(self):
+        # Frames before their index lines, so the index never runs ahead
+        self.data.flush()
+        os.fsync(self.data.fileno())
+        self.index.flush()
+        os.fsync(self.index.fileno())
+        self.last_fsync = time.monotonic()
+        if self.on_sync:
+            self.on_sync()
+
+    def close(self):
+        self.flush_frame()
+        self.sync()
+        self.data.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_index(path):
+    """(offset, length, records) of every indexed frame of a chunk store."""
+    frames = []
+    with open(path + INDEX_EXTENSION, "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.split()
+            # A torn last line means the frame was never synced
+            if len(parts) == 3:
+                frames.append(tuple(int(p) for p in parts))
+    return frames
+
+
+def iter_frames(path):
+    """Decompressed frames of a chunk store, each a block of JSON lines."""
+    decompressor = zstandard.ZstdDecompressor()
+    if not os.path.exists(path + INDEX_EXTENSION):
+        # No index, e.g. copied without its sidecar: read across frames
+        with open(path, "rb") as f:
+            reader = decompressor.stream_reader(f, read_across_frames=True)
+            buffer = b""
+            for block in iter(lambda: reader.read(1 << 20), b""):
+                buffer += block
+                complete, _, buffer = buffer.rpartition(b"\n")
+                if complete:
+                    yield complete
+            if buffer:
+                yield buffer
+        return
+
+    with open(path, "rb") as f:
+        for offset, length, _ in read_index(path):
+            f.seek(offset)
+            frame = f.read(length)
+            if len(frame) < length:
+                logger.warning(f"Truncated frame at {offset} in {path}")
+                return
+            yield decompressor.decompress(frame)
+
+
+def iter_chunk_records(path):
+    """Stream the records of a chunk store."""
+    for frame in iter_frames(path):
+        # JSON lines never contain raw newlines, so a frame parses as
+        # one array, much faster than a json.loads call per line
+        lines = frame.strip(b"\n")
+        if lines:
+            yield from json.loads(b"[" + lines.replace(b"\n", b",") + b"]")
+
+
+def count_chunk_records(path):
+    if not os.path.exists(path + INDEX_EXTENSION):
+        return sum(1 for _ in iter_chunk_records(path))
+    return sum(records for _, _, records in read_index(path))
+
+
+def iter_records(path):
+    """Records of a spider output file, a chunk store or a JSON array."""
+    if is_chunk_store(path):
+        yield from iter_chunk_records(path)
+        return
+
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, list):
+        logger.warning(f"{path} did not contain a list")
+        return
+    yield from data
+
+
+def remove_chunk_store(path):
+    for file_path in (path, path + INDEX_EXTENSION):
+        if os.path.exists(file_path):
+            os.remove(file_path)
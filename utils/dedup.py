@@ -0,0 +1,126 @@
+import os
+import re
+import sqlite3
+
+from dotenv import load_dotenv
+
+from logs.logger import logger
+
+
+load_dotenv()
+
+# On-disk index shared by the spider processes of one run
+DEDUP_INDEX_FILE = os.getenv("DEDUP_INDEX_FILE", "dedup_index.sqlite")
+
+LISTING_ID_PATTERN = re.compile(r"_(\d+)\.html")
+
+
+def listing_id_from_url(url):
+    """Listing id from an AutoRia URL like .../auto_bmw_x5_38527421.html."""
+    match = LISTING_ID_PATTERN.search(url or "")
+    return match.group(1) if match else None
+
+
+def normalize_vin(value):
+    """VIN as stored and deduplicated, None when empty."""
+    return (value or "").strip().upper() or None
+
+
+def record_keys(record):
+    """Dedup keys of a record: listing id first, VIN second."""
+    keys = []
+    listing_id = listing_id_from_url(record.get("url"))
+    if listing_id:
+        keys.append(("listing_id", f"id:{listing_id}"))
+    # Empty VINs are not a key, otherwise all of them would collide
+    car_vin = normalize_vin(record.get("car_vin"))
+    if car_vin:
+        keys.append(("vin", f"vin:{car_vin}"))
+    return keys
+
+
+class DedupIndex:
+    """
+    Set of seen listing keys. In memory by default, or a SQLite file
+    when several processes have to share it.
+    """
+
+    def __init__(self, path=":memory:"):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        if path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL;")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS seen (key TEXT PRIMARY KEY);"
+        )
+        self.duplicates = {"listing_id": 0, "vin": 0}
+
+    def seen_before(self, record):
+        """
+        Register the record's keys and tell whether any of them was
+        already seen. Checking and registering is one transaction.
+        """
+        keys = record_keys(record)
+        if not keys:
+            return False
+
+        self.conn.execute("BEGIN IMMEDIATE;")
+        try:
+            for kind, key in keys:
+                exists = self.conn.execute(
+                    "SELECT 1 FROM seen WHERE key = ?;", (key,)
+                ).fetchone()
+                if exists:
+                    self.duplicates[kind] += 1
+                    self.conn.execute("ROLLBACK;")
+                    return True
+
+            self.conn.executemany(
+                "INSERT INTO seen (key) VALUES (?);",
+                [(key,) for _, key in keys],
+            )
+            self.conn.execute("COMMIT;")
+        except Exception:
+            self.conn.execute("ROLLBACK;")
+            raise
+        return False
+
+    def contains(self, record):
+        """Whether a key of the record was seen, without registering it."""
+        for kind, key in record_keys(record):
+            exists = self.conn.execute(
+                "SELECT 1 FROM seen WHERE key = ?;", (key,)
+            ).fetchone()
+            if exists:
+                self.duplicates[kind] += 1
+                return True
+        return False
+
+    def register(self, keys):
+        """Add keys, e.g. of records that were persisted meanwhile."""
+        if not keys:
+            return
+        self.conn.execute("BEGIN IMMEDIATE;")
+        try:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO seen (key) VALUES (?);",
+                [(key,) for key in keys],
+            )
+            self.conn.execute("COMMIT;")
+        except Exception:
+            self.conn.execute("ROLLBACK;")
+            raise
+
+    def total_duplicates(self):
+        return sum(self.duplicates.values())
+
+    def close(self):
+        self.conn.close()
+
+
+def reset_dedup_index(path=DEDUP_INDEX_FILE):
+    """Remove the shared index of the previous run."""
+    for file_path in (path, f"{path}-wal", f"{path}-shm"):
+        if os.path.exists(file_path):
+            os.remove(file_path)
+    logger.info(f"Dedup index reset: {path}")
@@ -2,38 +2,72 @@ import glob
 import json
 import os
 
+import zstandard
+
 from logs.logger import logger
+from utils.chunk_store import (
+    INDEX_EXTENSION,
+    ChunkWriter,
+    is_chunk_store,
+    iter_records,
+    merged_output_file,
+    output_extension,
+    remove_chunk_store,
+)
+from utils.dedup import DedupIndex
+from utils.run_report import update_run_report
 
 
-def merge_output_chunks(
-    output_pattern="output_chunk_*.json", merged_file="output.json"
-):
+def merge_output_chunks(output_pattern=None, merged_file=None):
+    output_pattern = output_pattern or f"output_chunk_*{output_extension()}"
+    merged_file = merged_file or merged_output_file()
     logger.info(
         f"Merging chunk files matching '{output_pattern}' into '{merged_file}'"
     )
 
-    merged_data = []
+    # Chunks can overlap when listings shift between pages mid-crawl
+    index = DedupIndex()
+    merged = 0
+
+    if is_chunk_store(merged_file):
+        # Records are streamed from chunk to merged store, never all loaded
+        remove_chunk_store(merged_file)
+        out = ChunkWriter(merged_file)
+        write = out.write
+    else:
+        merged_data = []
+        write = merged_data.append
 
     for file_name in sorted(glob.glob(output_pattern)):
         logger.info(f"Reading from {file_name}")
-        with open(file_name, "r", encoding="utf-8") as f:
-            try:
-                data = json.load(f)
-                if isinstance(data, list):
-                    merged_data.extend(data)
-                else:
-                    logger.warning(f"{file_name} did not contain a list")
-            except json.JSONDecodeError as e:
-                logger.error(f"Could not decode JSON from {file_name}: {e}")
+        try:
+            for record in iter_records(file_name):
+                if not index.seen_before(record):
+                    write(record)
+                    merged += 1
+        except json.JSONDecodeError as e:
+            logger.error(f"Could not decode JSON from {file_name}: {e}")
+        except (zstandard.ZstdError, OSError) as e:
+            # e.g. a corrupt frame, the records read so far are kept
+            logger.error(f"Could not read chunk store {file_name}: {e}")
 
-    with open(merged_file, "w", encoding="utf-8") as out_file:
-        json.dump(merged_data, out_file, ensure_ascii=False, indent=2)
+    if is_chunk_store(merged_file):
+        out.close()
+    else:
+        with open(merged_file, "w", encoding="utf-8") as out_file:
+            json.dump(merged_data, out_file, ensure_ascii=False, indent=2)
 
-    logger.info(f"Merged {len(merged_data)} records into '{merged_file}'")
+    logger.info(f"Merged {merged} records into '{merged_file}'")
+    logger.info(
+        f"Dropped {index.total_duplicates()} duplicate(s) across chunks"
+    )
+    update_run_report("dedup_merge", dict(index.duplicates))
+    index.close()
 
 
-def cleanup_old_chunks(pattern="output_chunk_*.json"):
-    for file_path in glob.glob(pattern):
+def cleanup_old_chunks(pattern=None):
+    pattern = pattern or f"output_chunk_*{output_extension()}"
+    for file_path in glob.glob(pattern) + glob.glob(pattern + INDEX_EXTENSION):
         try:
             os.remove(file_path)
             logger.info(f"Deleted old chunk file: {file_path}")
@@ -0,0 +1,136 @@
+import hashlib
+import os
+import struct
+import threading
+
+from logs.logger import logger
+
+
+CONTENT_TYPE_EXTENSIONS = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+}
+
+
+def jpeg_size(data):
+    # Walk the segments up to the first start-of-frame marker
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            i += 2
+            continue
+        (length,) = struct.unpack(">H", data[i + 2:i + 4])
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack(">HH", data[i + 5:i + 9])
+            return width, height
+        i += 2 + length
+    return None
+
+
+def webp_size(data):
+    chunk = data[12:16]
+    if chunk == b"VP8 " and len(data) >= 30:
+        width, height = struct.unpack("<HH", data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and len(data) >= 25:
+        bits = int.from_bytes(data[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X" and len(data) >= 30:
+        width = int.from_bytes(data[24:27], "little") + 1
+        height = int.from_bytes(data[27:30], "little") + 1
+        return width, height
+    return None
+
+
+def image_size(data):
+    """
+    (width, height) read from the header of a JPEG, PNG, GIF or WebP
+    image, None for other or truncated images.
+    """
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+    if data[:6] in (b"GIF87a", b"GIF89a") and len(data) >= 10:
+        return struct.unpack("<HH", data[6:10])
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return webp_size(data)
+    if data[:2] == b"\xff\xd8":
+        return jpeg_size(data)
+    return None
+
+
+class ImageStore:
+    """
+    Content-addressed image blobs under root/<hash[:2]>/<hash>.<ext>.
+    Identical images are stored once. Blobs are used in LRU order by
+    mtime, refreshed on every hit, and the oldest are removed once the
+    store grows past max_bytes.
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def path(self, content_hash, extension):
+        return os.path.join(
+            self.root, content_hash[:2], f"{content_hash}{extension}"
+        )
+
+    def touch(self, content_hash, content_type=None):
+        """Mark a stored blob as used, False when it is not stored."""
+        extension = CONTENT_TYPE_EXTENSIONS.get(content_type, "")
+        try:
+            os.utime(self.path(content_hash, extension))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def put(self, data, content_type=None):
+        """Store data, returning (content_hash, path, stored_now)."""
+        content_hash = hashlib.sha256(data).hexdigest()
+        extension = CONTENT_TYPE_EXTENSIONS.get(content_type, "")
+        path = self.path(content_hash, extension)
+
+        if os.path.exists(path):
+            os.utime(path)
+            return content_hash, path, False
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return content_hash, path, True
+
+    def enforce_limit(self):
+        """
+        Remove least recently used blobs until under max_bytes, returning
+        the content hashes of the removed blobs.
+        """
+        blobs = []
+        total = 0
+        for dir_path, _, file_names in os.walk(self.root):
+            for name in file_names:
+                path = os.path.join(dir_path, name)
+                stat = os.stat(path)
+                blobs.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        removed = []
+        for _, size, path in sorted(blobs):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+            removed.append(os.path.basename(path).split(".")[0])
+
+        if removed:
+            logger.info(
+                f"Removed {len(removed)} least recently used image(s), "
+                f"store is {total / 1024 / 1024:.1f} MB"
+            )
+        return removed
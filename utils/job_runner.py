@@ -0,0 +1,212 @@
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+
+from database.connection import Database
+from database.job_runs import (
+    job_duration_stats,
+    job_locked,
+    last_run_scheduled_for,
+    record_run_finish,
+    record_run_start,
+    record_skipped_run,
+    run_finished,
+    try_lock_job,
+    unlock_job,
+)
+from logs.logger import logger
+
+
+load_dotenv()
+
+# Runs fired up to this many seconds late still start, once
+JOB_MISFIRE_GRACE = int(os.getenv("JOB_MISFIRE_GRACE", 3600))
+# Run a missed run once at startup, e.g. after the host was down
+JOB_CATCH_UP = os.getenv("JOB_CATCH_UP", "true").lower() == "true"
+# Jobs running at once in this scheduler, queued by priority
+JOB_MAX_CONCURRENT = int(os.getenv("JOB_MAX_CONCURRENT", 1))
+# Longest wait for a dependency before running anyway
+JOB_DEPENDENCY_TIMEOUT = int(os.getenv("JOB_DEPENDENCY_TIMEOUT", 21600))
+DEPENDENCY_POLL_SECONDS = 30
+
+
+def last_fire_time(hour, minute, now=None):
+    """Latest daily hour:minute slot at or before now."""
+    now = now or datetime.now()
+    fire_time = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if fire_time > now:
+        fire_time -= timedelta(days=1)
+    return fire_time
+
+
+class PrioritySlots:
+    """
+    Lets at most limit jobs run at once. Waiting jobs start in priority
+    order, lower values first, then in arrival order.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.running = 0
+        self.waiters = []
+        self.counter = itertools.count()
+
+    async def acquire(self, priority):
+        if self.running < self.limit and not self.waiters:
+            self.running += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (priority, next(self.counter), future))
+        try:
+            # release() hands its slot over without decrementing running
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        while self.waiters:
+            _, _, future = heapq.heappop(self.waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.running -= 1
+
+
+class ScheduledJob:
+    """
+    A daily job. after names jobs whose run for the same day's slot
+    must finish first, priority orders jobs waiting for a free slot.
+    """
+
+    def __init__(
+        self, name, func, hour, minute, priority=0, after=(), kwargs=None
+    ):
+        self.name = name
+        self.func = func
+        self.hour = hour
+        self.minute = minute
+        self.priority = priority
+        self.after = tuple(after)
+        self.kwargs = kwargs or {}
+
+    def last_slot(self, now=None):
+        return last_fire_time(self.hour, self.minute, now)
+
+
+class JobRunner:
+    """
+    Runs scheduled jobs at most once per slot across all scheduler
+    instances. Each run holds the job's Postgres advisory lock, so a run
+    still going on any node makes the next one skip instead of overlap,
+    and every run is recorded in job_runs with its duration.
+    """
+
+    def __init__(self, max_concurrent=JOB_MAX_CONCURRENT):
+        self.db = Database()
+        self.jobs = {}
+        self.slots = PrioritySlots(max_concurrent)
+
+    async def connect(self):
+        await self.db.connect()
+
+    async def close(self):
+        await self.db.close()
+
+    def add(self, job):
+        self.jobs[job.name] = job
+
+    async def run(self, job, scheduled_for=None):
+        scheduled_for = scheduled_for or job.last_slot()
+        async with self.db.pool.acquire() as conn:
+            if await run_finished(conn, job.name, scheduled_for):
+                logger.info(
+                    f"Job '{job.name}' already ran for {scheduled_for}"
+                )
+                return
+
+            if not await try_lock_job(conn, job.name):
+                logger.warning(
+                    f"Job '{job.name}' is still running, "
+                    f"skipping the {scheduled_for} run"
+                )
+                await record_skipped_run(
+                    conn, job.name, scheduled_for, "skipped_locked"
+                )
+                return
+
+            try:
+                await self.wait_for_dependencies(conn, job, scheduled_for)
+                await self.slots.acquire(job.priority)
+                try:
+                    await self.execute(conn, job, scheduled_for)
+                finally:
+                    self.slots.release()
+            finally:
+                await unlock_job(conn, job.name)
+
+    async def wait_for_dependencies(self, conn, job, scheduled_for):
+        deadline = time.monotonic() + JOB_DEPENDENCY_TIMEOUT
+        for name in job.after:
+            dependency = self.jobs[name]
+            slot = dependency.last_slot(scheduled_for)
+            while not await run_finished(conn, name, slot):
+                # Not running and too late to start: nothing to wait for
+                started = await job_locked(conn, name)
+                late = datetime.now() - slot
+                if not started and late.total_seconds() > JOB_MISFIRE_GRACE:
+                    logger.warning(
+                        f"Job '{name}' did not run for {slot}, "
+                        f"starting '{job.name}' without it"
+                    )
+                    break
+                if time.monotonic() >= deadline:
+                    logger.warning(
+                        f"Timed out waiting for '{name}', "
+                        f"starting '{job.name}' anyway"
+                    )
+                    return
+                logger.info(f"Job '{job.name}' is waiting for '{name}'")
+                await asyncio.sleep(DEPENDENCY_POLL_SECONDS)
+
+    async def execute(self, conn, job, scheduled_for):
+        logger.info(f"Starting job '{job.name}' for {scheduled_for}")
+        run_id = await record_run_start(conn, job.name, scheduled_for)
+        started = time.monotonic()
+        try:
+            await job.func(**job.kwargs)
+        except Exception as e:
+            logger.error(f"Job '{job.name}' failed: {e}")
+            await record_run_finish(conn, run_id, "failed", str(e))
+            return
+        await record_run_finish(conn, run_id, "success")
+        logger.info(
+            f"Job '{job.name}' finished in {time.monotonic() - started:.0f}s"
+        )
+
+    async def missed_runs(self):
+        """
+        Jobs whose latest slot passed without a run, with that slot.
+        However many slots were missed, each job is run once.
+        """
+        missed = []
+        async with self.db.pool.acquire() as conn:
+            await job_duration_stats(conn)
+            for job in self.jobs.values():
+                last_run = await last_run_scheduled_for(conn, job.name)
+                slot = job.last_slot()
+                # Jobs that never ran wait for their first slot
+                if last_run is not None and last_run < slot:
+                    logger.info(
+                        f"Job '{job.name}' missed its {slot} run, "
+                        "running it now"
+                    )
+                    missed.append((job, slot))
+        return missed
@@ -0,0 +1,190 @@
+import cProfile
+import glob
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+from logs.logger import logger
+
+
+load_dotenv()
+
+# "cprofile" for deterministic profiles, "sample" for a sampling profiler
+PROFILE_MODE = os.getenv("PROFILE_MODE", "").lower()
+PROFILE_DB = os.getenv("PROFILE_DB", "false").lower() == "true"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", 0.005))
+TRACEMALLOC_FRAMES = int(os.getenv("TRACEMALLOC_FRAMES", 10))
+TRACEMALLOC_TOP = int(os.getenv("TRACEMALLOC_TOP", 25))
+
+_run_dir = None
+
+
+def start_profile_run():
+    """Create the run directory for this run's profiles, if profiling."""
+    global _run_dir
+    if PROFILE_MODE not in ("cprofile", "sample"):
+        return None
+
+    _run_dir = os.path.join(
+        PROFILE_DIR, f"run_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    )
+    os.makedirs(_run_dir, exist_ok=True)
+    logger.info(f"Profiling enabled ({PROFILE_MODE}), writing to {_run_dir}")
+    return _run_dir
+
+
+def current_run_dir():
+    return _run_dir
+
+
+def frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)})"
+
+
+class StackSampler:
+    """Samples the stack of one thread and counts collapsed stacks."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_name(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def write_collapsed(stacks, path):
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+
+
+def collapsed_from_stats(stats):
+    """
+    Approximate collapsed stacks from cProfile caller edges, weighted by
+    own time in microseconds. cProfile keeps no full stacks, so every
+    stack is caller;callee.
+    """
+    stacks = Counter()
+    for func, (_, _, tottime, _, callers) in stats.stats.items():
+        name = f"{func[2]} ({os.path.basename(func[0])})"
+        if not callers:
+            stacks[name] += int(tottime * 1_000_000)
+            continue
+        for caller, (_, _, edge_tottime, _) in callers.items():
+            caller_name = f"{caller[2]} ({os.path.basename(caller[0])})"
+            stacks[f"{caller_name};{name}"] += int(edge_tottime * 1_000_000)
+    return Counter({stack: n for stack, n in stacks.items() if n > 0})
+
+
+def snapshot_memory(name):
+    """Write the top allocating lines of this process, if tracing."""
+    if not _run_dir or not tracemalloc.is_tracing():
+        return
+
+    snapshot = tracemalloc.take_snapshot()
+    path = os.path.join(_run_dir, f"{name}.tracemalloc.txt")
+    current, peak = tracemalloc.get_traced_memory()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"current={current} peak={peak}\n")
+        for stat in snapshot.statistics("lineno")[:TRACEMALLOC_TOP]:
+            f.write(f"{stat}\n")
+    logger.info(f"Tracemalloc snapshot written to {path}")
+
+
+@contextmanager
+def profiled(name, run_dir):
+    """
+    Profile the block into run_dir/<name>_<pid>.* when profiling is on.
+    A tracemalloc snapshot is written when the block ends, i.e. at spider
+    close for spider processes.
+    """
+    global _run_dir
+    if not run_dir or PROFILE_MODE not in ("cprofile", "sample"):
+        yield
+        return
+
+    _run_dir = run_dir
+    name = f"{name}_{os.getpid()}"
+    tracemalloc.start(TRACEMALLOC_FRAMES)
+    started = time.perf_counter()
+
+    if PROFILE_MODE == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+    else:
+        profiler = StackSampler(
+            threading.get_ident(), PROFILE_SAMPLE_INTERVAL
+        )
+        profiler.start()
+
+    try:
+        yield
+    finally:
+        if PROFILE_MODE == "cprofile":
+            profiler.disable()
+            profiler.dump_stats(os.path.join(run_dir, f"{name}.prof"))
+        else:
+            profiler.stop()
+            write_collapsed(
+                profiler.stacks, os.path.join(run_dir, f"{name}.collapsed")
+            )
+        snapshot_memory(name)
+        tracemalloc.stop()
+        logger.info(
+            f"Profiled {name} for {time.perf_counter() - started:.1f}s"
+        )
+
+
+def merge_profiles(run_dir):
+    """
+    Merge per-process profiles of a run into merged.prof and a
+    flamegraph-ready merged.collapsed.
+    """
+    if not run_dir:
+        return
+
+    stacks = Counter()
+    for path in glob.glob(os.path.join(run_dir, "*_*.collapsed")):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                stack, _, count = line.rstrip("\n").rpartition(" ")
+                stacks[stack] += int(count)
+
+    prof_files = sorted(glob.glob(os.path.join(run_dir, "*_*.prof")))
+    if prof_files:
+        stats = pstats.Stats(*prof_files)
+        stats.dump_stats(os.path.join(run_dir, "merged.prof"))
+        stacks.update(collapsed_from_stats(stats))
+
+    write_collapsed(stacks, os.path.join(run_dir, "merged.collapsed"))
+    logger.info(
+        f"Merged {len(prof_files)} profile(s) and {len(stacks)} stacks "
+        f"into {run_dir}"
+    )
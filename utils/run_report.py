@@ -0,0 +1,67 @@
+import glob
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+from logs.logger import logger
+
+
+load_dotenv()
+
+# Every process writes its own sections, merged once the run ends
+RUN_REPORT_DIR = os.getenv("RUN_REPORT_DIR", "run_report")
+RUN_REPORT_FILE = os.getenv("RUN_REPORT_FILE", "run_report.json")
+
+
+def reset_run_report():
+    """Remove sections left over from the previous run."""
+    shutil.rmtree(RUN_REPORT_DIR, ignore_errors=True)
+    os.makedirs(RUN_REPORT_DIR, exist_ok=True)
+
+
+def update_run_report(section, data):
+    """Merge data into a report section of the current run."""
+    os.makedirs(RUN_REPORT_DIR, exist_ok=True)
+    path = os.path.join(RUN_REPORT_DIR, f"{section}.json")
+
+    current = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            current = json.load(f)
+    current.update(data)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(current, f, ensure_ascii=False, default=str)
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def timed_phase(name):
+    """Record the duration of a workflow phase in the 'phases' section."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        update_run_report(
+            "phases", {name: round(time.perf_counter() - started, 2)}
+        )
+
+
+def build_run_report(report_file=RUN_REPORT_FILE):
+    """Merge all sections of the current run into the report file."""
+    report = {}
+    for path in sorted(glob.glob(os.path.join(RUN_REPORT_DIR, "*.json"))):
+        section = os.path.splitext(os.path.basename(path))[0]
+        with open(path, "r", encoding="utf-8") as f:
+            report[section] = json.load(f)
+
+    with open(report_file, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    logger.info(f"Run report with {len(report)} section(s): {report_file}")
+    return report
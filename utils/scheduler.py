@@ -4,8 +4,14 @@ from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from dotenv import load_dotenv
 
 from logs.logger import logger
-from main import main as run_workflow  # import your scraping workflow function
 from database.backup_db import create_backup
+from database.restore_db import restore_check
+from utils.job_runner import (
+    JOB_CATCH_UP,
+    JOB_MISFIRE_GRACE,
+    JobRunner,
+    ScheduledJob,
+)
 
 
 load_dotenv()
@@ -14,16 +20,37 @@ SCRAPER_RUN_TIME = os.getenv("SCRAPER_RUN_TIME", "12:00")
 DUMP_RUN_TIME = os.getenv(
     "DUMP_RUN_TIME", "12:30"
 )  # example: different time for dump
+# restore the latest dump into a scratch DB daily, empty to disable
+RESTORE_DRILL_TIME = os.getenv("RESTORE_DRILL_TIME", "")
+# keep preloaded spider workers and a warm chromedriver between runs
+WORKER_MODE = os.getenv("WORKER_MODE", "false").lower() == "true"
+
+
+async def scrape_task(pool=None):
+    # Scrapy and Selenium are imported when the first scrape starts, so the
+    # scheduler starts quickly and backups don't pay for them
+    from main import main as run_workflow
+
+    await run_workflow(pool=pool)
 
 
 async def backup_task():
     logger.info("Starting DB backup task")
     loop = asyncio.get_event_loop()
     # Run the blocking create_backup() in a thread to not block the event loop
-    await loop.run_in_executor(None, create_backup)
+    if not await loop.run_in_executor(None, create_backup):
+        raise RuntimeError("pg_dump failed")
     logger.info("DB backup task finished")
 
 
+async def restore_drill_task():
+    logger.info("Starting restore drill")
+    report = await restore_check()
+    if not report["ok"]:
+        raise RuntimeError(f"Restore drill failed for {report['dump_file']}")
+    logger.info("Restore drill finished")
+
+
 def parse_time(t):
     hour, minute = map(int, t.split(":"))
     return hour, minute
@@ -32,14 +59,65 @@ def parse_time(t):
 async def schedule_tasks():
     scheduler = AsyncIOScheduler()
 
+    pool = None
+    if WORKER_MODE:
+        from utils.worker_pool import SpiderWorkerPool
+
+        pool = SpiderWorkerPool()
+        pool.start()
+
+    runner = JobRunner()
+    await runner.connect()
+
     h_scrape, m_scrape = parse_time(SCRAPER_RUN_TIME)
     h_dump, m_dump = parse_time(DUMP_RUN_TIME)
 
-    # Schedule run_workflow coroutine directly
-    scheduler.add_job(run_workflow, "cron", hour=h_scrape, minute=m_scrape)
-
-    # Schedule backup_task coroutine directly
-    scheduler.add_job(backup_task, "cron", hour=h_dump, minute=m_dump)
+    runner.add(
+        ScheduledJob(
+            "scrape",
+            scrape_task,
+            h_scrape,
+            m_scrape,
+            priority=0,
+            kwargs={"pool": pool},
+        )
+    )
+    # The dump waits for the day's load instead of competing with it
+    runner.add(
+        ScheduledJob(
+            "backup", backup_task, h_dump, m_dump, priority=1, after=["scrape"]
+        )
+    )
+    if RESTORE_DRILL_TIME:
+        h_drill, m_drill = parse_time(RESTORE_DRILL_TIME)
+        runner.add(
+            ScheduledJob(
+                "restore_drill",
+                restore_drill_task,
+                h_drill,
+                m_drill,
+                priority=2,
+                after=["backup"],
+            )
+        )
+
+    # One instance per job, missed runs coalesced into one late run
+    for job in runner.jobs.values():
+        scheduler.add_job(
+            runner.run,
+            "cron",
+            hour=job.hour,
+            minute=job.minute,
+            args=[job],
+            id=job.name,
+            max_instances=1,
+            coalesce=True,
+            misfire_grace_time=JOB_MISFIRE_GRACE,
+        )
+
+    if JOB_CATCH_UP:
+        for job, slot in await runner.missed_runs():
+            scheduler.add_job(runner.run, args=[job, slot])
 
     scheduler.start()
     logger.info(
@@ -50,6 +128,11 @@ async def schedule_tasks():
         await asyncio.Event().wait()  # keeps running forever
     except (KeyboardInterrupt, SystemExit):
         logger.info("Scheduler stopped")
+    finally:
+        scheduler.shutdown(wait=False)
+        await runner.close()
+        if pool:
+            pool.close()
 
 
 if __name__ == "__main__":
@@ -1,33 +1,130 @@
+import os
+import shutil
 from multiprocessing import Process
 
 from scrapy.crawler import CrawlerProcess
+from scrapy.settings import Settings
 from scrapy.utils.project import get_project_settings
 
-from auto_ria_scraper.auto_ria_scraper.spiders.autoria import AutoriaSpider
+from auto_ria_scraper.auto_ria_scraper.spiders.autoria import (
+    CRAWL_QUEUE_DIR,
+    LISTING_URL,
+    MEMORY_BOUNDED,
+    AutoriaSpider,
+)
+from auto_ria_scraper.auto_ria_scraper.transport import transport_settings
 from logs.logger import logger
+from utils.chunk_store import (
+    is_chunk_store,
+    output_extension,
+    split_extension,
+)
+from utils.profiling import current_run_dir, profiled
+from utils.run_report import update_run_report
+from utils.sharding import plan_shards
+from utils.watchdog import ChunkWatchdog
+
+
+def run_spider(
+    start_page,
+    end_page,
+    output_file,
+    listing_ranges=None,
+    base_settings=None,
+    driver_url=None,
+    profile_dir=None,
+    progress_file=None,
+):
+    # Lead a process group so the watchdog can kill Chrome along with us
+    if hasattr(os, "setpgrp"):
+        os.setpgrp()
+
+    if listing_ranges:
+        logger.info(f"Running spider for {len(listing_ranges)} shard(s)...")
+    else:
+        logger.info(f"Running spider for pages {start_page} to {end_page}...")
 
+    # Worker pools pass settings resolved once in the parent process
+    settings = (
+        Settings(base_settings) if base_settings else get_project_settings()
+    )
+    pipelines = {
+        "auto_ria_scraper.auto_ria_scraper.pipelines.DedupPipeline": 100
+    }
+    if is_chunk_store(output_file):
+        settings.set("CHUNK_STORE_FILE", output_file)
+        pipelines[
+            "auto_ria_scraper.auto_ria_scraper.pipelines.ChunkStorePipeline"
+        ] = 200
+    else:
+        pipelines[
+            "auto_ria_scraper.auto_ria_scraper.pipelines.FeedProgressPipeline"
+        ] = 200
+        settings.set(
+            "FEEDS",
+            {
+                output_file: {
+                    "format": "json",
+                    "encoding": "utf-8",
+                    "overwrite": True,
+                },
+            },
+        )
 
-def run_spider(start_page, end_page, output_file):
-    logger.info(f"Running spider for pages {start_page} to {end_page}...")
-
-    settings = get_project_settings()
+    settings.set("ITEM_PIPELINES", pipelines)
+    settings.setdict(transport_settings())
     settings.set(
-        "FEEDS",
+        "DOWNLOADER_MIDDLEWARES",
         {
-            output_file: {
-                "format": "json",
-                "encoding": "utf-8",
-                "overwrite": True,
-            },
+            "auto_ria_scraper.auto_ria_scraper.middlewares."
+            "TransportMiddleware": 580
         },
     )
 
+    jobdir = None
+    if MEMORY_BOUNDED:
+        # Pending requests are pickled to disk queues instead of memory.
+        # A directory per process, a restarted chunk must not resume it.
+        name = split_extension(os.path.basename(output_file))[0]
+        jobdir = os.path.join(CRAWL_QUEUE_DIR, f"{name}_{os.getpid()}")
+        settings.set("JOBDIR", jobdir)
+
     process = CrawlerProcess(settings)
-    process.crawl(AutoriaSpider, start_page=start_page, end_page=end_page)
-    process.start()
+    process.crawl(
+        AutoriaSpider,
+        start_page=start_page,
+        end_page=end_page,
+        listing_ranges=listing_ranges,
+        driver_url=driver_url,
+        progress_file=progress_file,
+    )
+    try:
+        with profiled(f"spider_{start_page}_{end_page}", profile_dir):
+            process.start()
+    finally:
+        if jobdir:
+            shutil.rmtree(jobdir, ignore_errors=True)
+
+
+def cleanup_crawl_queues():
+    """Remove disk queues left behind by killed spider processes."""
+    if os.path.isdir(CRAWL_QUEUE_DIR):
+        shutil.rmtree(CRAWL_QUEUE_DIR, ignore_errors=True)
+        logger.info(f"Deleted old crawl queues in {CRAWL_QUEUE_DIR}")
+
 
+def start_spider_process(args, pool=None, progress_file=None):
+    """Start run_spider in a new process, forked by the pool if given."""
+    kwargs = {"profile_dir": current_run_dir(), "progress_file": progress_file}
+    if pool is not None:
+        return pool.spawn(args, kwargs)
 
-def run_parallel_spiders(total_pages=3, chunks=3):
+    p = Process(target=run_spider, args=args, kwargs=kwargs)
+    p.start()
+    return p
+
+
+def run_parallel_spiders(total_pages=3, chunks=3, pool=None):
     logger.info(
         f"Starting parallel scraping: "
         f"total_pages={total_pages}, chunks={chunks}"
@@ -36,21 +133,25 @@ def run_parallel_spiders(total_pages=3, chunks=3):
     if total_pages == 0:
         raise ValueError("No pages to scrape.")
 
-    processes = []
+    watchdog = ChunkWatchdog(
+        lambda args, progress_file: start_spider_process(
+            args, pool, progress_file
+        )
+    )
 
     if total_pages == 1 or total_pages < chunks:
         # Run a single chunk
         start, end = 1, total_pages
-        output_file = "output_chunk_1.json"
+        output_file = f"output_chunk_1{output_extension()}"
 
         logger.info(
             f"Launching single process to scrape pages "
             f"{start} to {end}, saving to '{output_file}'"
         )
 
-        p = Process(target=run_spider, args=(start, end, output_file))
-        p.start()
-        processes.append(p)
+        watchdog.add_chunk(
+            (start, end, output_file), [(LISTING_URL, start, end)]
+        )
 
     else:
         pages_per_chunk = total_pages // chunks
@@ -67,25 +168,48 @@ def run_parallel_spiders(total_pages=3, chunks=3):
             if i < remainder:
                 end += 1
 
-            output_file = f"output_chunk_{i + 1}.json"
+            output_file = f"output_chunk_{i + 1}{output_extension()}"
 
             logger.info(
                 f"Launching process {i + 1}/{chunks} "
                 f"to scrape pages {start} to {end}, saving to '{output_file}'"
             )
 
-            p = Process(target=run_spider, args=(start, end, output_file))
-            p.start()
-            processes.append(p)
+            watchdog.add_chunk(
+                (start, end, output_file), [(LISTING_URL, start, end)]
+            )
 
             current_page = end + 1
 
-    logger.info(
-        f"All {len(processes)} process(es) started, waiting for completion..."
+    update_run_report("watchdog", watchdog.run())
+    logger.info("All parallel scraping processes have completed.")
+
+
+def run_sharded_spiders(workers=3, pool=None):
+    """Scrape filter shards, balanced across worker processes."""
+    logger.info(f"Starting sharded scraping: workers={workers}")
+
+    assignments = plan_shards(workers)
+    if not assignments:
+        raise ValueError("No shards to scrape.")
+
+    watchdog = ChunkWatchdog(
+        lambda args, progress_file: start_spider_process(
+            args, pool, progress_file
+        )
     )
+    for i, shards in enumerate(assignments, start=1):
+        output_file = f"output_chunk_{i}{output_extension()}"
+        listing_ranges = [
+            (shard["url"], 1, shard["pages"]) for shard in shards
+        ]
 
-    for i, p in enumerate(processes, start=1):
-        p.join()
-        logger.info(f"Process {i} has finished.")
+        logger.info(
+            f"Launching process {i}/{len(assignments)} to scrape "
+            f"{len(shards)} shard(s), saving to '{output_file}'"
+        )
 
-    logger.info("All parallel scraping processes have completed.")
+        watchdog.add_chunk((1, 1, output_file, listing_ranges), listing_ranges)
+
+    update_run_report("watchdog", watchdog.run())
+    logger.info("All sharded scraping processes have completed.")
@@ -0,0 +1,246 @@
+import heapq
+import itertools
+import math
+import os
+import re
+
+import requests
+from dotenv import load_dotenv
+from parsel import Selector
+from w3lib.url import add_or_replace_parameter
+
+from logs.logger import logger
+
+
+load_dotenv()
+
+SEARCH_URL = "https://auto.ria.com/search/?indexName=auto&categories.main.id=1"
+# Listings shown on one search page
+LISTING_PAGE_SIZE = 20
+# Deep pages are unstable, so every shard is kept at most this deep
+SHARD_MAX_PAGES = int(os.getenv("SHARD_MAX_PAGES", 20))
+
+# Shards deeper than SHARD_MAX_PAGES are split in price halves, at most
+# this many times over
+SHARD_MAX_SPLIT_DEPTH = 12
+# Width of the first split of an open-ended price band
+SHARD_OPEN_BAND_STEP = 10000
+
+# Comma separated filter values, e.g. SHARD_PRICE_BANDS=0-5000,5000-
+# Price bands are half-open, 0-5000 covers prices below 5000
+SHARD_BRANDS = os.getenv("SHARD_BRANDS", "")
+SHARD_REGIONS = os.getenv("SHARD_REGIONS", "")
+SHARD_PRICE_BANDS = os.getenv(
+    "SHARD_PRICE_BANDS", "0-5000,5000-10000,10000-20000,20000-"
+)
+SHARD_YEARS = os.getenv("SHARD_YEARS", "")
+
+REQUEST_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/115.0.0.0 Safari/537.36"
+    )
+}
+
+
+def parse_values(value):
+    """Split a comma separated env value, ignoring empty entries."""
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def parse_range(value):
+    """Parse '5000-10000' or '20000-' into (low, high) bounds."""
+    low, _, high = value.partition("-")
+    return low.strip() or None, high.strip() or None
+
+
+def parse_price_band(value):
+    """Parse '5000-10000' into (5000, 10000), '20000-' into (20000, None)."""
+    low, high = parse_range(value)
+    return int(low) if low else 0, int(high) if high else None
+
+
+def split_price_band(price_band):
+    """
+    Halves of a (low, high) price band, None when it cannot be split. An
+    open-ended band is split at a doubling bound instead.
+    """
+    low, high = price_band or (0, None)
+    if high is None:
+        middle = max(low * 2, low + SHARD_OPEN_BAND_STEP)
+    elif high - low < 2:
+        return None
+    else:
+        middle = (low + high) // 2
+    return (low, middle), (middle, high)
+
+
+def filter_params(brand=None, region=None, price_band=None, years=None):
+    """Build search query parameters for one shard."""
+    params = {}
+    if brand:
+        params["brand.id[0]"] = brand
+    if region:
+        params["region.id[0]"] = region
+    if price_band:
+        low, high = price_band
+        params["price.currency"] = "1"
+        if low:
+            params["price.USD.gte"] = str(low)
+        if high is not None:
+            # The site's bounds are inclusive and prices are whole
+            # dollars, so a band ends below the next band's low
+            params["price.USD.lte"] = str(high - 1)
+    if years:
+        low, high = parse_range(years)
+        if low:
+            params["year[0].gte"] = low
+        if high:
+            params["year[0].lte"] = high
+    return params
+
+
+def make_shard(brand=None, region=None, price_band=None, years=None):
+    url = SEARCH_URL
+    for name, value in filter_params(
+        brand, region, price_band, years
+    ).items():
+        url = add_or_replace_parameter(url, name, value)
+    return {
+        "url": url,
+        "brand": brand,
+        "region": region,
+        "price_band": price_band,
+        "years": years,
+    }
+
+
+def build_shards():
+    """
+    Divide the search space into shards by brand, region, price band
+    and year. Filters left empty are not split on.
+    """
+    dimensions = [
+        parse_values(SHARD_BRANDS) or [None],
+        parse_values(SHARD_REGIONS) or [None],
+        [parse_price_band(v) for v in parse_values(SHARD_PRICE_BANDS)]
+        or [None],
+        parse_values(SHARD_YEARS) or [None],
+    ]
+
+    shards = [
+        make_shard(*filters) for filters in itertools.product(*dimensions)
+    ]
+
+    logger.info(f"Built {len(shards)} shards from search filters")
+    return shards
+
+
+def estimate_shard_size(shard_url, timeout=30):
+    """
+    Estimate the number of listings in a shard from its first page.
+    """
+    response = requests.get(
+        shard_url, headers=REQUEST_HEADERS, timeout=timeout
+    )
+    response.raise_for_status()
+    selector = Selector(text=response.text)
+
+    count_text = (
+        selector.css("#staticResultsCount::text").get()
+        or selector.css("span.resultsCount strong::text").get()
+        or ""
+    )
+    digits = re.sub(r"\D", "", count_text)
+    if digits:
+        return int(digits)
+
+    cards = len(selector.css("a.address"))
+    if cards < LISTING_PAGE_SIZE:
+        return cards
+    # Total is unknown, assume the shard is as deep as allowed
+    return LISTING_PAGE_SIZE * SHARD_MAX_PAGES
+
+
+def assign_shards(shards, workers):
+    """
+    Assign shards to workers in balanced bins, largest shards first,
+    each to the currently lightest worker.
+    """
+    bins = [[] for _ in range(workers)]
+    heap = [(0, i) for i in range(workers)]
+
+    for shard in sorted(shards, key=lambda s: s["pages"], reverse=True):
+        load, i = heapq.heappop(heap)
+        bins[i].append(shard)
+        heapq.heappush(heap, (load + shard["pages"], i))
+
+    for i, assigned in enumerate(bins, start=1):
+        logger.info(
+            f"Worker {i}: {len(assigned)} shard(s), "
+            f"{sum(s['pages'] for s in assigned)} page(s)"
+        )
+    return [assigned for assigned in bins if assigned]
+
+
+def fit_shard(shard, depth=0):
+    """
+    Estimate a shard and split it in price halves until every part fits
+    in SHARD_MAX_PAGES, so no listing is left past the last page.
+    """
+    try:
+        size = estimate_shard_size(shard["url"])
+    except requests.RequestException as e:
+        logger.warning(
+            f"Could not estimate shard {shard['url']}, "
+            f"assuming full depth: {e}"
+        )
+        size = LISTING_PAGE_SIZE * SHARD_MAX_PAGES
+
+    if size == 0:
+        logger.debug(f"Skipping empty shard: {shard['url']}")
+        return []
+
+    if size > LISTING_PAGE_SIZE * SHARD_MAX_PAGES:
+        halves = (
+            split_price_band(shard["price_band"])
+            if depth < SHARD_MAX_SPLIT_DEPTH
+            else None
+        )
+        if halves:
+            logger.info(
+                f"Shard has ~{size} listings, more than {SHARD_MAX_PAGES} "
+                f"pages, splitting it at price {halves[1][0]}"
+            )
+            return [
+                part
+                for price_band in halves
+                for part in fit_shard(
+                    make_shard(
+                        shard["brand"],
+                        shard["region"],
+                        price_band,
+                        shard["years"],
+                    ),
+                    depth + 1,
+                )
+            ]
+        logger.warning(
+            f"Shard has ~{size} listings and cannot be split further, "
+            f"only {SHARD_MAX_PAGES} pages are crawled: {shard['url']}"
+        )
+
+    pages = min(math.ceil(size / LISTING_PAGE_SIZE), SHARD_MAX_PAGES)
+    return [{**shard, "size": size, "pages": pages}]
+
+
+def plan_shards(workers):
+    """Build shards, estimate their size and assign them to workers."""
+    shards = [part for shard in build_shards() for part in fit_shard(shard)]
+
+    logger.info(
+        f"Planned {len(shards)} shard(s) with "
+        f"{sum(s['size'] for s in shards)} estimated listings"
+    )
+    return assign_shards(shards, workers)
@@ -0,0 +1,178 @@
+import os
+import signal
+import time
+
+from dotenv import load_dotenv
+
+from logs.logger import logger
+from utils.chunk_store import split_extension
+
+
+load_dotenv()
+
+# Wall-clock budget of one chunk process, in seconds
+CHUNK_TIMEOUT = int(os.getenv("CHUNK_TIMEOUT", 3600))
+# How many times a killed or failed chunk is restarted on its unfinished pages
+CHUNK_MAX_RESTARTS = int(os.getenv("CHUNK_MAX_RESTARTS", 2))
+WATCHDOG_POLL_INTERVAL = 5
+
+
+def progress_file_for(output_file):
+    return f"{split_extension(output_file)[0]}.progress"
+
+
+def retry_output_file(output_file, attempt):
+    root, ext = split_extension(output_file)
+    return f"{root}_retry{attempt}{ext}"
+
+
+def read_progress(progress_file):
+    """Read the (listing_url, page) pairs a spider finished."""
+    done = set()
+    if not os.path.exists(progress_file):
+        return done
+
+    with open(progress_file, "r", encoding="utf-8") as f:
+        for line in f:
+            listing_url, _, page = line.rstrip("\n").rpartition("\t")
+            if listing_url and page.isdigit():
+                done.add((listing_url, int(page)))
+    return done
+
+
+def unfinished_ranges(listing_ranges, done):
+    """Split listing ranges into runs of pages not finished yet."""
+    unfinished = []
+    for listing_url, start, end in listing_ranges:
+        run_start = None
+        for page in range(start, end + 1):
+            if (listing_url, page) in done:
+                if run_start is not None:
+                    unfinished.append((listing_url, run_start, page - 1))
+                    run_start = None
+            elif run_start is None:
+                run_start = page
+        if run_start is not None:
+            unfinished.append((listing_url, run_start, end))
+    return unfinished
+
+
+def kill_process_group(p):
+    """Kill a chunk process together with its Chrome processes."""
+    try:
+        # Spider processes lead their own process group, see run_spider
+        os.killpg(p.pid, signal.SIGKILL)
+    except (AttributeError, ProcessLookupError, PermissionError):
+        p.kill()
+    p.join()
+
+
+class ChunkWatchdog:
+    """
+    Runs chunk processes under a wall-clock budget. Chunks that time out
+    or fail are killed and restarted on their unfinished listing pages,
+    read from the progress file the spider appends finished pages to.
+    """
+
+    def __init__(self, start_process, timeout=None, max_restarts=None):
+        # start_process(args, progress_file) starts run_spider
+        self.start_process = start_process
+        self.timeout = CHUNK_TIMEOUT if timeout is None else timeout
+        self.max_restarts = (
+            CHUNK_MAX_RESTARTS if max_restarts is None else max_restarts
+        )
+        self.chunks = []
+
+    def add_chunk(self, args, listing_ranges):
+        """
+        Register a chunk by its run_spider args and the listing ranges
+        they cover.
+        """
+        output_file = args[2]
+        progress_file = progress_file_for(output_file)
+        if os.path.exists(progress_file):
+            os.remove(progress_file)
+
+        self.chunks.append(
+            {
+                "number": len(self.chunks) + 1,
+                "args": args,
+                "listing_ranges": listing_ranges,
+                "output_file": output_file,
+                "progress_file": progress_file,
+                "attempt": 0,
+            }
+        )
+
+    def launch(self, chunk):
+        args = chunk["args"]
+        if chunk["attempt"]:
+            ranges = unfinished_ranges(
+                chunk["listing_ranges"], read_progress(chunk["progress_file"])
+            )
+            if not ranges:
+                logger.info(f"Chunk {chunk['number']} has no pages left")
+                return None
+            output_file = retry_output_file(
+                chunk["output_file"], chunk["attempt"]
+            )
+            args = (1, 1, output_file, ranges)
+            logger.warning(
+                f"Restarting chunk {chunk['number']} "
+                f"(attempt {chunk['attempt']}) on {len(ranges)} "
+                f"unfinished range(s), saving to '{output_file}'"
+            )
+
+        p = self.start_process(args, chunk["progress_file"])
+        chunk["process"] = p
+        chunk["deadline"] = time.monotonic() + self.timeout
+        return p
+
+    def check(self, chunk):
+        """Return True while the chunk is running or was restarted."""
+        p = chunk["process"]
+        if p.is_alive():
+            if time.monotonic() < chunk["deadline"]:
+                return True
+            logger.error(
+                f"Chunk {chunk['number']} exceeded {self.timeout}s, killing"
+            )
+            kill_process_group(p)
+        elif p.exitcode == 0:
+            logger.info(f"Process {chunk['number']} has finished.")
+            return False
+        else:
+            logger.error(
+                f"Chunk {chunk['number']} exited with code {p.exitcode}"
+            )
+
+        if chunk["attempt"] >= self.max_restarts:
+            logger.error(
+                f"Chunk {chunk['number']} gave up after "
+                f"{chunk['attempt']} restart(s)"
+            )
+            return False
+
+        chunk["attempt"] += 1
+        return self.launch(chunk) is not None
+
+    def run(self):
+        running = [c for c in self.chunks if self.launch(c) is not None]
+        logger.info(
+            f"All {len(running)} process(es) started, "
+            f"waiting for completion..."
+        )
+
+        try:
+            while running:
+                running[0]["process"].join(WATCHDOG_POLL_INTERVAL)
+                running = [c for c in running if self.check(c)]
+        finally:
+            for chunk in running:
+                if chunk["process"].is_alive():
+                    kill_process_group(chunk["process"])
+
+        return {
+            f"chunk_{c['number']}": {"restarts": c["attempt"]}
+            for c in self.chunks
+        }
@@ -0,0 +1,89 @@
+import multiprocessing
+import os
+
+from dotenv import load_dotenv
+from scrapy.utils.project import get_project_settings
+from selenium.webdriver.chrome.service import Service
+
+from logs.logger import logger
+from utils.scraper_utils import run_spider
+
+
+load_dotenv()
+
+CHROMEDRIVER_PATH = os.getenv("CHROMEDRIVER_PATH", "chromedriver")
+
+# Imported once by the fork server, every forked worker inherits them.
+# The Twisted reactor is left out, each worker installs its own.
+PRELOAD_MODULES = [
+    "scrapy.crawler",
+    "scrapy.utils.project",
+    "selenium.webdriver",
+    "auto_ria_scraper.auto_ria_scraper.spiders.autoria",
+    "utils.scraper_utils",
+]
+
+
+def warm_up():
+    """No-op target used to start the fork server ahead of the first run."""
+
+
+class SpiderWorkerPool:
+    """
+    Long-lived pool forking spider processes from a preloaded fork server.
+
+    Project settings are resolved once and a chromedriver service is kept
+    running, so each chunk only pays for the fork and its browser session.
+    """
+
+    def __init__(self, warm_driver=True):
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            self.context = multiprocessing.get_context("forkserver")
+            self.context.set_forkserver_preload(PRELOAD_MODULES)
+        else:
+            logger.warning("forkserver is not available, using spawn")
+            self.context = multiprocessing.get_context("spawn")
+        self.warm_driver = warm_driver
+        self.settings = None
+        self.driver_service = None
+
+    def start(self):
+        logger.info("Starting spider worker pool...")
+        self.settings = get_project_settings().copy_to_dict()
+
+        p = self.context.Process(target=warm_up)
+        p.start()
+        p.join()
+        logger.info("Fork server started with preloaded modules.")
+
+        if self.warm_driver:
+            self.driver_service = Service(executable_path=CHROMEDRIVER_PATH)
+            self.driver_service.start()
+            logger.info(
+                f"Chromedriver service started at "
+                f"{self.driver_service.service_url}"
+            )
+
+    def spawn(self, args, kwargs=None):
+        """Fork a worker running run_spider with the given arguments."""
+        driver_url = (
+            self.driver_service.service_url if self.driver_service else None
+        )
+        p = self.context.Process(
+            target=run_spider,
+            args=args,
+            kwargs={
+                **(kwargs or {}),
+                "base_settings": self.settings,
+                "driver_url": driver_url,
+            },
+        )
+        p.start()
+        return p
+
+    def close(self):
+        if self.driver_service:
+            logger.info("Stopping chromedriver service...")
+            self.driver_service.stop()
+            self.driver_service = None
+        logger.info("Spider worker pool closed.")